@@ -1,14 +1,37 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .jwt_handler import verify_token
+from .principal_cache import principal_cache, Principal
 from database.mongodb import DatabaseOperations
+from websocket.presence import presence_service
 from models.user import User
 from typing import Optional
 
 security = HTTPBearer()
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
-    """Get current authenticated user"""
+async def load_user(user_id: str) -> Optional[User]:
+    """Get a user by id through the principal cache, with presence from the presence service"""
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return presence_service.apply(user)
+    
+    user_data = await DatabaseOperations.get_document("users", {"id": user_id})
+    if not user_data:
+        return None
+    
+    # Clean up invalid data
+    if user_data.get('status') == 'online':
+        user_data['status'] = 'active'
+    
+    # Fix invalid datetime strings
+    if user_data.get('last_active') == 'datetime.utcnow()':
+        user_data['last_active'] = None
+    
+    user = User(**user_data)
+    principal_cache.set(user)
+    return presence_service.apply(user)
+
+def _token_user_id(credentials: HTTPAuthorizationCredentials) -> str:
     user_id = verify_token(credentials.credentials)
     if not user_id:
         raise HTTPException(
@@ -16,24 +39,36 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="Invalid token",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
-    user_data = await DatabaseOperations.get_document("users", {"id": user_id})
-    if not user_data:
+    return user_id
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+    """Get current authenticated user"""
+    user = await load_user(_token_user_id(credentials))
+    if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Clean up invalid data
-    if user_data.get('status') == 'online':
-        user_data['status'] = 'active'
+    return user
+
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    """Get the authenticated caller's id and role only"""
+    user_id = _token_user_id(credentials)
+    principal = principal_cache.get_principal(user_id)
+    if principal is not None:
+        return principal
     
-    # Fix invalid datetime strings
-    if user_data.get('last_active') == 'datetime.utcnow()':
-        user_data['last_active'] = None
+    user = await load_user(user_id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     
-    return User(**user_data)
+    return Principal(user.id, user.role)
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get current active user"""
@@ -66,16 +101,4 @@ async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials]
     if not user_id:
         return None
     
-    user_data = await DatabaseOperations.get_document("users", {"id": user_id})
-    if not user_data:
-        return None
-    
-    # Clean up invalid data
-    if user_data.get('status') == 'online':
-        user_data['status'] = 'active'
-    
-    # Fix invalid datetime strings
-    if user_data.get('last_active') == 'datetime.utcnow()':
-        user_data['last_active'] = None
-    
-    return User(**user_data)
\ No newline at end of file
+    return await load_user(user_id)
\ No newline at end of file
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from fastapi import HTTPException, status
+from .jwt_handler import hash_password, verify_password
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class PasswordHashPool:
+    """
+    Runs bcrypt hashing and verification off the event loop
+
+    Each bcrypt call takes 100-300 ms of CPU. bcrypt releases the GIL, so a
+    small thread pool keeps the loop responsive during login bursts. At most
+    max_queue calls may be running or waiting; beyond that requests are
+    rejected with 503 instead of queueing without bound.
+    """
+
+    def __init__(self, workers: int = settings.BCRYPT_WORKERS,
+                 max_queue: int = settings.BCRYPT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._outstanding = 0
+        self.stats = {
+            "completed": 0,
+            "rejected": 0,
+            "outstanding": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "hash_ms_total": 0.0,
+            "hash_ms_max": 0.0
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def _run(self, fn: Callable, *args):
+        if self._outstanding >= self.max_queue:
+            self.stats["rejected"] += 1
+            logger.warning(f"Password hashing pool saturated ({self._outstanding} outstanding)")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+
+        submitted = time.perf_counter()
+
+        def timed_call():
+            started = time.perf_counter()
+            result = fn(*args)
+            return result, started, time.perf_counter()
+
+        self._outstanding += 1
+        self.stats["outstanding"] = self._outstanding
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(self._get_executor(), timed_call)
+        finally:
+            self._outstanding -= 1
+            self.stats["outstanding"] = self._outstanding
+
+        wait_ms = (started - submitted) * 1000
+        hash_ms = (finished - started) * 1000
+        self.stats["completed"] += 1
+        self.stats["wait_ms_total"] += wait_ms
+        self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], wait_ms)
+        self.stats["hash_ms_total"] += hash_ms
+        self.stats["hash_ms_max"] = max(self.stats["hash_ms_max"], hash_ms)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def get_stats(self) -> dict:
+        completed = self.stats["completed"]
+        return {
+            **self.stats,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "wait_ms_avg": round(self.stats["wait_ms_total"] / completed, 2) if completed else 0,
+            "hash_ms_avg": round(self.stats["hash_ms_total"] / completed, 2) if completed else 0
+        }
+
+# Global password hashing pool
+password_pool = PasswordHashPool()
@@ -0,0 +1,84 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional, Tuple
+from models.user import User
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class Principal:
+    """The authenticated caller, reduced to what authorization checks need"""
+
+    __slots__ = ("id", "role")
+
+    def __init__(self, id: str, role: str):
+        self.id = id
+        self.role = role
+
+    def __repr__(self) -> str:
+        return f"Principal(id={self.id!r}, role={self.role!r})"
+
+class PrincipalCache:
+    """
+    Bounded TTL cache of authenticated users keyed by user id
+
+    Saves the users read and User model construction that every
+    authenticated request would otherwise pay for. Each worker has its own
+    cache: routes that change a user's profile or role, or delete them, go
+    through manager.invalidate_principal(), which calls invalidate() here
+    and on every other worker over the WebSocket backplane. The TTL bounds
+    how long any other change (a direct database edit, or an invalidation
+    lost while the backplane was down) can go unnoticed. Status
+    and last_active change on every heartbeat, so presence changes leave
+    entries alone and load_user overlays the presence service's values.
+    """
+
+    def __init__(self, max_entries: int = settings.PRINCIPAL_CACHE_SIZE,
+                 ttl: float = settings.PRINCIPAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, User, Principal]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self._lookup(user_id)
+        return entry[1] if entry else None
+
+    def get_principal(self, user_id: str) -> Optional[Principal]:
+        entry = self._lookup(user_id)
+        return entry[2] if entry else None
+
+    def set(self, user: User) -> Principal:
+        principal = Principal(user.id, user.role)
+        self._entries[user.id] = (time.monotonic() + self.ttl, user, principal)
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return principal
+
+    def invalidate(self, user_id: str):
+        """Forget a user after their document changed or was deleted"""
+        if self._entries.pop(user_id, None) is not None:
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "entries": len(self._entries)}
+
+    def _lookup(self, user_id: str):
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.stats["hits"] += 1
+        return entry
+
+# Global principal cache instance
+principal_cache = PrincipalCache()
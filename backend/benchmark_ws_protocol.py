@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compare WebSocket frame encodings: bytes per frame and encode cost
+
+    python benchmark_ws_protocol.py [iterations]
+
+Frames are representative activity_update / time_entry_update /
+presence_update payloads. "+deflate" sizes are what permessage-deflate
+(negotiated by uvicorn's websocket transport) would put on the wire for a
+single frame without context takeover.
+"""
+
+import sys
+import time
+import uuid
+import zlib
+from datetime import datetime
+
+from websocket.codec import JSON_CODEC, MsgpackCodec
+
+def sample_frames():
+    user_id = str(uuid.uuid4())
+    project_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    return {
+        "activity_update": {
+            "type": "team_activity",
+            "data": {
+                "activity": {
+                    "user_id": user_id,
+                    "activity": {
+                        "time_entry_id": str(uuid.uuid4()),
+                        "project_id": project_id,
+                        "keystrokes": 87,
+                        "mouse_clicks": 23,
+                        "mouse_movements": 412,
+                        "active_app": "Visual Studio Code",
+                        "active_url": "https://github.com/example/repo/pull/42",
+                        "activity_level": 73.5
+                    }
+                },
+                "timestamp": now
+            },
+            "seq": 123456
+        },
+        "time_entry_update": {
+            "type": "time_entry_update",
+            "data": {
+                "user_id": user_id,
+                "time_entry": {
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "project_id": project_id,
+                    "task_id": str(uuid.uuid4()),
+                    "start_time": now,
+                    "end_time": None,
+                    "duration": 0,
+                    "description": "Implementing the reports page",
+                    "is_manual": False,
+                    "activity_level": 0.0
+                },
+                "timestamp": now
+            },
+            "seq": 123457
+        },
+        "presence_update": {
+            "type": "presence_update",
+            "data": {
+                "changes": [{"user_id": str(uuid.uuid4()), "status": "active"} for _ in range(20)],
+                "timestamp": now
+            },
+            "seq": 123458
+        }
+    }
+
+def deflated_size(frame) -> int:
+    data = frame.encode() if isinstance(frame, str) else frame
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+def encode_us(codec, message, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        codec.encode(message)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    codecs = [JSON_CODEC]
+    try:
+        codecs.append(MsgpackCodec())
+    except ImportError:
+        print("msgpack is not installed (pip install msgpack); only JSON is measured\n")
+
+    print(f"{'frame':<20}{'encoding':<10}{'bytes':>8}{'+deflate':>10}{'encode µs':>12}")
+    print("-" * 60)
+    for name, message in sample_frames().items():
+        for codec in codecs:
+            frame = codec.encode(message)
+            if codec is not JSON_CODEC:
+                assert codec.decode(frame) == JSON_CODEC.decode(JSON_CODEC.encode(message))
+            print(f"{name:<20}{codec.name:<10}{len(frame) if isinstance(frame, bytes) else len(frame.encode()):>8}"
+                  f"{deflated_size(frame):>10}{encode_us(codec, message, iterations):>12.2f}")
+        print()
+
+if __name__ == "__main__":
+    main()
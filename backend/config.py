@@ -35,6 +35,100 @@ class Settings:
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
     SMTP_FROM_EMAIL: str = os.getenv("SMTP_FROM_EMAIL", "noreply@hubstaff-clone.com")
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_TIMEOUT: float = float(os.getenv("SMTP_TIMEOUT", "30"))
+    # Email outbox sender (one persistent SMTP connection per sender)
+    EMAIL_CONCURRENCY: int = int(os.getenv("EMAIL_CONCURRENCY", "2"))
+    EMAIL_RATE_PER_MINUTE: int = int(os.getenv("EMAIL_RATE_PER_MINUTE", "120"))  # 0 = unlimited
+    EMAIL_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+    EMAIL_BACKOFF_BASE: float = float(os.getenv("EMAIL_BACKOFF_BASE", "30"))
+    EMAIL_BACKOFF_MAX: float = float(os.getenv("EMAIL_BACKOFF_MAX", "3600"))
+    EMAIL_POLL_INTERVAL: float = float(os.getenv("EMAIL_POLL_INTERVAL", "2.0"))
+    EMAIL_LEASE: float = float(os.getenv("EMAIL_LEASE", "120"))
+    EMAIL_IDLE_TIMEOUT: float = float(os.getenv("EMAIL_IDLE_TIMEOUT", "60"))  # close idle SMTP connections
+    
+    # Activity ingestion settings (write-behind buffer for activity_data)
+    ACTIVITY_BATCH_SIZE: int = int(os.getenv("ACTIVITY_BATCH_SIZE", "500"))
+    ACTIVITY_FLUSH_INTERVAL: float = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", "1.0"))
+    ACTIVITY_MAX_PENDING: int = int(os.getenv("ACTIVITY_MAX_PENDING", "20000"))
+    ACTIVITY_ENQUEUE_TIMEOUT: float = float(os.getenv("ACTIVITY_ENQUEUE_TIMEOUT", "2.0"))
+    ACTIVITY_MAX_BATCH_REQUEST: int = int(os.getenv("ACTIVITY_MAX_BATCH_REQUEST", "1000"))
+    # WebSocket activity stream, merged per (user, time entry, minute)
+    ACTIVITY_COALESCE_INTERVAL: float = float(os.getenv("ACTIVITY_COALESCE_INTERVAL", "5.0"))
+    ACTIVITY_COALESCE_MAX_KEYS: int = int(os.getenv("ACTIVITY_COALESCE_MAX_KEYS", "50000"))
+    
+    # Response cache settings (analytics and dashboard endpoints)
+    CACHE_TTL: float = float(os.getenv("CACHE_TTL", "30"))
+    CACHE_STALE_TTL: float = float(os.getenv("CACHE_STALE_TTL", "120"))
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+    
+    # Authenticated principal cache (saves a users read per request)
+    PRINCIPAL_CACHE_TTL: float = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+    
+    # Password hashing pool (bcrypt runs off the event loop)
+    BCRYPT_WORKERS: int = int(os.getenv("BCRYPT_WORKERS", "4"))
+    BCRYPT_MAX_QUEUE: int = int(os.getenv("BCRYPT_MAX_QUEUE", "64"))
+    
+    # WebSocket fan-out (per-connection send queues)
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+    WS_SEND_TIMEOUT: float = float(os.getenv("WS_SEND_TIMEOUT", "5.0"))
+    
+    # WebSocket heartbeat: ping every interval, reap sockets silent for the timeout
+    WS_PING_INTERVAL: float = float(os.getenv("WS_PING_INTERVAL", "20"))
+    WS_IDLE_TIMEOUT: float = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+    
+    # Reconnect replay: events kept per room and number of room buffers
+    WS_REPLAY_BUFFER_SIZE: int = int(os.getenv("WS_REPLAY_BUFFER_SIZE", "200"))
+    WS_REPLAY_MAX_ROOMS: int = int(os.getenv("WS_REPLAY_MAX_ROOMS", "5000"))
+    
+    # WebSocket backplane for multi-worker deployments: memory, unix or redis
+    WS_BACKPLANE: str = os.getenv("WS_BACKPLANE", "memory")
+    WS_BACKPLANE_URL: str = os.getenv("WS_BACKPLANE_URL", "")  # socket path or redis:// URL
+    WS_PRESENCE_INTERVAL: float = float(os.getenv("WS_PRESENCE_INTERVAL", "5.0"))
+    
+    # Presence batching: status diff frames and last_active write-behind
+    PRESENCE_FLUSH_INTERVAL: float = float(os.getenv("PRESENCE_FLUSH_INTERVAL", "1.0"))
+    PRESENCE_IDLE_TIMEOUT: float = float(os.getenv("PRESENCE_IDLE_TIMEOUT", "300"))
+    
+    # Pooled HTTP clients for third-party integrations
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "20"))
+    HTTP_CLIENT_MAX_KEEPALIVE: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE", "10"))
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", "30"))
+    HTTP_CLIENT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_TIMEOUT", "10"))
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", "5"))
+    HTTP_CLIENT_HTTP2: bool = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() == "true"
+    
+    # Third-party API base URLs (overridable to point at a local stub server)
+    TRELLO_API_URL: str = os.getenv("TRELLO_API_URL", "https://api.trello.com/1")
+    GITHUB_API_URL: str = os.getenv("GITHUB_API_URL", "https://api.github.com")
+    
+    # Conditional-request cache for provider listings (Trello boards, GitHub repos)
+    PROVIDER_CACHE_SIZE: int = int(os.getenv("PROVIDER_CACHE_SIZE", "1000"))
+    PROVIDER_CACHE_FRESH_TTL: float = float(os.getenv("PROVIDER_CACHE_FRESH_TTL", "60"))
+    
+    # Outbound integration job queue
+    OUTBOUND_POLL_INTERVAL: float = float(os.getenv("OUTBOUND_POLL_INTERVAL", "1.0"))
+    OUTBOUND_CONCURRENCY: int = int(os.getenv("OUTBOUND_CONCURRENCY", "4"))  # per provider
+    OUTBOUND_MAX_ATTEMPTS: int = int(os.getenv("OUTBOUND_MAX_ATTEMPTS", "6"))
+    OUTBOUND_BACKOFF_BASE: float = float(os.getenv("OUTBOUND_BACKOFF_BASE", "2.0"))
+    OUTBOUND_BACKOFF_MAX: float = float(os.getenv("OUTBOUND_BACKOFF_MAX", "300"))
+    OUTBOUND_MERGE_WINDOW: float = float(os.getenv("OUTBOUND_MERGE_WINDOW", "2.0"))
+    OUTBOUND_MERGE_MAX: int = int(os.getenv("OUTBOUND_MERGE_MAX", "20"))
+    OUTBOUND_LEASE: float = float(os.getenv("OUTBOUND_LEASE", "60"))
+    
+    # Outgoing webhooks
+    WEBHOOK_WORKERS: int = int(os.getenv("WEBHOOK_WORKERS", "16"))
+    WEBHOOK_ENDPOINT_CONCURRENCY: int = int(os.getenv("WEBHOOK_ENDPOINT_CONCURRENCY", "2"))
+    WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+    WEBHOOK_BACKOFF_BASE: float = float(os.getenv("WEBHOOK_BACKOFF_BASE", "5"))
+    WEBHOOK_BACKOFF_MAX: float = float(os.getenv("WEBHOOK_BACKOFF_MAX", "3600"))
+    WEBHOOK_POLL_INTERVAL: float = float(os.getenv("WEBHOOK_POLL_INTERVAL", "1.0"))
+    WEBHOOK_LEASE: float = float(os.getenv("WEBHOOK_LEASE", "60"))
+    WEBHOOK_TIMEOUT: float = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+    # Comma-separated hosts that may receive webhooks although they resolve
+    # to loopback, private or other non-public addresses
+    WEBHOOK_ALLOWED_HOSTS: str = os.getenv("WEBHOOK_ALLOWED_HOSTS", "")
     
     # Admin settings
     DEFAULT_ADMIN_EMAIL: str = os.getenv("DEFAULT_ADMIN_EMAIL", "admin@example.com")
@@ -42,6 +136,7 @@ class Settings:
     
     # Security settings
     INVITATION_EXPIRE_DAYS: int = int(os.getenv("INVITATION_EXPIRE_DAYS", "7"))
+    BULK_INVITE_MAX_ROWS: int = int(os.getenv("BULK_INVITE_MAX_ROWS", "1000"))
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     
     @property
@@ -0,0 +1,270 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from typing import Optional, List, Dict, Any, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Primary keys are application generated UUID strings stored in `id`. The
+# partial filter keeps legacy documents that never got an `id` from
+# colliding on null while still enforcing uniqueness for every real key.
+_HAS_ID = {"id": {"$type": "string"}}
+
+class IndexSpec:
+    """Declarative description of a single MongoDB index"""
+
+    def __init__(self, keys, unique: bool = False, sparse: bool = False,
+                 expire_after_seconds: Optional[int] = None,
+                 partial_filter: Optional[Dict[str, Any]] = None,
+                 name: Optional[str] = None):
+        if isinstance(keys, str):
+            keys = [(keys, ASCENDING)]
+        self.keys: List[Tuple[str, int]] = list(keys)
+        self.unique = unique
+        self.sparse = sparse
+        self.expire_after_seconds = expire_after_seconds
+        self.partial_filter = partial_filter
+        # Match MongoDB's default naming so indexes created by earlier
+        # releases are recognised instead of duplicated
+        self.name = name or "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    @property
+    def options(self) -> Dict[str, Any]:
+        """Index options in the shape reported by listIndexes"""
+        options: Dict[str, Any] = {}
+        if self.unique:
+            options["unique"] = True
+        if self.sparse:
+            options["sparse"] = True
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        if self.partial_filter is not None:
+            options["partialFilterExpression"] = self.partial_filter
+        return options
+
+    def to_model(self) -> IndexModel:
+        return IndexModel(self.keys, name=self.name, **self.options)
+
+    def describe(self) -> str:
+        keys = ", ".join(f"{field}:{direction}" for field, direction in self.keys)
+        extras = " ".join(f"{key}={value}" for key, value in self.options.items())
+        return f"{{{keys}}} {extras}".strip()
+
+# Every field the routes filter or sort on, per collection. Single-field
+# indexes that are a prefix of a compound index below are intentionally
+# omitted; older deployments will report them as unmanaged.
+INDEX_SPECS: Dict[str, List[IndexSpec]] = {
+    "users": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec("email", unique=True),
+        IndexSpec("role"),
+        IndexSpec("status"),
+        IndexSpec([("created_at", DESCENDING)]),
+    ],
+    "projects": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec("created_by"),
+        IndexSpec("status"),
+        IndexSpec("team_members"),
+        IndexSpec([("created_at", DESCENDING)]),
+        IndexSpec([("updated_at", DESCENDING)]),
+    ],
+    "tasks": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec("status"),
+        IndexSpec([("project_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexSpec([("assignee_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "time_entries": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec("project_id"),
+        IndexSpec("start_time"),
+        IndexSpec([("user_id", ASCENDING), ("start_time", DESCENDING)]),
+        # Active timer lookup: {"user_id": ..., "end_time": None}
+        IndexSpec([("user_id", ASCENDING), ("end_time", ASCENDING)]),
+        # At most one running timer per user; a concurrent second start
+        # fails with DuplicateKeyError instead of racing a read check
+        IndexSpec("user_id", unique=True, partial_filter={"end_time": {"$type": "null"}},
+                  name="user_id_1_running_timer"),
+    ],
+    "activity_data": [
+        IndexSpec("user_id"),
+        IndexSpec("time_entry_id"),
+        IndexSpec("timestamp"),
+        # Per-minute upserts from the WebSocket activity stream
+        IndexSpec([("user_id", ASCENDING), ("time_entry_id", ASCENDING), ("timestamp", ASCENDING)]),
+    ],
+    "screenshots": [
+        IndexSpec("user_id"),
+        IndexSpec("time_entry_id"),
+        IndexSpec("timestamp"),
+    ],
+    "invitations": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec("token", unique=True),
+        IndexSpec([("email", ASCENDING), ("accepted", ASCENDING)]),
+        # Status filters: pending / expired split on expires_at
+        IndexSpec([("accepted", ASCENDING), ("expires_at", ASCENDING)]),
+        # Newest-first listing and its (created_at, id) cursor
+        IndexSpec([("created_at", DESCENDING), ("id", DESCENDING)]),
+        # Unaccepted invitations are removed 30 days after they expire
+        IndexSpec("expires_at", expire_after_seconds=30 * 24 * 3600, partial_filter={"accepted": False}),
+    ],
+    "integrations": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec([("user_id", ASCENDING), ("type", ASCENDING), ("active", ASCENDING)]),
+    ],
+    "outbound_jobs": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        # Worker claims: next due job per provider
+        IndexSpec([("provider", ASCENDING), ("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexSpec([("merge_key", ASCENDING), ("status", ASCENDING)]),
+    ],
+    "webhook_subscriptions": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec("user_id"),
+        # emit(): active subscriptions listening for an event type
+        IndexSpec([("active", ASCENDING), ("events", ASCENDING)]),
+    ],
+    "webhook_deliveries": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        IndexSpec([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexSpec([("subscription_id", ASCENDING), ("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        IndexSpec([("subscription_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "email_outbox": [
+        IndexSpec("id", unique=True, partial_filter=_HAS_ID),
+        # Sender claims: next due message
+        IndexSpec([("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+        # Sent messages are kept a week, failed ones a month for inspection
+        IndexSpec("sent_at", expire_after_seconds=7 * 24 * 3600),
+        IndexSpec("failed_at", expire_after_seconds=30 * 24 * 3600),
+    ],
+    "time_rollups": [
+        IndexSpec([("user_id", ASCENDING), ("project_id", ASCENDING), ("task_id", ASCENDING), ("day", ASCENDING)],
+                  unique=True),
+        IndexSpec([("user_id", ASCENDING), ("day", ASCENDING)]),
+        IndexSpec("day"),
+    ],
+    "password_reset_tokens": [
+        IndexSpec("email"),
+        IndexSpec("token", unique=True),
+        # Tokens are valid for an hour; keep them one more day for auditing
+        IndexSpec("expires_at", expire_after_seconds=24 * 3600),
+    ],
+}
+
+def _normalize_keys(keys) -> Tuple[Tuple[str, Any], ...]:
+    items = keys.items() if hasattr(keys, "items") else keys
+    # listIndexes may report directions as floats (1.0); text/hashed stay strings
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in items)
+
+def _normalize_options(info: Dict[str, Any]) -> Dict[str, Any]:
+    options: Dict[str, Any] = {}
+    if info.get("unique"):
+        options["unique"] = True
+    if info.get("sparse"):
+        options["sparse"] = True
+    if info.get("expireAfterSeconds") is not None:
+        options["expireAfterSeconds"] = int(info["expireAfterSeconds"])
+    if info.get("partialFilterExpression") is not None:
+        options["partialFilterExpression"] = _to_plain(info["partialFilterExpression"])
+    return options
+
+def _to_plain(value):
+    if hasattr(value, "items"):
+        return {key: _to_plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_plain(item) for item in value]
+    return value
+
+async def diff_indexes(database, specs: Dict[str, List[IndexSpec]] = None) -> List[Dict[str, Any]]:
+    """
+    Compare the index spec against the indexes that exist in the database
+
+    Returns:
+        List of changes, each with collection, name, action and detail.
+        Actions are "ok", "create", "rebuild" (options differ) and
+        "unmanaged" (exists in the database but not in the spec).
+    """
+    specs = specs or INDEX_SPECS
+    existing_collections = set(await database.list_collection_names())
+    changes = []
+
+    for collection, collection_specs in specs.items():
+        existing = {}
+        if collection in existing_collections:
+            async for info in database[collection].list_indexes():
+                existing[_normalize_keys(info["key"])] = info
+
+        managed = set()
+        for spec in collection_specs:
+            info = existing.get(_normalize_keys(spec.keys))
+            if info is None:
+                action = "create"
+            elif _normalize_options(info) != spec.options:
+                action = "rebuild"
+            else:
+                action = "ok"
+            if info is not None:
+                managed.add(info["name"])
+            changes.append({
+                "collection": collection,
+                "name": info["name"] if info is not None else spec.name,
+                "action": action,
+                "detail": spec.describe(),
+                "spec": spec,
+            })
+
+        for info in existing.values():
+            if info["name"] != "_id_" and info["name"] not in managed:
+                changes.append({
+                    "collection": collection,
+                    "name": info["name"],
+                    "action": "unmanaged",
+                    "detail": str(dict(info["key"])),
+                    "spec": None,
+                })
+
+    return changes
+
+async def ensure_indexes(database, dry_run: bool = False, drop_unmanaged: bool = False,
+                         specs: Dict[str, List[IndexSpec]] = None) -> List[Dict[str, Any]]:
+    """
+    Idempotently bring the database indexes in line with the spec
+
+    Missing indexes are created, indexes whose options changed are dropped
+    and recreated, and indexes outside the spec are left alone unless
+    drop_unmanaged is set. With dry_run nothing is modified. A change whose
+    index could not be created carries the reason in change["error"].
+    """
+    changes = await diff_indexes(database, specs)
+    if dry_run:
+        return changes
+
+    to_create: Dict[str, List[Dict[str, Any]]] = {}
+    for change in changes:
+        collection = database[change["collection"]]
+        if change["action"] == "rebuild":
+            logger.info(f"Rebuilding index {change['collection']}.{change['name']}")
+            await collection.drop_index(change["name"])
+        elif change["action"] == "unmanaged" and drop_unmanaged:
+            logger.info(f"Dropping unmanaged index {change['collection']}.{change['name']}")
+            await collection.drop_index(change["name"])
+            continue
+        if change["action"] in ("create", "rebuild"):
+            to_create.setdefault(change["collection"], []).append(change)
+
+    for collection, pending in to_create.items():
+        # One index per command so a single failure (e.g. existing duplicates
+        # blocking a unique index) does not hold back the rest
+        for change in pending:
+            model = change["spec"].to_model()
+            try:
+                await database[collection].create_indexes([model])
+                logger.info(f"Created index {collection}.{model.document['name']}")
+            except Exception as e:
+                change["error"] = str(e)
+                logger.error(f"Failed to create index {collection}.{model.document['name']}: {e}")
+
+    return changes
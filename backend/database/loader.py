@@ -0,0 +1,96 @@
+import asyncio
+from typing import Optional, List, Dict, Any
+from .mongodb import DatabaseOperations
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields needed by the routes that resolve names for aggregation results.
+# Keeping these narrow also keeps password hashes out of report code paths.
+DEFAULT_PROJECTIONS: Dict[str, Dict[str, Any]] = {
+    "users": {"_id": 0, "id": 1, "name": 1, "role": 1, "email": 1, "avatar": 1},
+    "projects": {"_id": 0, "id": 1, "name": 1, "budget": 1, "spent": 1, "status": 1},
+    "tasks": {"_id": 0, "id": 1, "title": 1, "project_id": 1, "status": 1},
+}
+
+class EntityLoader:
+    """
+    Per-request batching loader for documents looked up by their `id` field.
+
+    Every `load()` issued during the same event loop tick is coalesced into one
+    `$in` query per collection, and repeated ids are only fetched once for the
+    lifetime of the loader. Create one loader per request (see
+    `get_entity_loader`) so results never leak between requests.
+    """
+
+    def __init__(self, projections: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.projections = {**DEFAULT_PROJECTIONS, **(projections or {})}
+        self._futures: Dict[str, Dict[str, asyncio.Future]] = {}
+        self._pending: Dict[str, List[str]] = {}
+        self._dispatch_scheduled = False
+        # Running fetches; the event loop only keeps weak references to tasks
+        self._tasks: set = set()
+
+    def load(self, collection: str, doc_id: str) -> "asyncio.Future[Optional[Dict[str, Any]]]":
+        """Schedule a lookup and return a future resolving to the document or None"""
+        futures = self._futures.setdefault(collection, {})
+        future = futures.get(doc_id)
+        if future is not None:
+            return future
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        futures[doc_id] = future
+        self._pending.setdefault(collection, []).append(doc_id)
+
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._dispatch)
+
+        return future
+
+    async def load_many(self, collection: str, doc_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Load several documents at once, returning a mapping of id to document (or None)"""
+        unique_ids = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id is not None))
+        documents = await asyncio.gather(*(self.load(collection, doc_id) for doc_id in unique_ids))
+        return dict(zip(unique_ids, documents))
+
+    def prime(self, collection: str, document: Dict[str, Any]):
+        """Seed the loader with a document that was already fetched"""
+        futures = self._futures.setdefault(collection, {})
+        if document.get("id") in futures:
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(document)
+        futures[document["id"]] = future
+
+    def _dispatch(self):
+        self._dispatch_scheduled = False
+        pending, self._pending = self._pending, {}
+        for collection, doc_ids in pending.items():
+            task = asyncio.create_task(self._fetch(collection, doc_ids))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, collection: str, doc_ids: List[str]):
+        futures = self._futures[collection]
+        try:
+            documents = await DatabaseOperations.get_documents_by_ids(
+                collection, doc_ids, self.projections.get(collection)
+            )
+        except Exception as e:
+            logger.error(f"Batched {collection} lookup failed: {e}")
+            for doc_id in doc_ids:
+                future = futures.pop(doc_id)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for doc_id in doc_ids:
+            future = futures[doc_id]
+            if not future.done():
+                future.set_result(documents.get(doc_id))
+
+def get_entity_loader() -> EntityLoader:
+    """FastAPI dependency providing a fresh loader for each request"""
+    return EntityLoader()
@@ -1,8 +1,11 @@
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, List, Dict, Any
+from pymongo import ReturnDocument
+from bson import ObjectId
+from typing import Optional, List, Dict, Any, Union
 import os
 from datetime import datetime
 import logging
+from .indexes import ensure_indexes
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +15,7 @@ class MongoDB:
 
 db = MongoDB()
 
-async def connect_to_mongo():
+async def connect_to_mongo(apply_indexes: bool = True):
     """Create database connection"""
     try:
         db.client = AsyncIOMotorClient(os.environ["MONGO_URL"])
@@ -23,7 +26,8 @@ async def connect_to_mongo():
         logger.info("Connected to MongoDB successfully")
         
         # Create indexes
-        await create_indexes()
+        if apply_indexes:
+            await create_indexes()
         
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
@@ -36,44 +40,12 @@ async def close_mongo_connection():
         logger.info("Disconnected from MongoDB")
 
 async def create_indexes():
-    """Create database indexes for better performance"""
+    """Bring database indexes in line with the declarative spec in database.indexes"""
     try:
-        # User indexes
-        await db.database.users.create_index("email", unique=True)
-        await db.database.users.create_index("role")
-        
-        # Project indexes
-        await db.database.projects.create_index("created_by")
-        await db.database.projects.create_index("status")
-        await db.database.projects.create_index("team_members")
-        
-        # Task indexes
-        await db.database.tasks.create_index("project_id")
-        await db.database.tasks.create_index("assignee_id")
-        await db.database.tasks.create_index("status")
-        
-        # Time entry indexes
-        await db.database.time_entries.create_index("user_id")
-        await db.database.time_entries.create_index("project_id")
-        await db.database.time_entries.create_index("start_time")
-        await db.database.time_entries.create_index([("user_id", 1), ("start_time", -1)])
-        
-        # Activity data indexes
-        await db.database.activity_data.create_index("user_id")
-        await db.database.activity_data.create_index("time_entry_id")
-        await db.database.activity_data.create_index("timestamp")
-        
-        # Screenshot indexes
-        await db.database.screenshots.create_index("user_id")
-        await db.database.screenshots.create_index("time_entry_id")
-        await db.database.screenshots.create_index("timestamp")
-        
-        # Password reset token indexes
-        await db.database.password_reset_tokens.create_index("email")
-        await db.database.password_reset_tokens.create_index("token", unique=True)
-        await db.database.password_reset_tokens.create_index("expires_at")
-        
-        logger.info("Database indexes created successfully")
+        changes = await ensure_indexes(db.database)
+        applied = [change for change in changes if change["action"] in ("create", "rebuild")]
+        failed = [change for change in applied if "error" in change]
+        logger.info(f"Database indexes verified ({len(applied) - len(failed)} created or rebuilt, {len(failed)} failed)")
         
     except Exception as e:
         logger.error(f"Failed to create indexes: {e}")
@@ -87,6 +59,14 @@ class DatabaseOperations:
         result = await db.database[collection].insert_one(document)
         return str(result.inserted_id)
     
+    @staticmethod
+    async def create_documents(collection: str, documents: List[Dict[str, Any]], ordered: bool = True) -> int:
+        """Create several documents with one insert_many call, returning the number inserted"""
+        if not documents:
+            return 0
+        result = await db.database[collection].insert_many(documents, ordered=ordered)
+        return len(result.inserted_ids)
+    
     @staticmethod
     async def get_document(collection: str, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Get a single document from the collection"""
@@ -97,12 +77,13 @@ class DatabaseOperations:
     
     @staticmethod
     async def get_documents(collection: str, query: Dict[str, Any] = None, 
-                          sort: List = None, limit: int = None, skip: int = 0) -> List[Dict[str, Any]]:
+                          sort: List = None, limit: int = None, skip: int = 0,
+                          projection: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """Get multiple documents from the collection"""
         if query is None:
             query = {}
         
-        cursor = db.database[collection].find(query)
+        cursor = db.database[collection].find(query, projection)
         
         if sort:
             cursor = cursor.sort(sort)
@@ -113,14 +94,38 @@ class DatabaseOperations:
         
         results = await cursor.to_list(length=limit)
         for result in results:
-            result["_id"] = str(result["_id"])
+            if "_id" in result:
+                result["_id"] = str(result["_id"])
         
         return results
-    
+
+    @staticmethod
+    async def get_documents_by_ids(collection: str, ids: List[str],
+                                   projection: Dict[str, Any] = None) -> Dict[str, Dict[str, Any]]:
+        """Get documents by their `id` field with a single $in query, keyed by id"""
+        unique_ids = list({doc_id for doc_id in ids if doc_id is not None})
+        if not unique_ids:
+            return {}
+
+        if projection and any(value for key, value in projection.items() if key != "_id"):
+            # Inclusion projections must keep the id field to key the results
+            projection = {**projection, "id": 1}
+
+        cursor = db.database[collection].find({"id": {"$in": unique_ids}}, projection)
+        results = await cursor.to_list(length=None)
+
+        documents = {}
+        for result in results:
+            if "_id" in result:
+                result["_id"] = str(result["_id"])
+            documents[result["id"]] = result
+
+        return documents
+
     @staticmethod
     async def update_document(collection: str, query: Dict[str, Any], 
-                            update: Dict[str, Any]) -> bool:
-        """Update a document in the collection"""
+                            update: Dict[str, Any], upsert: bool = False) -> bool:
+        """Update a document in the collection (optionally inserting it if missing)"""
         # Check if update contains MongoDB operators
         has_operators = any(key.startswith('$') for key in update.keys())
         
@@ -131,13 +136,38 @@ class DatabaseOperations:
                 update["$set"]["updated_at"] = datetime.utcnow()
             else:
                 update["$set"] = {"updated_at": datetime.utcnow()}
-            result = await db.database[collection].update_one(query, update)
+            result = await db.database[collection].update_one(query, update, upsert=upsert)
         else:
             # Traditional update with $set
             update["updated_at"] = datetime.utcnow()
-            result = await db.database[collection].update_one(query, {"$set": update})
+            result = await db.database[collection].update_one(query, {"$set": update}, upsert=upsert)
         
-        return result.modified_count > 0
+        return result.modified_count > 0 or result.upserted_id is not None
+    
+    @staticmethod
+    async def find_one_and_update(collection: str, query: Dict[str, Any],
+                                  update: Union[Dict[str, Any], List[Dict[str, Any]]],
+                                  sort: List = None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically update the first document matching query and return it after the update
+        
+        The update may be an operator document or an aggregation pipeline
+        (list of stages). sort picks which document is first when several
+        match. Returns None when no document matched.
+        """
+        if isinstance(update, list):
+            update = update + [{"$set": {"updated_at": datetime.utcnow()}}]
+        elif "$set" in update:
+            update["$set"]["updated_at"] = datetime.utcnow()
+        else:
+            update["$set"] = {"updated_at": datetime.utcnow()}
+        
+        result = await db.database[collection].find_one_and_update(
+            query, update, sort=sort, return_document=ReturnDocument.AFTER
+        )
+        if result:
+            result["_id"] = str(result["_id"])
+        return result
     
     @staticmethod
     async def update_documents(collection: str, query: Dict[str, Any], 
@@ -147,12 +177,26 @@ class DatabaseOperations:
         result = await db.database[collection].update_many(query, {"$set": update})
         return result.modified_count
     
+    @staticmethod
+    async def bulk_write(collection: str, operations: List[Any], ordered: bool = False) -> int:
+        """Apply a list of pymongo write operations in one command, returning the number modified"""
+        if not operations:
+            return 0
+        result = await db.database[collection].bulk_write(operations, ordered=ordered)
+        return result.modified_count + result.upserted_count
+    
     @staticmethod
     async def delete_document(collection: str, query: Dict[str, Any]) -> bool:
         """Delete a document from the collection"""
         result = await db.database[collection].delete_one(query)
         return result.deleted_count > 0
     
+    @staticmethod
+    async def delete_documents(collection: str, query: Dict[str, Any]) -> int:
+        """Delete all documents matching the query, returning how many were removed"""
+        result = await db.database[collection].delete_many(query)
+        return result.deleted_count
+    
     @staticmethod
     async def count_documents(collection: str, query: Dict[str, Any] = None) -> int:
         """Count documents in the collection"""
@@ -166,7 +210,8 @@ class DatabaseOperations:
         cursor = db.database[collection].aggregate(pipeline)
         results = await cursor.to_list(None)
         for result in results:
-            if "_id" in result:
+            # Only ObjectIds need converting; group keys may be compound documents
+            if isinstance(result.get("_id"), ObjectId):
                 result["_id"] = str(result["_id"])
         return results
 
@@ -7,6 +7,8 @@ Usage:
     python -m management.admin reset-password --email admin@example.com --password newpassword123
     python -m management.admin list-users
     python -m management.admin setup-database
+    python -m management.admin ensure-indexes --dry-run
+    python -m management.admin rebuild-rollups --since 2024-01-01
 """
 
 import asyncio
@@ -14,12 +16,15 @@ import argparse
 import sys
 from pathlib import Path
 from typing import Optional
+from datetime import date
 
 # Add the backend directory to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from dotenv import load_dotenv
-from database.mongodb import DatabaseOperations, connect_to_mongo, close_mongo_connection
+from database.mongodb import DatabaseOperations, connect_to_mongo, close_mongo_connection, db
+from database.indexes import ensure_indexes
+from services.rollups import rollup_service
 from auth.jwt_handler import hash_password
 from models.user import User
 from config import settings
@@ -35,10 +40,10 @@ class AdminManager:
     def __init__(self):
         self.db_connected = False
     
-    async def ensure_db_connection(self):
+    async def ensure_db_connection(self, apply_indexes: bool = True):
         """Ensure database connection is established"""
         if not self.db_connected:
-            await connect_to_mongo()
+            await connect_to_mongo(apply_indexes=apply_indexes)
             self.db_connected = True
     
     async def create_admin_user(self, email: str, name: str, password: str, company: str = "Hubstaff Clone") -> bool:
@@ -207,6 +212,71 @@ class AdminManager:
             logger.error(f"Failed to setup database: {e}")
             return False
     
+    async def ensure_indexes(self, dry_run: bool = False, drop_unmanaged: bool = False) -> bool:
+        """
+        Diff the declarative index spec against listIndexes and apply it
+        
+        Args:
+            dry_run: Only print the diff, do not modify any index
+            drop_unmanaged: Drop indexes that exist but are not in the spec
+            
+        Returns:
+            bool: True if operation completed successfully
+        """
+        try:
+            await self.ensure_db_connection(apply_indexes=False)
+            
+            changes = await ensure_indexes(db.database, dry_run=dry_run, drop_unmanaged=drop_unmanaged)
+            
+            logger.info(f"\n{'='*80}")
+            logger.info(f"{'Action':<10} {'Collection':<24} {'Index':<44}")
+            logger.info(f"{'='*80}")
+            
+            for change in changes:
+                logger.info(f"{change['action']:<10} {change['collection']:<24} {change['name']:<44} {change['detail']}")
+            
+            pending = [change for change in changes if change["action"] in ("create", "rebuild")]
+            failed = [change for change in pending if "error" in change]
+            logger.info(f"{'='*80}")
+            if dry_run:
+                logger.info(f"Dry run: {len(pending)} index change(s) pending, nothing modified")
+                return True
+            
+            for change in failed:
+                logger.error(f"✗ {change['collection']}.{change['name']}: {change['error']}")
+            if failed:
+                logger.error(f"Applied {len(pending) - len(failed)} of {len(pending)} index change(s), {len(failed)} failed")
+                return False
+            
+            logger.info(f"✓ Applied {len(pending)} index change(s)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to ensure indexes: {e}")
+            return False
+    
+    async def rebuild_rollups(self, since: Optional[date] = None) -> bool:
+        """
+        Recompute the daily time rollups from the raw time entries
+        
+        Args:
+            since: Only rebuild days on or after this date
+            
+        Returns:
+            bool: True if operation completed successfully
+        """
+        try:
+            await self.ensure_db_connection()
+            
+            written = await rollup_service.rebuild(since=since)
+            scope = f"since {since.isoformat()}" if since else "for all time"
+            logger.info(f"✓ Rebuilt time rollups {scope} ({written} document(s) changed)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to rebuild rollups: {e}")
+            return False
+    
     async def cleanup(self):
         """Cleanup database connections"""
         if self.db_connected:
@@ -236,6 +306,15 @@ async def main():
     # Setup database command
     subparsers.add_parser('setup-database', help='Setup database with initial configuration')
     
+    # Ensure indexes command
+    indexes_parser = subparsers.add_parser('ensure-indexes', help='Diff and apply the declarative index spec')
+    indexes_parser.add_argument('--dry-run', action='store_true', help='Show the diff without modifying indexes')
+    indexes_parser.add_argument('--drop-unmanaged', action='store_true', help='Drop indexes that are not in the spec')
+    
+    # Rebuild rollups command
+    rollups_parser = subparsers.add_parser('rebuild-rollups', help='Recompute daily time rollups from time entries')
+    rollups_parser.add_argument('--since', type=date.fromisoformat, help='Only rebuild days on or after this date (YYYY-MM-DD)')
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -269,6 +348,17 @@ async def main():
             success = await admin_manager.setup_database()
             sys.exit(0 if success else 1)
             
+        elif args.command == 'ensure-indexes':
+            success = await admin_manager.ensure_indexes(
+                dry_run=args.dry_run,
+                drop_unmanaged=args.drop_unmanaged
+            )
+            sys.exit(0 if success else 1)
+            
+        elif args.command == 'rebuild-rollups':
+            success = await admin_manager.rebuild_rollups(since=args.since)
+            sys.exit(0 if success else 1)
+            
     except KeyboardInterrupt:
         logger.info("\nOperation cancelled by user")
         sys.exit(1)
@@ -0,0 +1,40 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from enum import Enum
+import secrets
+import uuid
+
+class WebhookEvent(str, Enum):
+    TIME_ENTRY_STARTED = "time_entry.started"
+    TIME_ENTRY_STOPPED = "time_entry.stopped"
+    TASK_UPDATED = "task.updated"
+    PROJECT_UPDATED = "project.updated"
+
+class WebhookScope(str, Enum):
+    USER = "user"  # events caused by the subscription's owner
+    ORG = "org"    # every event (admins and managers only)
+
+class WebhookSubscription(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    user_id: str
+    url: str
+    events: List[WebhookEvent]
+    scope: WebhookScope = WebhookScope.USER
+    secret: str = Field(default_factory=lambda: secrets.token_hex(32))
+    batch_size: int = 1  # events per POST; above 1 the body is {"events": [...]}
+    active: bool = True
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class WebhookSubscriptionCreate(BaseModel):
+    url: str
+    events: List[WebhookEvent]
+    scope: WebhookScope = WebhookScope.USER
+    batch_size: int = Field(default=1, ge=1, le=100)
+
+class WebhookSubscriptionUpdate(BaseModel):
+    url: Optional[str] = None
+    events: Optional[List[WebhookEvent]] = None
+    batch_size: Optional[int] = Field(default=None, ge=1, le=100)
+    active: Optional[bool] = None
@@ -1,134 +1,184 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
+from typing import List, Optional, Dict, Any, Awaitable
 from datetime import datetime, timedelta, date
+import asyncio
+import time
 from models.user import User
 from auth.dependencies import get_current_user, require_admin_or_manager
 from database.mongodb import DatabaseOperations
+from database.loader import EntityLoader, get_entity_loader
+from services.rollups import ROLLUP_COLLECTION
+from services.cache import response_cache, user_tag, PROJECTS_TAG
+from services.singleflight import singleflight
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+# Dashboards read the time_rollups collection (one document per user,
+# project, task and day), so their cost scales with the number of days in
+# the range rather than the number of time entries.
+_ROLLUP_SUMS = {
+    "seconds": {"$sum": "$seconds"},
+    "entries": {"$sum": "$entries"},
+    "activity_sum": {"$sum": "$activity_sum"},
+    "activity_samples": {"$sum": "$activity_samples"}
+}
+
+# Cached analytics are tagged with the scopes they read: a user's dashboard
+# is dropped when that user's rollups or any project changes. Team analytics
+# span every user, so only project changes drop them and new time is picked
+# up by the TTL and background refresh instead of on every stopped timer.
+# User documents only contribute names here, which the TTL keeps current.
+_TEAM_ANALYTICS_TAGS = (PROJECTS_TAG,)
+
+def _day_range(start: date, end: date) -> Dict[str, str]:
+    return {"$gte": start.isoformat(), "$lte": end.isoformat()}
+
+def _avg_activity(group: Dict[str, Any]) -> float:
+    samples = group.get("activity_samples") or 0
+    return group.get("activity_sum", 0) / samples if samples > 0 else 0
+
+async def _timed(name: str, query: Awaitable, timings: Dict[str, float]):
+    started = time.perf_counter()
+    try:
+        return await query
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+async def _run_concurrently(queries: Dict[str, Awaitable], timings: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Run independent aggregations concurrently, so the endpoint takes about
+    as long as its slowest query. Per-query timings are added to `timings`
+    and the debug log.
+    """
+    results = await asyncio.gather(*(_timed(name, query, timings) for name, query in queries.items()))
+    logger.debug("Aggregation timings: " + ", ".join(f"{name}={elapsed:.1f}ms" for name, elapsed in timings.items()))
+    return dict(zip(queries, results))
+
+def _set_server_timing(response: Response, timings: Dict[str, float]):
+    """Report the aggregations this request ran; cached responses ran none"""
+    if timings:
+        response.headers["Server-Timing"] = ", ".join(f"{name};dur={elapsed:.1f}" for name, elapsed in timings.items())
+
+async def _compute_dashboard_analytics(current_user: User, timings: Dict[str, float]) -> Dict[str, Any]:
+    """Build the dashboard analytics response for a single user"""
+    # Own loader: a background refresh may run after the request has finished
+    loader = EntityLoader()
+    # Time range for analysis
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=30)
+
+    # User's time tracking stats
+    user_pipeline = [
+        {
+            "$match": {
+                "user_id": current_user.id,
+                "day": _day_range(start_date.date(), end_date.date())
+            }
+        },
+        {
+            "$group": {
+                "_id": None,
+                **_ROLLUP_SUMS,
+                "projects": {"$addToSet": "$project_id"}
+            }
+        }
+    ]
+
+    # Daily productivity trend (last 7 days)
+    daily_pipeline = [
+        {
+            "$match": {
+                "user_id": current_user.id,
+                "day": _day_range((end_date - timedelta(days=7)).date(), end_date.date())
+            }
+        },
+        {"$group": {"_id": "$day", **_ROLLUP_SUMS}},
+        {"$sort": {"_id": 1}}
+    ]
+
+    # Project breakdown
+    project_pipeline = [
+        {
+            "$match": {
+                "user_id": current_user.id,
+                "day": _day_range(start_date.date(), end_date.date())
+            }
+        },
+        {"$group": {"_id": "$project_id", **_ROLLUP_SUMS}},
+        {"$sort": {"seconds": -1}},
+        {"$limit": 10}
+    ]
+
+    results = await _run_concurrently({
+        "user_stats": DatabaseOperations.aggregate(ROLLUP_COLLECTION, user_pipeline),
+        "daily_trend": DatabaseOperations.aggregate(ROLLUP_COLLECTION, daily_pipeline),
+        "project_breakdown": DatabaseOperations.aggregate(ROLLUP_COLLECTION, project_pipeline)
+    }, timings)
+    user_stats = results["user_stats"]
+    daily_data = results["daily_trend"]
+    project_data = results["project_breakdown"]
+
+    user_totals = user_stats[0] if user_stats else {"seconds": 0, "entries": 0, "projects": []}
+
+    # Convert seconds to hours
+    user_data = {
+        "total_hours": user_totals["seconds"] / 3600,
+        "total_entries": user_totals["entries"],
+        "avg_session": user_totals["seconds"] / user_totals["entries"] / 3600 if user_totals["entries"] else 0,
+        "projects": user_totals["projects"],
+        "projects_count": len(user_totals["projects"])
+    }
+
+    # Format daily data
+    productivity_trend = []
+    for day in daily_data:
+        productivity_trend.append({
+            "date": day["_id"],
+            "hours": round(day["seconds"] / 3600, 2),
+            "activity": round(_avg_activity(day), 1)
+        })
+
+    # Get project names and format data
+    projects = await loader.load_many("projects", [project["_id"] for project in project_data])
+    project_breakdown = []
+    for project in project_data:
+        project_info = projects.get(project["_id"])
+        project_breakdown.append({
+            "project_id": project["_id"],
+            "project_name": project_info["name"] if project_info else "Unknown",
+            "hours": round(project["seconds"] / 3600, 2),
+            "entries": project["entries"],
+            "avg_activity": round(_avg_activity(project), 1)
+        })
+
+    return {
+        "user_stats": user_data,
+        "productivity_trend": productivity_trend,
+        "project_breakdown": project_breakdown,
+        "period": {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat()
+        }
+    }
+
 @router.get("/dashboard")
 async def get_dashboard_analytics(
+    response: Response,
     current_user: User = Depends(get_current_user)
 ):
     """Get dashboard analytics data"""
     try:
-        # Time range for analysis
-        end_date = datetime.utcnow()
-        start_date = end_date - timedelta(days=30)
-        
-        # User's time tracking stats
-        user_pipeline = [
-            {
-                "$match": {
-                    "user_id": current_user.id,
-                    "start_time": {"$gte": start_date, "$lte": end_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "total_hours": {"$sum": "$duration"},
-                    "total_entries": {"$sum": 1},
-                    "avg_session": {"$avg": "$duration"},
-                    "projects": {"$addToSet": "$project_id"}
-                }
-            }
-        ]
-        
-        user_stats = await DatabaseOperations.aggregate("time_entries", user_pipeline)
-        user_data = user_stats[0] if user_stats else {
-            "total_hours": 0,
-            "total_entries": 0,
-            "avg_session": 0,
-            "projects": []
-        }
-        
-        # Convert seconds to hours
-        user_data["total_hours"] = user_data["total_hours"] / 3600
-        user_data["avg_session"] = user_data["avg_session"] / 3600
-        user_data["projects_count"] = len(user_data["projects"])
-        
-        # Daily productivity trend (last 7 days)
-        daily_pipeline = [
-            {
-                "$match": {
-                    "user_id": current_user.id,
-                    "start_time": {"$gte": end_date - timedelta(days=7), "$lte": end_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": "%Y-%m-%d",
-                            "date": "$start_time"
-                        }
-                    },
-                    "hours": {"$sum": "$duration"},
-                    "activity": {"$avg": "$activity_level"}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]
-        
-        daily_data = await DatabaseOperations.aggregate("time_entries", daily_pipeline)
-        
-        # Format daily data
-        productivity_trend = []
-        for day in daily_data:
-            productivity_trend.append({
-                "date": day["_id"],
-                "hours": round(day["hours"] / 3600, 2),
-                "activity": round(day["activity"] or 0, 1)
-            })
-        
-        # Project breakdown
-        project_pipeline = [
-            {
-                "$match": {
-                    "user_id": current_user.id,
-                    "start_time": {"$gte": start_date, "$lte": end_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$project_id",
-                    "hours": {"$sum": "$duration"},
-                    "entries": {"$sum": 1},
-                    "avg_activity": {"$avg": "$activity_level"}
-                }
-            },
-            {"$sort": {"hours": -1}},
-            {"$limit": 10}
-        ]
-        
-        project_data = await DatabaseOperations.aggregate("time_entries", project_pipeline)
-        
-        # Get project names and format data
-        project_breakdown = []
-        for project in project_data:
-            project_info = await DatabaseOperations.get_document("projects", {"id": project["_id"]})
-            project_breakdown.append({
-                "project_id": project["_id"],
-                "project_name": project_info["name"] if project_info else "Unknown",
-                "hours": round(project["hours"] / 3600, 2),
-                "entries": project["entries"],
-                "avg_activity": round(project["avg_activity"] or 0, 1)
-            })
-        
-        return {
-            "user_stats": user_data,
-            "productivity_trend": productivity_trend,
-            "project_breakdown": project_breakdown,
-            "period": {
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat()
-            }
-        }
-        
+        timings: Dict[str, float] = {}
+        result = await response_cache.get_or_set(
+            response_cache.make_key("analytics.dashboard", f"user:{current_user.id}"),
+            lambda: _compute_dashboard_analytics(current_user, timings),
+            tags=(user_tag(current_user.id), PROJECTS_TAG)
+        )
+        _set_server_timing(response, timings)
+        return result
+
     except Exception as e:
         logger.error(f"Dashboard analytics error: {e}")
         raise HTTPException(
@@ -136,151 +186,243 @@ async def get_dashboard_analytics(
             detail="Failed to get dashboard analytics"
         )
 
+async def _compute_team_analytics(start_date: Optional[date], end_date: Optional[date],
+                                  timings: Dict[str, float]) -> Dict[str, Any]:
+    """Build the organisation-wide team analytics response"""
+    loader = EntityLoader()
+    if not start_date:
+        start_date = (datetime.utcnow() - timedelta(days=30)).date()
+    if not end_date:
+        end_date = datetime.utcnow().date()
+
+    day_match = {"$match": {"day": _day_range(start_date, end_date)}}
+
+    # Team productivity stats
+    team_pipeline = [
+        day_match,
+        {
+            "$group": {
+                "_id": "$user_id",
+                **_ROLLUP_SUMS,
+                "projects": {"$addToSet": "$project_id"}
+            }
+        }
+    ]
+
+    # Daily team productivity
+    daily_team_pipeline = [
+        day_match,
+        {
+            "$group": {
+                "_id": "$day",
+                **_ROLLUP_SUMS,
+                "active_users": {"$addToSet": "$user_id"}
+            }
+        },
+        {"$sort": {"_id": 1}}
+    ]
+
+    # Project analytics
+    project_analytics_pipeline = [
+        day_match,
+        {
+            "$group": {
+                "_id": "$project_id",
+                **_ROLLUP_SUMS,
+                "team_members": {"$addToSet": "$user_id"}
+            }
+        },
+        {"$sort": {"seconds": -1}}
+    ]
+
+    results = await _run_concurrently({
+        "team_stats": DatabaseOperations.aggregate(ROLLUP_COLLECTION, team_pipeline),
+        "daily_productivity": DatabaseOperations.aggregate(ROLLUP_COLLECTION, daily_team_pipeline),
+        "project_stats": DatabaseOperations.aggregate(ROLLUP_COLLECTION, project_analytics_pipeline)
+    }, timings)
+    team_data = results["team_stats"]
+    daily_team_data = results["daily_productivity"]
+    project_analytics = results["project_stats"]
+
+    # Get user and project details
+    users, projects = await asyncio.gather(
+        loader.load_many("users", [member["_id"] for member in team_data]),
+        loader.load_many("projects", [project["_id"] for project in project_analytics])
+    )
+
+    team_stats = []
+    for member in team_data:
+        user_info = users.get(member["_id"])
+        if user_info:
+            team_stats.append({
+                "user_id": member["_id"],
+                "user_name": user_info["name"],
+                "user_role": user_info["role"],
+                "total_hours": round(member["seconds"] / 3600, 2),
+                "total_entries": member["entries"],
+                "avg_activity": round(_avg_activity(member), 1),
+                "projects_count": len(member["projects"])
+            })
+
+    # Sort by total hours
+    team_stats.sort(key=lambda x: x["total_hours"], reverse=True)
+
+    daily_productivity = []
+    for day in daily_team_data:
+        daily_productivity.append({
+            "date": day["_id"],
+            "total_hours": round(day["seconds"] / 3600, 2),
+            "avg_activity": round(_avg_activity(day), 1),
+            "active_users": len(day["active_users"])
+        })
+
+    project_stats = []
+    for project in project_analytics:
+        project_info = projects.get(project["_id"])
+        if project_info:
+            project_stats.append({
+                "project_id": project["_id"],
+                "project_name": project_info["name"],
+                "total_hours": round(project["seconds"] / 3600, 2),
+                "team_members": len(project["team_members"]),
+                "avg_activity": round(_avg_activity(project), 1),
+                "budget": project_info.get("budget", 0),
+                "spent": project_info.get("spent", 0)
+            })
+
+    return {
+        "team_stats": team_stats,
+        "daily_productivity": daily_productivity,
+        "project_stats": project_stats,
+        "summary": {
+            "total_team_hours": sum(member["total_hours"] for member in team_stats),
+            "avg_team_activity": sum(member["avg_activity"] for member in team_stats) / len(team_stats) if team_stats else 0,
+            "active_projects": len(project_stats),
+            "team_size": len(team_stats)
+        },
+        "period": {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat()
+        }
+    }
+
 @router.get("/team")
 async def get_team_analytics(
+    response: Response,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     current_user: User = Depends(require_admin_or_manager)
 ):
     """Get team analytics (admin/manager only)"""
     try:
-        if not start_date:
-            start_date = (datetime.utcnow() - timedelta(days=30)).date()
-        if not end_date:
-            end_date = datetime.utcnow().date()
-        
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
-        
-        # Team productivity stats
-        team_pipeline = [
-            {
-                "$match": {
-                    "start_time": {"$gte": start_datetime, "$lte": end_datetime}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$user_id",
-                    "total_hours": {"$sum": "$duration"},
-                    "total_entries": {"$sum": 1},
-                    "avg_activity": {"$avg": "$activity_level"},
-                    "projects": {"$addToSet": "$project_id"}
-                }
-            }
-        ]
-        
-        team_data = await DatabaseOperations.aggregate("time_entries", team_pipeline)
-        
-        # Get user details and format data
-        team_stats = []
-        for member in team_data:
-            user_info = await DatabaseOperations.get_document("users", {"id": member["_id"]})
-            if user_info:
-                team_stats.append({
-                    "user_id": member["_id"],
-                    "user_name": user_info["name"],
-                    "user_role": user_info["role"],
-                    "total_hours": round(member["total_hours"] / 3600, 2),
-                    "total_entries": member["total_entries"],
-                    "avg_activity": round(member["avg_activity"] or 0, 1),
-                    "projects_count": len(member["projects"])
-                })
-        
-        # Sort by total hours
-        team_stats.sort(key=lambda x: x["total_hours"], reverse=True)
-        
-        # Daily team productivity
-        daily_team_pipeline = [
+        timings: Dict[str, float] = {}
+        result = await response_cache.get_or_set(
+            response_cache.make_key("analytics.team", f"role:{current_user.role}",
+                                    start_date=start_date, end_date=end_date),
+            lambda: _compute_team_analytics(start_date, end_date, timings),
+            tags=_TEAM_ANALYTICS_TAGS
+        )
+        _set_server_timing(response, timings)
+        return result
+
+    except Exception as e:
+        logger.error(f"Team analytics error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get team analytics"
+        )
+
+async def _compute_productivity_analytics(period: str, current_user: User) -> Dict[str, Any]:
+    """Build the productivity chart for one user and period"""
+    # Calculate date range based on period
+    end_date = datetime.utcnow()
+    if period == "day":
+        start_date = end_date - timedelta(days=1)
+    elif period == "week":
+        start_date = end_date - timedelta(days=7)
+    else:  # month
+        start_date = end_date - timedelta(days=30)
+
+    if period == "day":
+        # Hourly buckets are finer than the daily rollups; a single day
+        # of one user's raw entries is small enough to aggregate directly
+        productivity_pipeline = [
             {
                 "$match": {
-                    "start_time": {"$gte": start_datetime, "$lte": end_datetime}
+                    "user_id": current_user.id,
+                    "start_time": {"$gte": start_date, "$lte": end_date}
                 }
             },
             {
                 "$group": {
                     "_id": {
                         "$dateToString": {
-                            "format": "%Y-%m-%d",
+                            "format": "%Y-%m-%d %H:00",
                             "date": "$start_time"
                         }
                     },
-                    "total_hours": {"$sum": "$duration"},
-                    "avg_activity": {"$avg": "$activity_level"},
-                    "active_users": {"$addToSet": "$user_id"}
+                    "seconds": {"$sum": "$duration"},
+                    "entries": {"$sum": 1},
+                    "activity_sum": {"$sum": {"$ifNull": ["$activity_level", 0]}},
+                    "activity_samples": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$activity_level", None]}, None]}, 0, 1]}},
+                    "mouse_clicks": {"$sum": {"$ifNull": ["$mouse_clicks", 0]}},
+                    "keyboard_strokes": {"$sum": {"$ifNull": ["$keyboard_strokes", 0]}}
                 }
             },
             {"$sort": {"_id": 1}}
         ]
-        
-        daily_team_data = await DatabaseOperations.aggregate("time_entries", daily_team_pipeline)
-        
-        daily_productivity = []
-        for day in daily_team_data:
-            daily_productivity.append({
-                "date": day["_id"],
-                "total_hours": round(day["total_hours"] / 3600, 2),
-                "avg_activity": round(day["avg_activity"] or 0, 1),
-                "active_users": len(day["active_users"])
-            })
-        
-        # Project analytics
-        project_analytics_pipeline = [
+        collection = "time_entries"
+    else:
+        productivity_pipeline = [
             {
                 "$match": {
-                    "start_time": {"$gte": start_datetime, "$lte": end_datetime}
+                    "user_id": current_user.id,
+                    "day": _day_range(start_date.date(), end_date.date())
                 }
             },
             {
                 "$group": {
-                    "_id": "$project_id",
-                    "total_hours": {"$sum": "$duration"},
-                    "team_members": {"$addToSet": "$user_id"},
-                    "avg_activity": {"$avg": "$activity_level"}
+                    "_id": "$day",
+                    **_ROLLUP_SUMS,
+                    "mouse_clicks": {"$sum": "$mouse_clicks"},
+                    "keyboard_strokes": {"$sum": "$keyboard_strokes"}
                 }
             },
-            {"$sort": {"total_hours": -1}}
+            {"$sort": {"_id": 1}}
         ]
-        
-        project_analytics = await DatabaseOperations.aggregate("time_entries", project_analytics_pipeline)
-        
-        # Get project details
-        project_stats = []
-        for project in project_analytics:
-            project_info = await DatabaseOperations.get_document("projects", {"id": project["_id"]})
-            if project_info:
-                project_stats.append({
-                    "project_id": project["_id"],
-                    "project_name": project_info["name"],
-                    "total_hours": round(project["total_hours"] / 3600, 2),
-                    "team_members": len(project["team_members"]),
-                    "avg_activity": round(project["avg_activity"] or 0, 1),
-                    "budget": project_info.get("budget", 0),
-                    "spent": project_info.get("spent", 0)
-                })
-        
-        return {
-            "team_stats": team_stats,
-            "daily_productivity": daily_productivity,
-            "project_stats": project_stats,
-            "summary": {
-                "total_team_hours": sum(member["total_hours"] for member in team_stats),
-                "avg_team_activity": sum(member["avg_activity"] for member in team_stats) / len(team_stats) if team_stats else 0,
-                "active_projects": len(project_stats),
-                "team_size": len(team_stats)
-            },
-            "period": {
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat()
-            }
+        collection = ROLLUP_COLLECTION
+
+    productivity_data = await DatabaseOperations.aggregate(collection, productivity_pipeline)
+
+    # Format productivity data
+    productivity_chart = []
+    for data_point in productivity_data:
+        productivity_chart.append({
+            "timestamp": data_point["_id"],
+            "hours": round((data_point["seconds"] or 0) / 3600, 2),
+            "activity_level": round(_avg_activity(data_point), 1),
+            "entries": data_point["entries"],
+            "mouse_clicks": data_point.get("mouse_clicks", 0),
+            "keyboard_strokes": data_point.get("keyboard_strokes", 0)
+        })
+
+    # Calculate productivity score
+    total_hours = sum(point["hours"] for point in productivity_chart)
+    avg_activity = sum(point["activity_level"] for point in productivity_chart) / len(productivity_chart) if productivity_chart else 0
+
+    productivity_score = min(100, (avg_activity * 0.7 + (total_hours / (len(productivity_chart) * 8)) * 100 * 0.3)) if productivity_chart else 0
+
+    return {
+        "productivity_chart": productivity_chart,
+        "productivity_score": round(productivity_score, 1),
+        "total_hours": round(total_hours, 2),
+        "avg_activity": round(avg_activity, 1),
+        "period": period,
+        "date_range": {
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat()
         }
-        
-    except Exception as e:
-        logger.error(f"Team analytics error: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to get team analytics"
-        )
+    }
 
 @router.get("/productivity")
 async def get_productivity_analytics(
@@ -289,76 +431,11 @@ async def get_productivity_analytics(
 ):
     """Get productivity analytics with different time periods"""
     try:
-        # Calculate date range based on period
-        end_date = datetime.utcnow()
-        if period == "day":
-            start_date = end_date - timedelta(days=1)
-            group_format = "%Y-%m-%d %H:00"
-        elif period == "week":
-            start_date = end_date - timedelta(days=7)
-            group_format = "%Y-%m-%d"
-        else:  # month
-            start_date = end_date - timedelta(days=30)
-            group_format = "%Y-%m-%d"
-        
-        # Productivity trend analysis
-        productivity_pipeline = [
-            {
-                "$match": {
-                    "user_id": current_user.id,
-                    "start_time": {"$gte": start_date, "$lte": end_date}
-                }
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "$dateToString": {
-                            "format": group_format,
-                            "date": "$start_time"
-                        }
-                    },
-                    "hours": {"$sum": "$duration"},
-                    "activity": {"$avg": "$activity_level"},
-                    "entries": {"$sum": 1},
-                    "mouse_clicks": {"$sum": {"$ifNull": ["$mouse_clicks", 0]}},
-                    "keyboard_strokes": {"$sum": {"$ifNull": ["$keyboard_strokes", 0]}}
-                }
-            },
-            {"$sort": {"_id": 1}}
-        ]
-        
-        productivity_data = await DatabaseOperations.aggregate("time_entries", productivity_pipeline)
-        
-        # Format productivity data
-        productivity_chart = []
-        for data_point in productivity_data:
-            productivity_chart.append({
-                "timestamp": data_point["_id"],
-                "hours": round(data_point["hours"] / 3600, 2),
-                "activity_level": round(data_point["activity"] or 0, 1),
-                "entries": data_point["entries"],
-                "mouse_clicks": data_point["mouse_clicks"],
-                "keyboard_strokes": data_point["keyboard_strokes"]
-            })
-        
-        # Calculate productivity score
-        total_hours = sum(point["hours"] for point in productivity_chart)
-        avg_activity = sum(point["activity_level"] for point in productivity_chart) / len(productivity_chart) if productivity_chart else 0
-        
-        productivity_score = min(100, (avg_activity * 0.7 + (total_hours / (len(productivity_chart) * 8)) * 100 * 0.3))
-        
-        return {
-            "productivity_chart": productivity_chart,
-            "productivity_score": round(productivity_score, 1),
-            "total_hours": round(total_hours, 2),
-            "avg_activity": round(avg_activity, 1),
-            "period": period,
-            "date_range": {
-                "start": start_date.isoformat(),
-                "end": end_date.isoformat()
-            }
-        }
-        
+        return await singleflight.do(
+            f"analytics.productivity|{current_user.id}|{period}",
+            lambda: _compute_productivity_analytics(period, current_user)
+        )
+
     except Exception as e:
         logger.error(f"Productivity analytics error: {e}")
         raise HTTPException(
@@ -366,86 +443,92 @@ async def get_productivity_analytics(
             detail="Failed to get productivity analytics"
         )
 
+async def _compute_custom_report(start_date: date, end_date: date, user_ids: Optional[List[str]],
+                                 project_ids: Optional[List[str]], loader: EntityLoader) -> Dict[str, Any]:
+    """Build a custom report over the selected users and projects"""
+    # Build query
+    match_query = {"day": _day_range(start_date, end_date)}
+
+    if user_ids:
+        match_query["user_id"] = {"$in": user_ids}
+    if project_ids:
+        match_query["project_id"] = {"$in": project_ids}
+
+    # Comprehensive analytics pipeline
+    analytics_pipeline = [
+        {"$match": match_query},
+        {
+            "$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "project_id": "$project_id",
+                    "date": "$day"
+                },
+                **_ROLLUP_SUMS
+            }
+        }
+    ]
+
+    detailed_data = await DatabaseOperations.aggregate(ROLLUP_COLLECTION, analytics_pipeline)
+
+    # Resolve every user and project name in one query per collection
+    users, projects = await asyncio.gather(
+        loader.load_many("users", [entry["_id"]["user_id"] for entry in detailed_data]),
+        loader.load_many("projects", [entry["_id"]["project_id"] for entry in detailed_data])
+    )
+
+    # Process and format the data
+    report_data = []
+    for entry in detailed_data:
+        user_info = users.get(entry["_id"]["user_id"])
+        project_info = projects.get(entry["_id"]["project_id"])
+
+        report_data.append({
+            "date": entry["_id"]["date"],
+            "user_name": user_info["name"] if user_info else "Unknown",
+            "project_name": project_info["name"] if project_info else "Unknown",
+            "hours": round(entry["seconds"] / 3600, 2),
+            "activity_level": round(_avg_activity(entry), 1),
+            "entries": entry["entries"]
+        })
+
+    # Calculate summary statistics
+    total_hours = sum(entry["hours"] for entry in report_data)
+    avg_activity = sum(entry["activity_level"] for entry in report_data) / len(report_data) if report_data else 0
+
+    return {
+        "report_data": report_data,
+        "summary": {
+            "total_hours": round(total_hours, 2),
+            "avg_activity": round(avg_activity, 1),
+            "total_entries": sum(entry["entries"] for entry in report_data),
+            "date_range": f"{start_date} to {end_date}"
+        },
+        "generated_at": datetime.utcnow().isoformat()
+    }
+
 @router.get("/reports/custom")
 async def generate_custom_report(
     start_date: date,
     end_date: date,
     user_ids: Optional[List[str]] = Query(None),
     project_ids: Optional[List[str]] = Query(None),
-    current_user: User = Depends(require_admin_or_manager)
+    current_user: User = Depends(require_admin_or_manager),
+    loader: EntityLoader = Depends(get_entity_loader)
 ):
     """Generate custom analytics report"""
     try:
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
-        
-        # Build query
-        match_query = {
-            "start_time": {"$gte": start_datetime, "$lte": end_datetime}
-        }
-        
-        if user_ids:
-            match_query["user_id"] = {"$in": user_ids}
-        if project_ids:
-            match_query["project_id"] = {"$in": project_ids}
-        
-        # Comprehensive analytics pipeline
-        analytics_pipeline = [
-            {"$match": match_query},
-            {
-                "$group": {
-                    "_id": {
-                        "user_id": "$user_id",
-                        "project_id": "$project_id",
-                        "date": {
-                            "$dateToString": {
-                                "format": "%Y-%m-%d",
-                                "date": "$start_time"
-                            }
-                        }
-                    },
-                    "hours": {"$sum": "$duration"},
-                    "activity": {"$avg": "$activity_level"},
-                    "entries": {"$sum": 1}
-                }
-            }
-        ]
-        
-        detailed_data = await DatabaseOperations.aggregate("time_entries", analytics_pipeline)
-        
-        # Process and format the data
-        report_data = []
-        for entry in detailed_data:
-            user_info = await DatabaseOperations.get_document("users", {"id": entry["_id"]["user_id"]})
-            project_info = await DatabaseOperations.get_document("projects", {"id": entry["_id"]["project_id"]})
-            
-            report_data.append({
-                "date": entry["_id"]["date"],
-                "user_name": user_info["name"] if user_info else "Unknown",
-                "project_name": project_info["name"] if project_info else "Unknown",
-                "hours": round(entry["hours"] / 3600, 2),
-                "activity_level": round(entry["activity"] or 0, 1),
-                "entries": entry["entries"]
-            })
-        
-        # Calculate summary statistics
-        total_hours = sum(entry["hours"] for entry in report_data)
-        avg_activity = sum(entry["activity_level"] for entry in report_data) / len(report_data) if report_data else 0
-        
-        return {
-            "report_data": report_data,
-            "summary": {
-                "total_hours": round(total_hours, 2),
-                "avg_activity": round(avg_activity, 1),
-                "total_entries": sum(entry["entries"] for entry in report_data),
-                "date_range": f"{start_date} to {end_date}"
-            },
-            "generated_at": datetime.utcnow().isoformat()
-        }
-        
+        key = response_cache.make_key("analytics.custom_report", f"role:{current_user.role}",
+                                      start_date=start_date, end_date=end_date,
+                                      user_ids=sorted(user_ids or []), project_ids=sorted(project_ids or []))
+        return await singleflight.do(
+            key,
+            lambda: _compute_custom_report(start_date, end_date, user_ids, project_ids, loader)
+        )
+
     except Exception as e:
         logger.error(f"Custom report error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to generate custom report"
-        )
\ No newline at end of file
+        )
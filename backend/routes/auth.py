@@ -1,12 +1,22 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response, Query
 from fastapi.security import HTTPBearer
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
 from datetime import timedelta, datetime
+from typing import Any, Dict, List, Optional
 from models.user import UserCreate, UserLogin, UserResponse, User, InviteUser, Invitation, AcceptInvite, ForgotPassword, ResetPassword, PasswordResetToken
-from auth.jwt_handler import create_access_token, create_refresh_token, hash_password, verify_password, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth.jwt_handler import create_access_token, create_refresh_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from auth.password_pool import password_pool
 from auth.dependencies import get_current_user
 from database.mongodb import DatabaseOperations
 from services.email import email_service
+from websocket.manager import manager
+from websocket.presence import presence_service
 from config import settings
+import base64
+import csv
+import io
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,7 +43,7 @@ async def register(user_data: UserCreate):
             )
         
         # Hash password
-        hashed_password = hash_password(user_data.password)
+        hashed_password = await password_pool.hash(user_data.password)
         
         # Create user
         user = User(
@@ -77,7 +87,7 @@ async def login(user_credentials: UserLogin):
     try:
         # Get user
         user_data = await DatabaseOperations.get_document("users", {"email": user_credentials.email})
-        if not user_data or not verify_password(user_credentials.password, user_data["password"]):
+        if not user_data or not await password_pool.verify(user_credentials.password, user_data["password"]):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
@@ -85,12 +95,8 @@ async def login(user_credentials: UserLogin):
         
         user = User(**{k: v for k, v in user_data.items() if k != "password"})
         
-        # Update last active
-        await DatabaseOperations.update_document(
-            "users", 
-            {"id": user.id}, 
-            {"status": "active"}
-        )
+        # Update last active (written in the next presence batch)
+        presence_service.set_status(user.id, "active")
         
         # Create tokens
         access_token = create_access_token(
@@ -119,12 +125,8 @@ async def login(user_credentials: UserLogin):
 async def logout(current_user: User = Depends(get_current_user)):
     """Logout user"""
     try:
-        # Update user status
-        await DatabaseOperations.update_document(
-            "users", 
-            {"id": current_user.id}, 
-            {"status": "offline"}
-        )
+        # Update user status (written in the next presence batch)
+        presence_service.set_status(current_user.id, "offline")
         
         return {"message": "Successfully logged out"}
         
@@ -213,7 +215,7 @@ async def invite_user(invite_data: InviteUser, current_user: User = Depends(get_
         # Generate invitation link
         invite_link = f"{settings.invite_base_url}?token={invitation.token}"
         
-        # Send invitation email
+        # Queue invitation email
         email_sent = await email_service.send_invitation_email(
             to_email=invite_data.email,
             inviter_name=current_user.name,
@@ -237,6 +239,181 @@ async def invite_user(invite_data: InviteUser, current_user: User = Depends(get_
             detail="Failed to send invitation"
         )
 
+def _parse_invite_csv(content: bytes) -> List[Dict[str, Any]]:
+    """Rows of a CSV with an email column and an optional role column"""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV must be UTF-8 encoded"
+        )
+    
+    reader = csv.DictReader(io.StringIO(text))
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+    if "email" not in reader.fieldnames:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="CSV needs a header row with an email column"
+        )
+    
+    rows = []
+    for row in reader:
+        invite = {"email": (row.get("email") or "").strip()}
+        if (row.get("role") or "").strip():
+            invite["role"] = row["role"].strip().lower()
+        rows.append(invite)
+    return rows
+
+async def _read_bulk_invites(request: Request) -> List[Any]:
+    """Invitation rows from a CSV upload, a text/csv body or a JSON list"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Upload the CSV as a 'file' form field"
+            )
+        return _parse_invite_csv(await upload.read())
+    if content_type.startswith("text/csv"):
+        return _parse_invite_csv(await request.body())
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        payload = payload.get("invitations")
+    if not isinstance(payload, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Send a JSON list of invitations or a CSV file with email and role columns"
+        )
+    return payload
+
+@router.post("/invite/bulk", response_model=dict)
+async def bulk_invite_users(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Invite many users at once - only admins can invite
+    
+    Accepts a JSON list of {"email", "role"} objects (or {"invitations": [...]})
+    or a CSV upload with email and role columns. Returns one result per row.
+    """
+    try:
+        # Only admins can invite users
+        if current_user.role != "admin":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only admins can invite users"
+            )
+        
+        rows = await _read_bulk_invites(request)
+        if not rows:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No invitations given"
+            )
+        if len(rows) > settings.BULK_INVITE_MAX_ROWS:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {settings.BULK_INVITE_MAX_ROWS} invitations per request"
+            )
+        
+        # Validate rows and drop repeated emails
+        results = []
+        candidates = {}
+        for index, row in enumerate(rows, start=1):
+            try:
+                invite_data = InviteUser(**row) if isinstance(row, dict) else InviteUser(email=row)
+            except (ValidationError, TypeError) as e:
+                detail = e.errors()[0]["msg"] if isinstance(e, ValidationError) else "Invalid row"
+                email = row.get("email") if isinstance(row, dict) else row
+                results.append({"row": index, "email": email, "status": "invalid", "detail": detail})
+                continue
+            
+            result = {"row": index, "email": invite_data.email}
+            results.append(result)
+            if invite_data.email in candidates:
+                result.update(status="duplicate", detail=f"Same email as row {candidates[invite_data.email][0]['row']}")
+                continue
+            candidates[invite_data.email] = (result, invite_data)
+        
+        # One lookup each for existing users and pending invitations
+        emails = list(candidates)
+        registered, invited = set(), set()
+        if emails:
+            users = await DatabaseOperations.get_documents(
+                "users", {"email": {"$in": emails}}, projection={"_id": 0, "email": 1}
+            )
+            registered = {user["email"] for user in users}
+            pending = await DatabaseOperations.get_documents(
+                "invitations", {"email": {"$in": emails}, "accepted": False}, projection={"_id": 0, "email": 1}
+            )
+            invited = {invitation["email"] for invitation in pending}
+        
+        # Create invitations
+        expires_at = datetime.utcnow() + timedelta(days=settings.INVITATION_EXPIRE_DAYS)
+        invitations, emails_to_send, invited_results = [], [], []
+        for email, (result, invite_data) in candidates.items():
+            if email in registered:
+                result.update(status="already_registered", detail="User with this email already exists")
+                continue
+            if email in invited:
+                result.update(status="already_invited", detail="Invitation already sent to this email")
+                continue
+            
+            invitation = Invitation(
+                email=email,
+                role=invite_data.role,
+                invited_by=current_user.id,
+                expires_at=expires_at
+            )
+            invite_link = f"{settings.invite_base_url}?token={invitation.token}"
+            invitations.append(invitation.model_dump())
+            emails_to_send.append((email, invite_data.role, invite_link))
+            invited_results.append(result)
+            result.update(status="invited", invitation_token=invitation.token, invite_link=invite_link)
+        
+        # Unordered, so one rejected document does not stop the others
+        failed = set()
+        try:
+            await DatabaseOperations.create_documents("invitations", invitations, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed.add(error["index"])
+                result = invited_results[error["index"]]
+                for field in ("invitation_token", "invite_link"):
+                    result.pop(field, None)
+                result.update(status="failed", detail="Could not save the invitation")
+            logger.error(f"Bulk invitation: {len(failed)} of {len(invitations)} inserts failed")
+        
+        # Queue emails only for the invitations that were saved
+        email_sent = await email_service.send_invitation_emails(
+            current_user.name, [message for index, message in enumerate(emails_to_send) if index not in failed]
+        )
+        
+        summary = {"total": len(rows)}
+        for result in results:
+            summary[result["status"]] = summary.get(result["status"], 0) + 1
+        
+        return {
+            "message": f"Invited {len(invitations) - len(failed)} of {len(rows)} users",
+            "summary": summary,
+            "results": results,
+            "email_sent": email_sent
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Bulk invitation error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to send invitations"
+        )
+
 @router.post("/accept-invite", response_model=dict)
 async def accept_invitation(accept_data: AcceptInvite):
     """Accept an invitation and create user account"""
@@ -274,7 +451,7 @@ async def accept_invitation(accept_data: AcceptInvite):
             )
         
         # Hash password
-        hashed_password = hash_password(accept_data.password)
+        hashed_password = await password_pool.hash(accept_data.password)
         
         # Create user
         user = User(
@@ -318,9 +495,73 @@ async def accept_invitation(accept_data: AcceptInvite):
             detail="Failed to accept invitation"
         )
 
+def _encode_invitation_cursor(invitation: Dict[str, Any]) -> str:
+    raw = json.dumps([invitation["created_at"].isoformat(), invitation["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_invitation_cursor(cursor: str) -> Dict[str, Any]:
+    """Query for the invitations after a cursor in (created_at, id) descending order"""
+    try:
+        created_at, invitation_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(created_at)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": invitation_id}}
+    ]}
+
+async def _list_invitations(response: Response, query: Dict[str, Any], invitation_status: Optional[str],
+                            cursor: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """
+    One page of invitations, newest first, filtered by status in the query
+
+    The next page's cursor is returned in the X-Next-Cursor header (absent
+    on the last page), so cost per page does not grow with the collection.
+    """
+    now = datetime.utcnow()
+    query = dict(query)
+    if invitation_status == "pending":
+        query.update(accepted=False, expires_at={"$gt": now})
+    elif invitation_status == "expired":
+        query.update(accepted=False, expires_at={"$lte": now})
+    elif invitation_status == "accepted":
+        query["accepted"] = True
+    if cursor:
+        query.update(_decode_invitation_cursor(cursor))
+    
+    invitations = await DatabaseOperations.get_documents(
+        "invitations", query, sort=[("created_at", -1), ("id", -1)], limit=limit + 1
+    )
+    if len(invitations) > limit:
+        invitations = invitations[:limit]
+        response.headers["X-Next-Cursor"] = _encode_invitation_cursor(invitations[-1])
+    
+    # Add invite link and status to each invitation
+    for invitation in invitations:
+        invitation["invite_link"] = f"{settings.invite_base_url}?token={invitation['token']}"
+        
+        if invitation["accepted"]:
+            invitation["status"] = "accepted"
+        elif now > invitation["expires_at"]:
+            invitation["status"] = "expired"
+        else:
+            invitation["status"] = "pending"
+    
+    return invitations
+
 @router.get("/invitations", response_model=list)
-async def get_invitations(current_user: User = Depends(get_current_user)):
-    """Get all pending invitations - only admins can view"""
+async def get_invitations(
+    response: Response,
+    invitation_status: Optional[str] = Query(None, alias="status", pattern="^(pending|expired)$"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Get pending (not yet accepted) invitations, newest first - only admins can view"""
     try:
         if current_user.role != "admin":
             raise HTTPException(
@@ -328,17 +569,7 @@ async def get_invitations(current_user: User = Depends(get_current_user)):
                 detail="Only admins can view invitations"
             )
         
-        invitations = await DatabaseOperations.get_documents("invitations", {"accepted": False})
-        
-        # Add invite link and status to each invitation
-        for invitation in invitations:
-            invitation["invite_link"] = f"{settings.invite_base_url}?token={invitation['token']}"
-            invitation["status"] = "pending"
-            # Check if expired
-            if datetime.utcnow() > invitation["expires_at"]:
-                invitation["status"] = "expired"
-        
-        return invitations
+        return await _list_invitations(response, {"accepted": False}, invitation_status, cursor, limit)
         
     except HTTPException:
         raise
@@ -350,8 +581,14 @@ async def get_invitations(current_user: User = Depends(get_current_user)):
         )
 
 @router.get("/invitations/all", response_model=list)
-async def get_all_invitations(current_user: User = Depends(get_current_user)):
-    """Get all invitations (pending and accepted) - only admins can view"""
+async def get_all_invitations(
+    response: Response,
+    invitation_status: Optional[str] = Query(None, alias="status", pattern="^(pending|expired|accepted)$"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_user)
+):
+    """Get all invitations (pending and accepted), newest first - only admins can view"""
     try:
         if current_user.role != "admin":
             raise HTTPException(
@@ -359,23 +596,7 @@ async def get_all_invitations(current_user: User = Depends(get_current_user)):
                 detail="Only admins can view invitations"
             )
         
-        invitations = await DatabaseOperations.get_documents("invitations")
-        
-        # Add invite link and status to each invitation
-        for invitation in invitations:
-            invitation["invite_link"] = f"{settings.invite_base_url}?token={invitation['token']}"
-            
-            if invitation["accepted"]:
-                invitation["status"] = "accepted"
-            elif datetime.utcnow() > invitation["expires_at"]:
-                invitation["status"] = "expired"
-            else:
-                invitation["status"] = "pending"
-        
-        # Sort by created_at descending (newest first)
-        invitations.sort(key=lambda x: x["created_at"], reverse=True)
-        
-        return invitations
+        return await _list_invitations(response, {}, invitation_status, cursor, limit)
         
     except HTTPException:
         raise
@@ -463,7 +684,7 @@ async def forgot_password(forgot_data: ForgotPassword):
         # Generate reset link
         reset_link = f"{settings.FRONTEND_URL}/reset-password?token={reset_token.token}"
         
-        # Send password reset email
+        # Queue password reset email
         email_sent = await email_service.send_password_reset_email(
             to_email=forgot_data.email,
             user_name=user.name,
@@ -516,7 +737,7 @@ async def reset_password(reset_data: ResetPassword):
             )
         
         # Hash new password
-        hashed_password = hash_password(reset_data.new_password)
+        hashed_password = await password_pool.hash(reset_data.new_password)
         
         # Update user password
         await DatabaseOperations.update_document(
@@ -524,6 +745,7 @@ async def reset_password(reset_data: ResetPassword):
             {"email": reset_token.email},
             {"password": hashed_password}
         )
+        await manager.invalidate_principal(user_data.get("id"))
         
         # Mark token as used
         await DatabaseOperations.update_document(
@@ -1,34 +1,51 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List, Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import List, Optional, Dict, Any, AsyncIterator
 import httpx
 import os
+import uuid
 from datetime import datetime
 from models.user import User
 from auth.dependencies import get_current_user, require_admin_or_manager
 from database.mongodb import DatabaseOperations
+from services.http_clients import http_clients
+from services.outbound_queue import outbound_queue, integration_ref, integration_query
+from services.provider_cache import provider_cache
+from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/integrations", tags=["integrations"])
 
+async def _take(items: AsyncIterator[Any], limit: Optional[int]) -> List[Any]:
+    """Collect up to limit items from a lazy listing (later pages are never fetched)"""
+    collected = []
+    async for item in items:
+        if limit is not None and len(collected) >= limit:
+            break
+        collected.append(item)
+    return collected
+
 # Integration Models
 class SlackIntegration:
     def __init__(self, webhook_url: str):
         self.webhook_url = webhook_url
     
+    async def post_message(self, message: str, channel: str = None) -> httpx.Response:
+        """Post a message to the webhook and return the raw response"""
+        payload = {
+            "text": message,
+            "username": "Hubstaff Bot"
+        }
+        if channel:
+            payload["channel"] = channel
+        
+        return await http_clients.request("slack", "POST", self.webhook_url, json=payload)
+    
     async def send_notification(self, message: str, channel: str = None):
         """Send notification to Slack"""
         try:
-            payload = {
-                "text": message,
-                "username": "Hubstaff Bot"
-            }
-            if channel:
-                payload["channel"] = channel
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(self.webhook_url, json=payload)
-                return response.status_code == 200
+            response = await self.post_message(message, channel)
+            return response.status_code == 200
         except Exception as e:
             logger.error(f"Slack notification error: {e}")
             return False
@@ -37,40 +54,55 @@ class TrelloIntegration:
     def __init__(self, api_key: str, token: str):
         self.api_key = api_key
         self.token = token
-        self.base_url = "https://api.trello.com/1"
+        self.base_url = settings.TRELLO_API_URL
+    
+    async def post_card(self, list_id: str, name: str, description: str = None) -> httpx.Response:
+        """Create a Trello card and return the raw response"""
+        url = f"{self.base_url}/cards"
+        params = {
+            "key": self.api_key,
+            "token": self.token,
+            "idList": list_id,
+            "name": name
+        }
+        if description:
+            params["desc"] = description
+        
+        return await http_clients.request("trello", "POST", url, params=params)
     
     async def create_card(self, list_id: str, name: str, description: str = None):
         """Create a Trello card"""
         try:
-            url = f"{self.base_url}/cards"
-            params = {
-                "key": self.api_key,
-                "token": self.token,
-                "idList": list_id,
-                "name": name
-            }
-            if description:
-                params["desc"] = description
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, params=params)
-                return response.json() if response.status_code == 200 else None
+            response = await self.post_card(list_id, name, description)
+            return response.json() if response.status_code == 200 else None
         except Exception as e:
             logger.error(f"Trello card creation error: {e}")
             return None
     
-    async def get_boards(self):
+    def _auth_params(self) -> Dict[str, str]:
+        return {
+            "key": self.api_key,
+            "token": self.token
+        }
+    
+    async def verify(self) -> bool:
+        """Check the credentials with a single small request"""
+        try:
+            member = await provider_cache.get("trello", f"{self.base_url}/members/me",
+                                              params={**self._auth_params(), "fields": "id"})
+            return member.status_code == 200
+        except Exception as e:
+            logger.error(f"Trello credential check error: {e}")
+            return False
+    
+    def iter_boards(self) -> AsyncIterator[Dict[str, Any]]:
+        """Lazily yield the user's Trello boards (cached, revalidated with ETags)"""
+        return provider_cache.paginate("trello", f"{self.base_url}/members/me/boards", params=self._auth_params())
+    
+    async def get_boards(self, limit: Optional[int] = None):
         """Get user's Trello boards"""
         try:
-            url = f"{self.base_url}/members/me/boards"
-            params = {
-                "key": self.api_key,
-                "token": self.token
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params)
-                return response.json() if response.status_code == 200 else []
+            return await _take(self.iter_boards(), limit)
         except Exception as e:
             logger.error(f"Trello boards fetch error: {e}")
             return []
@@ -78,41 +110,77 @@ class TrelloIntegration:
 class GitHubIntegration:
     def __init__(self, token: str):
         self.token = token
-        self.base_url = "https://api.github.com"
+        self.base_url = settings.GITHUB_API_URL
         self.headers = {
             "Authorization": f"token {token}",
             "Accept": "application/vnd.github.v3+json"
         }
     
+    async def post_issue(self, repo: str, title: str, body: str = None, labels: List[str] = None) -> httpx.Response:
+        """Create a GitHub issue and return the raw response"""
+        url = f"{self.base_url}/repos/{repo}/issues"
+        payload = {
+            "title": title,
+            "body": body or "",
+            "labels": labels or []
+        }
+        
+        return await http_clients.request("github", "POST", url, json=payload, headers=self.headers)
+    
     async def create_issue(self, repo: str, title: str, body: str = None, labels: List[str] = None):
         """Create a GitHub issue"""
         try:
-            url = f"{self.base_url}/repos/{repo}/issues"
-            payload = {
-                "title": title,
-                "body": body or "",
-                "labels": labels or []
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                return response.json() if response.status_code == 201 else None
+            response = await self.post_issue(repo, title, body, labels)
+            return response.json() if response.status_code == 201 else None
         except Exception as e:
             logger.error(f"GitHub issue creation error: {e}")
             return None
     
-    async def get_repositories(self):
+    async def verify(self) -> bool:
+        """Check the token with a single small request"""
+        try:
+            user = await provider_cache.get("github", f"{self.base_url}/user", headers=self.headers)
+            return user.status_code == 200
+        except Exception as e:
+            logger.error(f"GitHub token check error: {e}")
+            return False
+    
+    def iter_repositories(self) -> AsyncIterator[Dict[str, Any]]:
+        """Lazily yield the user's repositories, following Link pagination"""
+        return provider_cache.paginate("github", f"{self.base_url}/user/repos",
+                                       params={"per_page": 100, "sort": "updated"}, headers=self.headers)
+    
+    async def get_repositories(self, limit: Optional[int] = None):
         """Get user's GitHub repositories"""
         try:
-            url = f"{self.base_url}/user/repos"
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
-                return response.json() if response.status_code == 200 else []
+            return await _take(self.iter_repositories(), limit)
         except Exception as e:
             logger.error(f"GitHub repos fetch error: {e}")
             return []
 
+# Outbound queue handlers: the queue sends these jobs in the background
+async def _send_slack_notification(config: Dict[str, Any], payload: Dict[str, Any]) -> httpx.Response:
+    return await SlackIntegration(config["webhook_url"]).post_message(payload["message"], payload.get("channel"))
+
+def _merge_slack_notifications(payloads: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Jobs are only merged when they share a webhook and channel
+    return {"message": "\n".join(payload["message"] for payload in payloads), "channel": payloads[0].get("channel")}
+
+async def _send_trello_card(config: Dict[str, Any], payload: Dict[str, Any]) -> httpx.Response:
+    trello = TrelloIntegration(config["api_key"], config["token"])
+    return await trello.post_card(payload["list_id"], payload["name"], payload.get("description"))
+
+async def _send_github_issue(config: Dict[str, Any], payload: Dict[str, Any]) -> httpx.Response:
+    github = GitHubIntegration(config["token"])
+    return await github.post_issue(payload["repo"], payload["title"], payload.get("body"), payload.get("labels"))
+
+outbound_queue.register("slack", "notify", _send_slack_notification, merge=_merge_slack_notifications)
+outbound_queue.register("trello", "create_card", _send_trello_card)
+outbound_queue.register("github", "create_issue", _send_github_issue)
+
+def _queued(job: Dict[str, Any], message: str) -> Dict[str, Any]:
+    return {"message": message, "job_id": job["id"], "status": job["status"]}
+
 # Integration Routes
 @router.post("/slack/connect")
 async def connect_slack(
@@ -133,6 +201,7 @@ async def connect_slack(
         
         # Store integration
         integration_data = {
+            "id": str(uuid.uuid4()),
             "user_id": current_user.id,
             "type": "slack",
             "config": {"webhook_url": webhook_url},
@@ -163,9 +232,8 @@ async def connect_trello(
     try:
         # Test the credentials
         trello = TrelloIntegration(api_key, token)
-        boards = await trello.get_boards()
         
-        if not boards:
+        if not await trello.verify():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid Trello credentials"
@@ -173,6 +241,7 @@ async def connect_trello(
         
         # Store integration
         integration_data = {
+            "id": str(uuid.uuid4()),
             "user_id": current_user.id,
             "type": "trello",
             "config": {"api_key": api_key, "token": token},
@@ -184,7 +253,7 @@ async def connect_trello(
         
         return {
             "message": "Trello integration connected successfully",
-            "boards": boards[:5]  # Return first 5 boards
+            "boards": await trello.get_boards(limit=5)  # Return first 5 boards
         }
         
     except HTTPException:
@@ -205,9 +274,8 @@ async def connect_github(
     try:
         # Test the token
         github = GitHubIntegration(token)
-        repos = await github.get_repositories()
         
-        if not repos:
+        if not await github.verify():
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Invalid GitHub token"
@@ -215,6 +283,7 @@ async def connect_github(
         
         # Store integration
         integration_data = {
+            "id": str(uuid.uuid4()),
             "user_id": current_user.id,
             "type": "github",
             "config": {"token": token},
@@ -226,7 +295,7 @@ async def connect_github(
         
         return {
             "message": "GitHub integration connected successfully",
-            "repositories": repos[:10]  # Return first 10 repos
+            "repositories": await github.get_repositories(limit=10)  # Return first 10 repos
         }
         
     except HTTPException:
@@ -265,13 +334,13 @@ async def get_integrations(current_user: User = Depends(get_current_user)):
             detail="Failed to get integrations"
         )
 
-@router.post("/slack/notify")
+@router.post("/slack/notify", status_code=status.HTTP_202_ACCEPTED)
 async def send_slack_notification(
     message: str,
     channel: str = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Send Slack notification"""
+    """Queue a Slack notification (poll /integrations/jobs/{job_id} for the outcome)"""
     try:
         # Get Slack integration
         integration = await DatabaseOperations.get_document(
@@ -285,18 +354,13 @@ async def send_slack_notification(
                 detail="Slack integration not found"
             )
         
-        webhook_url = integration["config"]["webhook_url"]
-        slack = SlackIntegration(webhook_url)
-        
-        success = await slack.send_notification(message, channel)
-        
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to send Slack notification"
-            )
+        job = await outbound_queue.enqueue(
+            current_user.id, "slack", "notify", integration_ref(integration),
+            {"message": message, "channel": channel},
+            merge_key=f"{integration_ref(integration)}:{channel or ''}"
+        )
         
-        return {"message": "Notification sent successfully"}
+        return _queued(job, "Notification queued")
         
     except HTTPException:
         raise
@@ -307,14 +371,14 @@ async def send_slack_notification(
             detail="Failed to send notification"
         )
 
-@router.post("/trello/create-card")
+@router.post("/trello/create-card", status_code=status.HTTP_202_ACCEPTED)
 async def create_trello_card(
     list_id: str,
     name: str,
     description: str = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Create Trello card from task"""
+    """Queue creation of a Trello card from a task"""
     try:
         # Get Trello integration
         integration = await DatabaseOperations.get_document(
@@ -328,18 +392,12 @@ async def create_trello_card(
                 detail="Trello integration not found"
             )
         
-        config = integration["config"]
-        trello = TrelloIntegration(config["api_key"], config["token"])
-        
-        card = await trello.create_card(list_id, name, description)
-        
-        if not card:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create Trello card"
-            )
+        job = await outbound_queue.enqueue(
+            current_user.id, "trello", "create_card", integration_ref(integration),
+            {"list_id": list_id, "name": name, "description": description}
+        )
         
-        return {"message": "Trello card created successfully", "card": card}
+        return _queued(job, "Trello card queued")
         
     except HTTPException:
         raise
@@ -350,7 +408,7 @@ async def create_trello_card(
             detail="Failed to create Trello card"
         )
 
-@router.post("/github/create-issue")
+@router.post("/github/create-issue", status_code=status.HTTP_202_ACCEPTED)
 async def create_github_issue(
     repo: str,
     title: str,
@@ -358,7 +416,7 @@ async def create_github_issue(
     labels: List[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Create GitHub issue from task"""
+    """Queue creation of a GitHub issue from a task"""
     try:
         # Get GitHub integration
         integration = await DatabaseOperations.get_document(
@@ -372,26 +430,100 @@ async def create_github_issue(
                 detail="GitHub integration not found"
             )
         
-        token = integration["config"]["token"]
-        github = GitHubIntegration(token)
+        job = await outbound_queue.enqueue(
+            current_user.id, "github", "create_issue", integration_ref(integration),
+            {"repo": repo, "title": title, "body": body, "labels": labels}
+        )
         
-        issue = await github.create_issue(repo, title, body, labels)
+        return _queued(job, "GitHub issue queued")
         
-        if not issue:
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"GitHub issue creation error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create GitHub issue"
+        )
+
+async def _get_integration_or_404(user_id: str, integration_type: str, name: str) -> dict:
+    integration = await DatabaseOperations.get_document(
+        "integrations",
+        {"user_id": user_id, "type": integration_type, "active": True}
+    )
+    if not integration:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{name} integration not found"
+        )
+    return integration
+
+@router.get("/trello/boards")
+async def get_trello_boards(
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """List the connected account's Trello boards (cached, revalidated with ETags)"""
+    try:
+        config = (await _get_integration_or_404(current_user.id, "trello", "Trello"))["config"]
+        boards = await TrelloIntegration(config["api_key"], config["token"]).get_boards(limit=limit)
+        
+        return {"boards": boards}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get Trello boards error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get Trello boards"
+        )
+
+@router.get("/github/repos")
+async def get_github_repositories(
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """List the connected account's GitHub repositories, fetching only the pages needed"""
+    try:
+        config = (await _get_integration_or_404(current_user.id, "github", "GitHub"))["config"]
+        repositories = await GitHubIntegration(config["token"]).get_repositories(limit=limit)
+        
+        return {"repositories": repositories}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get GitHub repositories error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get GitHub repositories"
+        )
+
+@router.get("/jobs/{job_id}")
+async def get_outbound_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Status of a queued integration call (pending, running, succeeded or failed)"""
+    try:
+        job = await outbound_queue.get_job(job_id, user_id=current_user.id)
+        
+        if not job:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to create GitHub issue"
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Job not found"
             )
         
-        return {"message": "GitHub issue created successfully", "issue": issue}
+        return job
         
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"GitHub issue creation error: {e}")
+        logger.error(f"Get outbound job error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to create GitHub issue"
+            detail="Failed to get job"
         )
 
 @router.delete("/{integration_id}")
@@ -403,7 +535,7 @@ async def disconnect_integration(
     try:
         integration = await DatabaseOperations.get_document(
             "integrations",
-            {"id": integration_id, "user_id": current_user.id}
+            {**integration_query(integration_id), "user_id": current_user.id}
         )
         
         if not integration:
@@ -414,7 +546,7 @@ async def disconnect_integration(
         
         await DatabaseOperations.update_document(
             "integrations",
-            {"id": integration_id},
+            integration_query(integration_id),
             {"active": False}
         )
         
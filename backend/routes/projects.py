@@ -5,6 +5,10 @@ from models.project import Project, ProjectCreate, ProjectUpdate, Task, TaskCrea
 from models.user import User
 from auth.dependencies import get_current_user, require_admin_or_manager
 from database.mongodb import DatabaseOperations
+from services.cache import response_cache, project_tag, PROJECTS_TAG
+from services.webhooks import webhook_dispatcher
+from websocket.manager import manager
+from websocket.rooms import project_members
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,6 +27,12 @@ async def create_project(
         )
         
         await DatabaseOperations.create_document("projects", project.model_dump())
+        await response_cache.invalidate(PROJECTS_TAG)
+        
+        # Put the team's open sockets in the new project's room and notify them
+        project_dict = project.model_dump()
+        manager.sync_project_room(project.id, project_members(project_dict))
+        await manager.broadcast_project_update(project_dict)
         
         return project
         
@@ -124,10 +134,19 @@ async def update_project(
                 {"id": project_id},
                 update_data
             )
+            await response_cache.invalidate(PROJECTS_TAG, project_tag(project_id))
         
         # Get updated project
         updated_project_data = await DatabaseOperations.get_document("projects", {"id": project_id})
-        return Project(**updated_project_data)
+        updated_project = Project(**updated_project_data)
+        
+        # Team changes move sockets in or out of the project room
+        project_dict = updated_project.model_dump()
+        manager.sync_project_room(project_id, project_members(project_dict))
+        await manager.broadcast_project_update(project_dict)
+        await webhook_dispatcher.emit("project.updated", project_dict, actor_id=current_user.id)
+        
+        return updated_project
         
     except HTTPException:
         raise
@@ -157,6 +176,7 @@ async def delete_project(
         
         # Delete project
         await DatabaseOperations.delete_document("projects", {"id": project_id})
+        await response_cache.invalidate(PROJECTS_TAG, project_tag(project_id))
         
         return {"message": "Project deleted successfully"}
         
@@ -196,6 +216,7 @@ async def create_task(
         )
         
         await DatabaseOperations.create_document("tasks", task.model_dump())
+        await response_cache.invalidate(PROJECTS_TAG, project_tag(project_id))
         
         return task
         
@@ -243,36 +264,46 @@ async def get_project_tasks(
             detail="Failed to get project tasks"
         )
 
+async def _compute_project_stats() -> dict:
+    """Build the project and task statistics shown on the dashboard"""
+    # Projects by status
+    pipeline = [
+        {"$group": {"_id": "$status", "count": {"$sum": 1}, "total_budget": {"$sum": "$budget"}, "total_spent": {"$sum": "$spent"}}}
+    ]
+    project_stats = await DatabaseOperations.aggregate("projects", pipeline)
+    
+    # Recent projects
+    recent_projects = await DatabaseOperations.get_documents(
+        "projects",
+        {},
+        sort=[("updated_at", -1)],
+        limit=5
+    )
+    
+    # Task statistics
+    task_pipeline = [
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]
+    task_stats = await DatabaseOperations.aggregate("tasks", task_pipeline)
+    
+    return {
+        "project_stats": {stat["_id"]: {"count": stat["count"], "budget": stat["total_budget"], "spent": stat["total_spent"]} for stat in project_stats},
+        "recent_projects": [Project(**project) for project in recent_projects],
+        "task_stats": {stat["_id"]: stat["count"] for stat in task_stats}
+    }
+
 @router.get("/stats/dashboard")
 async def get_project_stats(current_user: User = Depends(get_current_user)):
     """Get project statistics for dashboard"""
     try:
-        # Projects by status
-        pipeline = [
-            {"$group": {"_id": "$status", "count": {"$sum": 1}, "total_budget": {"$sum": "$budget"}, "total_spent": {"$sum": "$spent"}}}
-        ]
-        project_stats = await DatabaseOperations.aggregate("projects", pipeline)
-        
-        # Recent projects
-        recent_projects = await DatabaseOperations.get_documents(
-            "projects",
-            {},
-            sort=[("updated_at", -1)],
-            limit=5
+        # The statistics are organisation wide, so every caller shares one entry.
+        # Project and task writes drop it; hours_tracked follows via the TTL.
+        return await response_cache.get_or_set(
+            response_cache.make_key("projects.stats", "all"),
+            _compute_project_stats,
+            tags=(PROJECTS_TAG,)
         )
         
-        # Task statistics
-        task_pipeline = [
-            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
-        ]
-        task_stats = await DatabaseOperations.aggregate("tasks", task_pipeline)
-        
-        return {
-            "project_stats": {stat["_id"]: {"count": stat["count"], "budget": stat["total_budget"], "spent": stat["total_spent"]} for stat in project_stats},
-            "recent_projects": [Project(**project) for project in recent_projects],
-            "task_stats": {stat["_id"]: stat["count"] for stat in task_stats}
-        }
-        
     except Exception as e:
         logger.error(f"Get project stats error: {e}")
         raise HTTPException(
@@ -361,10 +392,13 @@ async def update_task(
                 {"id": task_id},
                 update_data
             )
+            await response_cache.invalidate(PROJECTS_TAG, project_tag(task.project_id))
         
         # Get updated task
         updated_task_data = await DatabaseOperations.get_document("tasks", {"id": task_id})
-        return Task(**updated_task_data)
+        updated_task = Task(**updated_task_data)
+        await webhook_dispatcher.emit("task.updated", updated_task.model_dump(), actor_id=current_user.id)
+        return updated_task
         
     except HTTPException:
         raise
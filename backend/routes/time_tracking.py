@@ -1,16 +1,105 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query, UploadFile, File
 from typing import List, Optional
 from datetime import datetime, timedelta, date
+from pymongo.errors import DuplicateKeyError
+import asyncio
 from models.time_tracking import TimeEntry, TimeEntryCreate, TimeEntryUpdate, TimeEntryManual, ActivityData, Screenshot
 from models.user import User
-from auth.dependencies import get_current_user, require_admin_or_manager
+from auth.dependencies import get_current_user, get_current_principal, require_admin_or_manager
+from auth.principal_cache import Principal
 from database.mongodb import DatabaseOperations
+from database.loader import EntityLoader, get_entity_loader
 from services.storage import storage_service
+from services.activity_buffer import activity_buffer, BufferFullError
+from services.rollups import rollup_service
+from services.singleflight import singleflight
+from services.webhooks import webhook_dispatcher
+from websocket.presence import presence_service
+from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/time-tracking", tags=["time tracking"])
 
+# Aggregation expressions shared by the timer transitions. Legacy documents
+# may store timestamps as ISO strings or lack the pause fields entirely.
+_PAUSE_PERIODS = {"$ifNull": ["$pause_periods", []]}
+_TOTAL_PAUSE = {"$ifNull": ["$total_pause_duration", 0]}
+_OPEN_PAUSE_START = {"$toDate": {"$arrayElemAt": [{"$ifNull": ["$pause_periods.pause_time", []]}, -1]}}
+
+def _whole_seconds(start, end) -> dict:
+    """Expression for the non-negative whole seconds between two dates"""
+    return {"$max": [0, {"$toLong": {"$floor": {"$divide": [{"$subtract": [end, start]}, 1000]}}}]}
+
+def _close_open_pause(now: datetime) -> dict:
+    """Expression for pause_periods with the trailing open period resumed at now"""
+    return {
+        "$concatArrays": [
+            {"$slice": [_PAUSE_PERIODS, {"$max": [0, {"$subtract": [{"$size": _PAUSE_PERIODS}, 1]}]}]},
+            [{"$mergeObjects": [{"$arrayElemAt": [_PAUSE_PERIODS, -1]}, {"resume_time": now}]}]
+        ]
+    }
+
+def _resume_pipeline(now: datetime) -> list:
+    """Close the open pause period and add its length to the running pause total"""
+    return [
+        {
+            "$set": {
+                "is_paused": False,
+                "pause_periods": _close_open_pause(now),
+                "total_pause_duration": {"$add": [_TOTAL_PAUSE, _whole_seconds(_OPEN_PAUSE_START, now)]}
+            }
+        }
+    ]
+
+def _stop_pipeline(now: datetime) -> list:
+    """Stop the entry, folding any open pause into the total before computing duration"""
+    return [
+        {
+            "$set": {
+                "end_time": now,
+                "is_paused": False,
+                "pause_periods": {"$cond": [{"$eq": ["$is_paused", True]}, _close_open_pause(now), _PAUSE_PERIODS]},
+                "total_pause_duration": {
+                    "$add": [
+                        _TOTAL_PAUSE,
+                        {"$cond": [{"$eq": ["$is_paused", True]}, _whole_seconds(_OPEN_PAUSE_START, now), 0]}
+                    ]
+                }
+            }
+        },
+        {
+            "$set": {
+                "duration": {
+                    "$max": [0, {"$subtract": [_whole_seconds({"$toDate": "$start_time"}, now), "$total_pause_duration"]}]
+                }
+            }
+        }
+    ]
+
+async def _get_entry_or_404(entry_id: str, user_id: str) -> dict:
+    """Load an entry after a conditional transition did not match, to report why"""
+    entry_data = await DatabaseOperations.get_document(
+        "time_entries",
+        {"id": entry_id, "user_id": user_id}
+    )
+    
+    if not entry_data:
+        logger.warning(f"Time entry {entry_id} not found for user {user_id}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Time entry not found"
+        )
+    
+    return entry_data
+
+def _validate_entry_id(entry_id: str):
+    if not entry_id or not entry_id.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid entry ID provided"
+        )
+
 @router.post("/start", response_model=TimeEntry)
 async def start_time_tracking(
     entry_data: TimeEntryCreate,
@@ -18,34 +107,27 @@ async def start_time_tracking(
 ):
     """Start time tracking for a project/task"""
     try:
-        # Check if user has any active time entries
-        active_entry = await DatabaseOperations.get_document(
-            "time_entries",
-            {"user_id": current_user.id, "end_time": None}
-        )
-        
-        if active_entry:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="You already have an active time entry. Please stop it first."
+        # Verify project and task exist
+        project_lookup = DatabaseOperations.get_document("projects", {"id": entry_data.project_id})
+        if entry_data.task_id:
+            project_data, task_data = await asyncio.gather(
+                project_lookup,
+                DatabaseOperations.get_document("tasks", {"id": entry_data.task_id})
             )
+        else:
+            project_data, task_data = await project_lookup, None
         
-        # Verify project exists
-        project_data = await DatabaseOperations.get_document("projects", {"id": entry_data.project_id})
         if not project_data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Project not found"
             )
         
-        # Verify task exists if provided
-        if entry_data.task_id:
-            task_data = await DatabaseOperations.get_document("tasks", {"id": entry_data.task_id})
-            if not task_data:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Task not found"
-                )
+        if entry_data.task_id and not task_data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Task not found"
+            )
         
         time_entry = TimeEntry(
             user_id=current_user.id,
@@ -55,14 +137,20 @@ async def start_time_tracking(
             description=entry_data.description
         )
         
-        await DatabaseOperations.create_document("time_entries", time_entry.model_dump())
+        # The unique partial index on running entries rejects a second
+        # active entry, so concurrent starts cannot both succeed
+        try:
+            await DatabaseOperations.create_document("time_entries", time_entry.model_dump())
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="You already have an active time entry. Please stop it first."
+            )
         
-        # Update user status to active
-        await DatabaseOperations.update_document(
-            "users",
-            {"id": current_user.id},
-            {"status": "active", "last_active": datetime.utcnow()}
-        )
+        # Update user status to active (written in the next presence batch)
+        presence_service.heartbeat(current_user.id)
+        
+        await webhook_dispatcher.emit("time_entry.started", time_entry.model_dump(), actor_id=current_user.id)
         
         return time_entry
         
@@ -83,100 +171,34 @@ async def stop_time_tracking(
     """Stop time tracking"""
     try:
         logger.info(f"Stopping time tracking for entry {entry_id} by user {current_user.id}")
+        _validate_entry_id(entry_id)
         
-        if not entry_id or not entry_id.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid entry ID provided"
-            )
-        
-        entry_data = await DatabaseOperations.get_document(
+        # Duration and pause totals are computed by the server in the same
+        # conditional update that stops the entry
+        updated_entry = await DatabaseOperations.find_one_and_update(
             "time_entries",
-            {"id": entry_id, "user_id": current_user.id}
+            {"id": entry_id, "user_id": current_user.id, "end_time": None},
+            _stop_pipeline(datetime.utcnow())
         )
         
-        if not entry_data:
-            logger.warning(f"Time entry {entry_id} not found for user {current_user.id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Time entry not found"
-            )
-        
-        if entry_data.get("end_time"):
-            logger.warning(f"Time entry {entry_id} is already stopped")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Time entry already stopped"
-            )
-        
-        end_time = datetime.utcnow()
-        start_time = entry_data.get("start_time")
-        
-        if not start_time:
-            logger.error(f"Time entry {entry_id} has no start time")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid time entry: no start time found"
-            )
-        
-        # Convert start_time if it's a string
-        if isinstance(start_time, str):
-            try:
-                start_time = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            except ValueError:
-                logger.error(f"Invalid start_time format for entry {entry_id}: {start_time}")
+        if not updated_entry:
+            entry_data = await _get_entry_or_404(entry_id, current_user.id)
+            if entry_data.get("end_time"):
+                logger.warning(f"Time entry {entry_id} is already stopped")
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid start time format"
+                    detail="Time entry already stopped"
                 )
-        
-        # Calculate raw duration
-        raw_duration = int((end_time - start_time).total_seconds())
-        
-        if raw_duration < 0:
-            logger.error(f"Negative duration calculated for entry {entry_id}: {raw_duration}")
-            raw_duration = 0
-        
-        # Get total pause duration
-        total_pause_duration = entry_data.get("total_pause_duration", 0)
-        
-        # If currently paused, add the current pause period to total
-        if entry_data.get("is_paused"):
-            pause_periods = entry_data.get("pause_periods", [])
-            if pause_periods and pause_periods[-1].get("resume_time") is None:
-                last_pause_start = pause_periods[-1]["pause_time"]
-                if isinstance(last_pause_start, str):
-                    last_pause_start = datetime.fromisoformat(last_pause_start.replace('Z', '+00:00'))
-                current_pause_duration = int((end_time - last_pause_start).total_seconds())
-                total_pause_duration += current_pause_duration
-        
-        # Final duration = raw duration - total pause time
-        duration = max(0, raw_duration - total_pause_duration)
-        
-        logger.info(f"Duration calculation: raw={raw_duration}s, pause={total_pause_duration}s, final={duration}s")
-        
-        update_data = {
-            "end_time": end_time,
-            "duration": duration
-        }
-        
-        logger.info(f"Updating time entry {entry_id} with duration {duration} seconds")
-        
-        success = await DatabaseOperations.update_document(
-            "time_entries",
-            {"id": entry_id},
-            update_data
-        )
-        
-        if not success:
-            logger.error(f"Failed to update time entry {entry_id}")
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to update time entry"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Time entry changed while stopping, please retry"
             )
         
+        duration = updated_entry.get("duration") or 0
+        logger.info(f"Stopped time entry {entry_id}: pause={updated_entry.get('total_pause_duration', 0)}s, final={duration}s")
+        
         # Update project hours safely
-        project_id = entry_data.get("project_id")
+        project_id = updated_entry.get("project_id")
         if project_id and duration > 0:
             try:
                 await DatabaseOperations.update_document(
@@ -189,17 +211,12 @@ async def stop_time_tracking(
                 logger.error(f"Failed to update project hours: {project_error}")
                 # Don't fail the whole operation if project update fails
         
-        # Get updated entry
-        updated_entry = await DatabaseOperations.get_document("time_entries", {"id": entry_id})
-        if not updated_entry:
-            logger.error(f"Failed to retrieve updated entry {entry_id}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to retrieve updated time entry"
-            )
+        await rollup_service.add_entry(updated_entry)
         
-        logger.info(f"Successfully stopped time tracking for entry {entry_id}")
-        return TimeEntry(**updated_entry)
+        stopped_entry = TimeEntry(**updated_entry)
+        await webhook_dispatcher.emit("time_entry.stopped", stopped_entry.model_dump(), actor_id=current_user.id)
+        
+        return stopped_entry
         
     except HTTPException:
         raise
@@ -218,70 +235,31 @@ async def pause_time_tracking(
     """Pause time tracking"""
     try:
         logger.info(f"Pausing time tracking for entry {entry_id} by user {current_user.id}")
+        _validate_entry_id(entry_id)
         
-        if not entry_id or not entry_id.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid entry ID provided"
-            )
-        
-        entry_data = await DatabaseOperations.get_document(
+        updated_entry = await DatabaseOperations.find_one_and_update(
             "time_entries",
-            {"id": entry_id, "user_id": current_user.id}
+            {"id": entry_id, "user_id": current_user.id, "end_time": None, "is_paused": {"$ne": True}},
+            {
+                "$set": {"is_paused": True},
+                "$push": {"pause_periods": {"pause_time": datetime.utcnow(), "resume_time": None}}
+            }
         )
         
-        if not entry_data:
-            logger.warning(f"Time entry {entry_id} not found for user {current_user.id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Time entry not found"
-            )
-        
-        if entry_data.get("end_time"):
-            logger.warning(f"Time entry {entry_id} is already stopped")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot pause a stopped time entry"
-            )
-        
-        if entry_data.get("is_paused"):
+        if not updated_entry:
+            entry_data = await _get_entry_or_404(entry_id, current_user.id)
+            if entry_data.get("end_time"):
+                logger.warning(f"Time entry {entry_id} is already stopped")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cannot pause a stopped time entry"
+                )
             logger.warning(f"Time entry {entry_id} is already paused")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Time entry is already paused"
             )
         
-        pause_time = datetime.utcnow()
-        pause_periods = entry_data.get("pause_periods", [])
-        pause_periods.append({"pause_time": pause_time, "resume_time": None})
-        
-        update_data = {
-            "is_paused": True,
-            "pause_periods": pause_periods
-        }
-        
-        success = await DatabaseOperations.update_document(
-            "time_entries",
-            {"id": entry_id},
-            update_data
-        )
-        
-        if not success:
-            logger.error(f"Failed to pause time entry {entry_id}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to pause time entry"
-            )
-        
-        # Get updated entry
-        updated_entry = await DatabaseOperations.get_document("time_entries", {"id": entry_id})
-        if not updated_entry:
-            logger.error(f"Failed to retrieve updated entry {entry_id}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to retrieve updated time entry"
-            )
-        
         logger.info(f"Successfully paused time tracking for entry {entry_id}")
         return TimeEntry(**updated_entry)
         
@@ -302,89 +280,28 @@ async def resume_time_tracking(
     """Resume time tracking"""
     try:
         logger.info(f"Resuming time tracking for entry {entry_id} by user {current_user.id}")
+        _validate_entry_id(entry_id)
         
-        if not entry_id or not entry_id.strip():
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid entry ID provided"
-            )
-        
-        entry_data = await DatabaseOperations.get_document(
+        updated_entry = await DatabaseOperations.find_one_and_update(
             "time_entries",
-            {"id": entry_id, "user_id": current_user.id}
+            {"id": entry_id, "user_id": current_user.id, "end_time": None, "is_paused": True},
+            _resume_pipeline(datetime.utcnow())
         )
         
-        if not entry_data:
-            logger.warning(f"Time entry {entry_id} not found for user {current_user.id}")
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Time entry not found"
-            )
-        
-        if entry_data.get("end_time"):
-            logger.warning(f"Time entry {entry_id} is already stopped")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot resume a stopped time entry"
-            )
-        
-        if not entry_data.get("is_paused"):
+        if not updated_entry:
+            entry_data = await _get_entry_or_404(entry_id, current_user.id)
+            if entry_data.get("end_time"):
+                logger.warning(f"Time entry {entry_id} is already stopped")
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Cannot resume a stopped time entry"
+                )
             logger.warning(f"Time entry {entry_id} is not paused")
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Time entry is not paused"
             )
         
-        resume_time = datetime.utcnow()
-        pause_periods = entry_data.get("pause_periods", [])
-        
-        # Update the last pause period with resume time
-        if pause_periods and pause_periods[-1].get("resume_time") is None:
-            pause_periods[-1]["resume_time"] = resume_time
-        
-        # Calculate total pause duration
-        total_pause_duration = 0
-        for period in pause_periods:
-            if period.get("pause_time") and period.get("resume_time"):
-                pause_start = period["pause_time"]
-                pause_end = period["resume_time"]
-                
-                # Convert to datetime if they're strings
-                if isinstance(pause_start, str):
-                    pause_start = datetime.fromisoformat(pause_start.replace('Z', '+00:00'))
-                if isinstance(pause_end, str):
-                    pause_end = datetime.fromisoformat(pause_end.replace('Z', '+00:00'))
-                
-                total_pause_duration += int((pause_end - pause_start).total_seconds())
-        
-        update_data = {
-            "is_paused": False,
-            "pause_periods": pause_periods,
-            "total_pause_duration": total_pause_duration
-        }
-        
-        success = await DatabaseOperations.update_document(
-            "time_entries",
-            {"id": entry_id},
-            update_data
-        )
-        
-        if not success:
-            logger.error(f"Failed to resume time entry {entry_id}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to resume time entry"
-            )
-        
-        # Get updated entry
-        updated_entry = await DatabaseOperations.get_document("time_entries", {"id": entry_id})
-        if not updated_entry:
-            logger.error(f"Failed to retrieve updated entry {entry_id}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Failed to retrieve updated time entry"
-            )
-        
         logger.info(f"Successfully resumed time tracking for entry {entry_id}")
         return TimeEntry(**updated_entry)
         
@@ -503,6 +420,8 @@ async def create_manual_time_entry(
             {"$inc": {"hours_tracked": duration / 3600}}
         )
         
+        await rollup_service.add_entry(time_entry.model_dump())
+        
         return time_entry
         
     except HTTPException:
@@ -544,6 +463,10 @@ async def update_time_entry(
         
         # Get updated entry
         updated_entry = await DatabaseOperations.get_document("time_entries", {"id": entry_id})
+        
+        if update_data:
+            await rollup_service.replace_entry(entry_data, updated_entry)
+        
         return TimeEntry(**updated_entry)
         
     except HTTPException:
@@ -558,16 +481,23 @@ async def update_time_entry(
 @router.post("/activity", response_model=ActivityData)
 async def record_activity(
     activity: ActivityData,
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Record activity data"""
     try:
         activity.user_id = current_user.id
         
-        await DatabaseOperations.create_document("activity_data", activity.model_dump())
+        await activity_buffer.add(activity.model_dump())
+        presence_service.heartbeat(current_user.id)
         
         return activity
         
+    except BufferFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Activity ingestion is overloaded, please retry",
+            headers={"Retry-After": "1"}
+        )
     except Exception as e:
         logger.error(f"Record activity error: {e}")
         raise HTTPException(
@@ -575,6 +505,42 @@ async def record_activity(
             detail="Failed to record activity"
         )
 
+@router.post("/activity/batch", status_code=status.HTTP_202_ACCEPTED)
+async def record_activity_batch(
+    activities: List[ActivityData],
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Record several activity samples at once (written in bulk in the background)"""
+    if len(activities) > settings.ACTIVITY_MAX_BATCH_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.ACTIVITY_MAX_BATCH_REQUEST} activity samples per batch"
+        )
+    
+    try:
+        documents = []
+        for activity in activities:
+            activity.user_id = current_user.id
+            documents.append(activity.model_dump())
+        
+        await activity_buffer.add_many(documents)
+        presence_service.heartbeat(current_user.id)
+        
+        return {"accepted": len(documents)}
+        
+    except BufferFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Activity ingestion is overloaded, please retry",
+            headers={"Retry-After": "1"}
+        )
+    except Exception as e:
+        logger.error(f"Record activity batch error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to record activity batch"
+        )
+
 @router.post("/screenshot", response_model=Screenshot)
 async def upload_screenshot(
     time_entry_id: str,
@@ -631,7 +597,8 @@ async def upload_screenshot(
 @router.get("/reports/daily")
 async def get_daily_report(
     date: Optional[date] = None,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    loader: EntityLoader = Depends(get_entity_loader)
 ):
     """Get daily time tracking report"""
     try:
@@ -663,6 +630,9 @@ async def get_daily_report(
         
         total_hours = total_duration / 3600 if total_duration > 0 else 0
         
+        # Resolve all project names for the day in a single query
+        project_docs = await loader.load_many("projects", [entry.get("project_id") for entry in entries_data])
+        
         # Group by project
         projects = {}
         for entry in entries_data:
@@ -672,7 +642,7 @@ async def get_daily_report(
                     continue
                     
                 if project_id not in projects:
-                    project_data = await DatabaseOperations.get_document("projects", {"id": project_id})
+                    project_data = project_docs.get(project_id)
                     projects[project_id] = {
                         "project_name": project_data.get("name", "Unknown") if project_data else "Unknown",
                         "hours": 0,
@@ -710,53 +680,65 @@ async def get_daily_report(
             detail="Failed to get daily report"
         )
 
+async def _compute_team_time_report(start_date: Optional[date], end_date: Optional[date],
+                                    loader: EntityLoader) -> dict:
+    """Aggregate tracked time per team member for the date range"""
+    if not start_date:
+        start_date = (datetime.utcnow() - timedelta(days=7)).date()
+    if not end_date:
+        end_date = datetime.utcnow().date()
+
+    start_datetime = datetime.combine(start_date, datetime.min.time())
+    end_datetime = datetime.combine(end_date, datetime.max.time())
+
+    # Aggregate team data
+    pipeline = [
+        {
+            "$match": {
+                "start_time": {"$gte": start_datetime, "$lte": end_datetime}
+            }
+        },
+        {
+            "$group": {
+                "_id": "$user_id",
+                "total_hours": {"$sum": "$duration"},
+                "entries_count": {"$sum": 1},
+                "projects": {"$addToSet": "$project_id"}
+            }
+        }
+    ]
+
+    team_data = await DatabaseOperations.aggregate("time_entries", pipeline)
+
+    # Get user details
+    users = await loader.load_many("users", [user_data["_id"] for user_data in team_data])
+    for user_data in team_data:
+        user_info = users.get(user_data["_id"])
+        user_data["user_name"] = user_info["name"] if user_info else "Unknown"
+        user_data["total_hours"] = user_data["total_hours"] / 3600
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "team_data": team_data
+    }
+
 @router.get("/reports/team")
 async def get_team_time_report(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-    current_user: User = Depends(require_admin_or_manager)
+    current_user: User = Depends(require_admin_or_manager),
+    loader: EntityLoader = Depends(get_entity_loader)
 ):
     """Get team time tracking report"""
     try:
-        if not start_date:
-            start_date = (datetime.utcnow() - timedelta(days=7)).date()
-        if not end_date:
-            end_date = datetime.utcnow().date()
-        
-        start_datetime = datetime.combine(start_date, datetime.min.time())
-        end_datetime = datetime.combine(end_date, datetime.max.time())
-        
-        # Aggregate team data
-        pipeline = [
-            {
-                "$match": {
-                    "start_time": {"$gte": start_datetime, "$lte": end_datetime}
-                }
-            },
-            {
-                "$group": {
-                    "_id": "$user_id",
-                    "total_hours": {"$sum": "$duration"},
-                    "entries_count": {"$sum": 1},
-                    "projects": {"$addToSet": "$project_id"}
-                }
-            }
-        ]
-        
-        team_data = await DatabaseOperations.aggregate("time_entries", pipeline)
-        
-        # Get user details
-        for user_data in team_data:
-            user_info = await DatabaseOperations.get_document("users", {"id": user_data["_id"]})
-            user_data["user_name"] = user_info["name"] if user_info else "Unknown"
-            user_data["total_hours"] = user_data["total_hours"] / 3600
-        
-        return {
-            "start_date": start_date,
-            "end_date": end_date,
-            "team_data": team_data
-        }
+        # Managers reloading together share a single aggregation
+        return await singleflight.do(
+            f"reports.team|{start_date}|{end_date}",
+            lambda: _compute_team_time_report(start_date, end_date, loader)
+        )
         
+
     except Exception as e:
         logger.error(f"Get team time report error: {e}")
         raise HTTPException(
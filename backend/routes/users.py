@@ -3,6 +3,7 @@ from typing import List, Optional
 from models.user import User, UserUpdate, UserResponse, UserRole
 from auth.dependencies import get_current_user, require_admin_or_manager
 from database.mongodb import DatabaseOperations
+from websocket.manager import manager
 import logging
 
 logger = logging.getLogger(__name__)
@@ -91,6 +92,7 @@ async def update_current_user(
                 {"id": current_user.id},
                 update_data
             )
+            await manager.invalidate_principal(current_user.id)
         
         # Get updated user
         updated_user_data = await DatabaseOperations.get_document("users", {"id": current_user.id})
@@ -126,6 +128,8 @@ async def update_user(
                 {"id": user_id},
                 update_data
             )
+            # Role changes must take effect on the user's next request
+            await manager.invalidate_principal(user_id)
         
         # Get updated user
         updated_user_data = await DatabaseOperations.get_document("users", {"id": user_id})
@@ -162,6 +166,7 @@ async def delete_user(
             )
         
         await DatabaseOperations.delete_document("users", {"id": user_id})
+        await manager.invalidate_principal(user_id)
         
         return {"message": "User deleted successfully"}
         
@@ -0,0 +1,209 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import Optional
+from models.user import User
+from models.webhook import WebhookSubscription, WebhookSubscriptionCreate, WebhookSubscriptionUpdate, WebhookScope
+from auth.dependencies import get_current_user
+from database.mongodb import DatabaseOperations
+from services.webhooks import webhook_dispatcher, check_webhook_url, UnsafeWebhookURL, SUBSCRIPTIONS_COLLECTION, DELIVERIES_COLLECTION
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+def _public(subscription: dict) -> dict:
+    """Subscription without its signing secret"""
+    subscription.pop("_id", None)
+    subscription.pop("secret", None)
+    return subscription
+
+async def _check_url(url: str):
+    try:
+        await check_webhook_url(url)
+    except UnsafeWebhookURL as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+async def _get_subscription_or_404(subscription_id: str, user_id: str) -> dict:
+    subscription = await DatabaseOperations.get_document(
+        SUBSCRIPTIONS_COLLECTION, {"id": subscription_id, "user_id": user_id}
+    )
+    if not subscription:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook subscription not found"
+        )
+    return subscription
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def create_subscription(
+    subscription_data: WebhookSubscriptionCreate,
+    current_user: User = Depends(get_current_user)
+):
+    """Subscribe a URL to events; the signing secret is only returned here"""
+    try:
+        await _check_url(subscription_data.url)
+        if subscription_data.scope == WebhookScope.ORG and current_user.role not in ["admin", "manager"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin or manager access required for organization webhooks"
+            )
+        
+        subscription = WebhookSubscription(**subscription_data.model_dump(), user_id=current_user.id)
+        await DatabaseOperations.create_document(SUBSCRIPTIONS_COLLECTION, subscription.model_dump())
+        
+        return subscription
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Create webhook subscription error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create webhook subscription"
+        )
+
+@router.get("/")
+async def get_subscriptions(current_user: User = Depends(get_current_user)):
+    """Get the user's webhook subscriptions"""
+    try:
+        subscriptions = await DatabaseOperations.get_documents(
+            SUBSCRIPTIONS_COLLECTION, {"user_id": current_user.id}, sort=[("created_at", -1)]
+        )
+        return {"subscriptions": [_public(subscription) for subscription in subscriptions]}
+    
+    except Exception as e:
+        logger.error(f"Get webhook subscriptions error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get webhook subscriptions"
+        )
+
+@router.put("/{subscription_id}")
+async def update_subscription(
+    subscription_id: str,
+    subscription_update: WebhookSubscriptionUpdate,
+    current_user: User = Depends(get_current_user)
+):
+    """Update a webhook subscription"""
+    try:
+        await _get_subscription_or_404(subscription_id, current_user.id)
+        
+        update_data = subscription_update.model_dump(exclude_unset=True)
+        if update_data.get("url"):
+            await _check_url(update_data["url"])
+        if update_data:
+            await DatabaseOperations.update_document(SUBSCRIPTIONS_COLLECTION, {"id": subscription_id}, update_data)
+        
+        return _public(await _get_subscription_or_404(subscription_id, current_user.id))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Update webhook subscription error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to update webhook subscription"
+        )
+
+@router.delete("/{subscription_id}")
+async def delete_subscription(
+    subscription_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a webhook subscription (queued deliveries are dead-lettered)"""
+    try:
+        await _get_subscription_or_404(subscription_id, current_user.id)
+        await DatabaseOperations.delete_document(SUBSCRIPTIONS_COLLECTION, {"id": subscription_id})
+        
+        return {"message": "Webhook subscription deleted successfully"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Delete webhook subscription error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to delete webhook subscription"
+        )
+
+@router.post("/{subscription_id}/test", status_code=status.HTTP_202_ACCEPTED)
+async def test_subscription(
+    subscription_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a ping event to the subscription's URL"""
+    try:
+        subscription = await _get_subscription_or_404(subscription_id, current_user.id)
+        await _check_url(subscription["url"])
+        delivery = await webhook_dispatcher.send_test(subscription)
+        
+        return {"message": "Test event queued", "delivery_id": delivery["id"]}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Test webhook subscription error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to queue test event"
+        )
+
+@router.get("/{subscription_id}/deliveries")
+async def get_deliveries(
+    subscription_id: str,
+    delivery_status: Optional[str] = Query(None, alias="status", description="pending, running, delivered or dead"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user)
+):
+    """Recent deliveries of a subscription; status=dead lists the dead letters"""
+    try:
+        await _get_subscription_or_404(subscription_id, current_user.id)
+        
+        query = {"subscription_id": subscription_id}
+        if delivery_status:
+            query["status"] = delivery_status
+        deliveries = await DatabaseOperations.get_documents(
+            DELIVERIES_COLLECTION, query, sort=[("created_at", -1)], limit=limit
+        )
+        for delivery in deliveries:
+            delivery.pop("_id", None)
+        
+        return {"deliveries": deliveries}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Get webhook deliveries error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get webhook deliveries"
+        )
+
+@router.post("/{subscription_id}/deliveries/{delivery_id}/redeliver", status_code=status.HTTP_202_ACCEPTED)
+async def redeliver(
+    subscription_id: str,
+    delivery_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a dead-lettered or delivered event again"""
+    try:
+        await _get_subscription_or_404(subscription_id, current_user.id)
+        
+        if not await webhook_dispatcher.redeliver(subscription_id, delivery_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Delivery not found or still in progress"
+            )
+        
+        return {"message": "Delivery queued"}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Redeliver webhook error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to queue delivery"
+        )
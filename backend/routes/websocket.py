@@ -1,10 +1,17 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException
 from websocket.manager import manager
+from websocket.rooms import default_rooms, can_join
+from websocket.codec import get_codec
 from auth.jwt_handler import verify_token
-from database.mongodb import DatabaseOperations
+from auth.dependencies import load_user
+from websocket.presence import presence_service
+from services.activity_coalescer import activity_coalescer
+from models.time_tracking import ActivityData
+from pydantic import ValidationError
+from database.loader import EntityLoader, get_entity_loader
 from datetime import datetime
+from typing import Optional
 import logging
-import json
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -15,15 +22,22 @@ async def get_user_from_token(token: str):
     if not user_id:
         return None
     
-    user_data = await DatabaseOperations.get_document("users", {"id": user_id})
-    if not user_data:
+    user = await load_user(user_id)
+    if not user:
         return None
     
-    return user_data
+    return user.model_dump()
 
 @router.websocket("/ws/{token}")
-async def websocket_endpoint(websocket: WebSocket, token: str):
-    """WebSocket endpoint for real-time communication"""
+async def websocket_endpoint(websocket: WebSocket, token: str,
+                             last_seq: Optional[int] = None, epoch: Optional[str] = None,
+                             encoding: Optional[str] = None):
+    """
+    WebSocket endpoint for real-time communication
+
+    ?last_seq=&epoch= resumes a session; ?encoding=msgpack switches the
+    frames to MessagePack (binary) if the server supports it.
+    """
     user_data = await get_user_from_token(token)
     
     if not user_data:
@@ -31,39 +45,86 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
         return
     
     user_id = user_data["id"]
+    codec = get_codec(encoding)
     
     try:
-        await manager.connect(websocket, user_id)
-        
-        # Update user status to online in database
-        await DatabaseOperations.update_document(
-            "users",
-            {"id": user_id},
-            {"status": "active", "last_active": datetime.utcnow()}
-        )
+        # Status and last_active are batched by the presence service
+        await manager.connect(websocket, user_id, role=user_data.get("role"), rooms=await default_rooms(user_data),
+                              last_seq=last_seq, epoch=epoch, codec=codec)
         
         # Send initial data
         await manager.send_personal_message({
             "type": "connection_established",
             "data": {
                 "user_id": user_id,
-                "online_users": manager.get_online_users()
+                "online_users": manager.get_online_users(),
+                "rooms": manager.get_rooms(user_id),
+                "epoch": manager.replay.epoch,
+                "seq": manager.replay.seq,
+                "encoding": codec.name
             }
         }, user_id)
         
         while True:
             # Listen for incoming messages
-            data = await websocket.receive_text()
-            message = json.loads(data)
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            manager.touch(user_id)
+            message = codec.decode(frame["bytes"] if frame.get("bytes") is not None else frame.get("text") or "")
             
             # Handle different message types
-            if message.get("type") == "ping":
+            if message.get("type") == "pong":
+                # Reply to the server heartbeat; receiving it was enough
+                continue
+            
+            elif message.get("type") == "ping":
+                presence_service.heartbeat(user_id)
                 await manager.send_personal_message({
                     "type": "pong",
                     "data": {"timestamp": datetime.utcnow().isoformat()}
                 }, user_id)
             
+            elif message.get("type") == "subscribe":
+                # {"type": "subscribe", "data": {"rooms": ["project:<id>", ...]}}
+                requested = message.get("data", {}).get("rooms", [])
+                allowed = [room for room in requested if isinstance(room, str) and await can_join(user_data, room)]
+                rejected = [room for room in requested if room not in allowed]
+                if rejected:
+                    await manager.send_personal_message({
+                        "type": "error",
+                        "data": {"error": "Not allowed to join these rooms", "rooms": rejected}
+                    }, user_id)
+                await manager.send_personal_message({
+                    "type": "subscribed",
+                    "data": {
+                        "rooms": manager.join(user_id, allowed),
+                        "rejected": rejected
+                    }
+                }, user_id)
+            
+            elif message.get("type") == "unsubscribe":
+                requested = message.get("data", {}).get("rooms", [])
+                await manager.send_personal_message({
+                    "type": "unsubscribed",
+                    "data": {"rooms": manager.leave(user_id, requested)}
+                }, user_id)
+            
             elif message.get("type") == "activity_update":
+                # Stored like POST /time-tracking/activity, merged per minute
+                data = message.get("data") or {}
+                try:
+                    activity = ActivityData(**{"timestamp": datetime.utcnow(), **data, "user_id": user_id})
+                except (ValidationError, TypeError) as e:
+                    # Not stored, but still relayed to the team as before
+                    await manager.send_personal_message({
+                        "type": "activity_rejected",
+                        "data": {"error": str(e)}
+                    }, user_id)
+                else:
+                    activity_coalescer.add(activity)
+                presence_service.heartbeat(user_id)
+                
                 # Broadcast activity update to team
                 await manager.broadcast_team_activity({
                     "user_id": user_id,
@@ -78,29 +139,23 @@ async def websocket_endpoint(websocket: WebSocket, token: str):
                 )
             
     except WebSocketDisconnect:
-        await manager.disconnect(user_id)
-        
-        # Update user status to offline in database
-        await DatabaseOperations.update_document(
-            "users",
-            {"id": user_id},
-            {"status": "offline"}
-        )
+        await manager.disconnect(user_id, websocket)
         
     except Exception as e:
         logger.error(f"WebSocket error for user {user_id}: {e}")
-        await manager.disconnect(user_id)
+        await manager.disconnect(user_id, websocket)
 
 @router.get("/online-users")
-async def get_online_users():
+async def get_online_users(loader: EntityLoader = Depends(get_entity_loader)):
     """Get list of online users"""
     try:
         online_user_ids = manager.get_online_users()
         
         # Get user details
+        users = await loader.load_many("users", online_user_ids)
         users_data = []
         for user_id in online_user_ids:
-            user_data = await DatabaseOperations.get_document("users", {"id": user_id})
+            user_data = users.get(user_id)
             if user_data:
                 users_data.append({
                     "id": user_data["id"],
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
@@ -10,8 +10,28 @@ from contextlib import asynccontextmanager
 # Import database connection
 from database.mongodb import connect_to_mongo, close_mongo_connection
 
+# Import background services
+from services.activity_buffer import activity_buffer
+from services.rollups import rollup_service
+from services.activity_coalescer import activity_coalescer
+from services.http_clients import http_clients
+from services.outbound_queue import outbound_queue
+from services.webhooks import webhook_dispatcher
+from services.provider_cache import provider_cache
+from services.email import email_service
+from services.cache import response_cache
+from services.singleflight import singleflight
+
+# Import auth dependencies
+from auth.dependencies import require_admin
+from auth.principal_cache import principal_cache
+from auth.password_pool import password_pool
+from websocket.manager import manager
+from websocket.presence import presence_service
+from models.user import User
+
 # Import routes
-from routes import auth, users, projects, time_tracking, analytics, integrations, websocket
+from routes import auth, users, projects, time_tracking, analytics, integrations, webhooks, websocket
 
 # Import configuration
 from config import settings
@@ -31,9 +51,28 @@ async def lifespan(app: FastAPI):
     """Application lifespan management"""
     # Startup
     await connect_to_mongo()
+    await rollup_service.start()
+    await activity_buffer.start()
+    await activity_coalescer.start()
+    await http_clients.start()
+    await outbound_queue.start()
+    await webhook_dispatcher.start()
+    await email_service.start()
+    await manager.start()
+    await presence_service.start()
     logger.info("Hubstaff Clone API started successfully")
     yield
     # Shutdown
+    await presence_service.stop()
+    await manager.stop()
+    await email_service.stop()
+    await webhook_dispatcher.stop()
+    await outbound_queue.stop()
+    await http_clients.close()
+    await activity_coalescer.stop()
+    await activity_buffer.stop()
+    await rollup_service.stop()
+    password_pool.shutdown()
     await close_mongo_connection()
     logger.info("Hubstaff Clone API shutdown complete")
 
@@ -67,6 +106,7 @@ app.add_middleware(
     allow_origins=allowed_origins,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Include all route modules
@@ -76,6 +116,7 @@ api_router.include_router(projects.router)
 api_router.include_router(time_tracking.router)
 api_router.include_router(analytics.router)
 api_router.include_router(integrations.router)
+api_router.include_router(webhooks.router)
 
 # Include WebSocket routes (without /api prefix)
 app.include_router(websocket.router)
@@ -108,6 +149,26 @@ async def api_health_check():
         "api_path": "/api"
     }
 
+# Runtime metrics endpoint (admin only). Registered on the app directly
+# because api_router has already been included above.
+@app.get("/api/metrics")
+async def get_metrics(current_user: User = Depends(require_admin)):
+    return {
+        "response_cache": response_cache.get_stats(),
+        "singleflight": singleflight.stats,
+        "principal_cache": principal_cache.get_stats(),
+        "password_pool": password_pool.get_stats(),
+        "websocket": manager.get_stats(),
+        "presence": presence_service.get_stats(),
+        "activity_buffer": {**activity_buffer.stats, "pending": activity_buffer.pending},
+        "activity_coalescer": activity_coalescer.get_stats(),
+        "http_clients": http_clients.get_stats(),
+        "provider_cache": provider_cache.get_stats(),
+        "outbound_queue": outbound_queue.get_stats(),
+        "webhooks": webhook_dispatcher.get_stats(),
+        "email": email_service.get_stats()
+    }
+
 # Root endpoint
 @api_router.get("/")
 async def root():
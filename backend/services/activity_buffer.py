@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional
+from pymongo.errors import BulkWriteError
+from database.mongodb import DatabaseOperations
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class BufferFullError(Exception):
+    """Raised when the buffer stays full for longer than the enqueue timeout"""
+    pass
+
+class ActivityWriteBuffer:
+    """
+    In-process write-behind buffer for high frequency activity reports
+
+    Documents are accumulated in memory and written with unordered
+    insert_many calls whenever max_batch_size documents are waiting or
+    flush_interval seconds have passed. At most max_pending documents are
+    held; producers wait up to enqueue_timeout for room before
+    BufferFullError is raised so callers can shed load.
+    """
+
+    def __init__(self,
+                 collection: str = "activity_data",
+                 max_batch_size: int = settings.ACTIVITY_BATCH_SIZE,
+                 flush_interval: float = settings.ACTIVITY_FLUSH_INTERVAL,
+                 max_pending: int = settings.ACTIVITY_MAX_PENDING,
+                 enqueue_timeout: float = settings.ACTIVITY_ENQUEUE_TIMEOUT):
+        self.collection = collection
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enqueue_timeout = enqueue_timeout
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._space_available: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {"buffered": 0, "written": 0, "failed": 0, "rejected": 0, "flushes": 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        """Start the background flush loop"""
+        if self._task is not None:
+            return
+        self._flush_requested = asyncio.Event()
+        self._space_available = asyncio.Event()
+        self._space_available.set()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Activity write buffer started (batch={self.max_batch_size}, interval={self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop the flush loop and drain everything that is still buffered"""
+        if self._task is None:
+            return
+        # Let the loop finish its current write instead of cancelling it mid-batch
+        self._stopping = True
+        self._flush_requested.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        logger.info(f"Activity write buffer drained ({self.stats['written']} documents written)")
+
+    async def add_many(self, documents: List[Dict[str, Any]]):
+        """Queue documents for writing, waiting for room if the buffer is full"""
+        if self._task is None:
+            # Not running (e.g. scripts or shutdown) - write through
+            await self._write(documents)
+            return
+
+        if len(documents) > self.max_pending:
+            raise BufferFullError("Batch is larger than the activity buffer")
+
+        while len(self._pending) + len(documents) > self.max_pending:
+            self._space_available.clear()
+            self._flush_requested.set()
+            try:
+                await asyncio.wait_for(self._space_available.wait(), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += len(documents)
+                raise BufferFullError("Activity buffer is full")
+
+        self._pending.extend(documents)
+        self.stats["buffered"] += len(documents)
+        if len(self._pending) >= self.max_batch_size:
+            self._flush_requested.set()
+
+    async def add(self, document: Dict[str, Any]):
+        await self.add_many([document])
+
+    async def flush(self):
+        """Write out everything that is currently buffered"""
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch_size]
+                del self._pending[:self.max_batch_size]
+                if self._space_available is not None:
+                    self._space_available.set()
+                await self._write(batch)
+                self.stats["flushes"] += 1
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            inserted = await DatabaseOperations.create_documents(self.collection, batch, ordered=False)
+            self.stats["written"] += inserted
+        except BulkWriteError as e:
+            # Unordered inserts keep going past individual failures
+            inserted = e.details.get("nInserted", 0)
+            self.stats["written"] += inserted
+            self.stats["failed"] += len(batch) - inserted
+            logger.error(f"Activity bulk insert partially failed: {len(batch) - inserted} of {len(batch)} documents")
+        except Exception as e:
+            self.stats["failed"] += len(batch)
+            logger.error(f"Activity bulk insert failed for {len(batch)} documents: {e}")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            if self._pending:
+                await self.flush()
+
+# Global activity buffer instance
+activity_buffer = ActivityWriteBuffer()
@@ -0,0 +1,171 @@
+import asyncio
+import uuid
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from pymongo import UpdateOne
+from database.mongodb import DatabaseOperations
+from models.time_tracking import ActivityData
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# (user_id, time_entry_id, minute)
+MinuteKey = Tuple[str, str, datetime]
+
+class ActivityCoalescer:
+    """
+    Merges streamed activity samples into one activity_data row per minute
+
+    WebSocket clients report activity every few seconds. Samples for the
+    same (user, time entry, minute) are summed in memory, and every
+    flush_interval seconds the totals are upserted with one bulk_write.
+    Counters are added to the stored row, active_app/active_url keep the
+    latest value, and activity_score is the mean over all samples of the
+    minute (activity_samples / activity_score_total keep the running
+    totals). At most max_keys minutes are held; past that a flush is
+    forced and further samples are dropped until it finishes. A failed
+    write puts its minutes back so the next flush retries them.
+    """
+
+    def __init__(self,
+                 collection: str = "activity_data",
+                 flush_interval: float = settings.ACTIVITY_COALESCE_INTERVAL,
+                 max_keys: int = settings.ACTIVITY_COALESCE_MAX_KEYS):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_keys = max_keys
+        self._pending: Dict[MinuteKey, Dict[str, Any]] = {}
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {"samples": 0, "coalesced": 0, "dropped": 0, "flushes": 0, "rows_written": 0,
+                      "write_errors": 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._flush_requested = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Let the loop finish its current write instead of cancelling it mid-batch
+        self._stopping = True
+        self._flush_requested.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    def add(self, activity: ActivityData) -> bool:
+        """Merge a validated sample, returning False if it had to be dropped"""
+        minute = activity.timestamp.replace(second=0, microsecond=0)
+        key = (activity.user_id, activity.time_entry_id, minute)
+        merged = self._pending.get(key)
+        if merged is None:
+            if len(self._pending) >= self.max_keys:
+                self.stats["dropped"] += 1
+                if self._flush_requested is not None:
+                    self._flush_requested.set()
+                return False
+            merged = self._pending[key] = {"mouse_clicks": 0, "keyboard_strokes": 0, "samples": 0,
+                                           "score_total": 0.0}
+        else:
+            self.stats["coalesced"] += 1
+
+        merged["mouse_clicks"] += activity.mouse_clicks
+        merged["keyboard_strokes"] += activity.keyboard_strokes
+        merged["samples"] += 1
+        merged["score_total"] += activity.activity_score
+        for field in ("active_app", "active_url", "screenshot_url"):
+            value = getattr(activity, field)
+            if value is not None:
+                merged[field] = value
+        self.stats["samples"] += 1
+        return True
+
+    async def flush(self):
+        """Upsert every pending minute with one bulk write"""
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            operations = [self._upsert(key, merged) for key, merged in pending.items()]
+            try:
+                await DatabaseOperations.bulk_write(self.collection, operations)
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += len(operations)
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"Activity upsert failed for {len(operations)} minutes: {e}")
+                self._restore(pending)
+
+    def _restore(self, pending: Dict[MinuteKey, Dict[str, Any]]):
+        """Merge the minutes of a failed write back in front of newer samples"""
+        for key, merged in pending.items():
+            newer = self._pending.get(key)
+            if newer is None:
+                if len(self._pending) >= self.max_keys:
+                    self.stats["dropped"] += merged["samples"]
+                    continue
+                self._pending[key] = merged
+                continue
+            for field in ("mouse_clicks", "keyboard_strokes", "samples", "score_total"):
+                newer[field] += merged[field]
+            for field in ("active_app", "active_url", "screenshot_url"):
+                if field in merged:
+                    newer.setdefault(field, merged[field])
+
+    @staticmethod
+    def _upsert(key: MinuteKey, merged: Dict[str, Any]) -> UpdateOne:
+        user_id, time_entry_id, minute = key
+
+        def add(field: str, amount):
+            return {"$add": [{"$ifNull": [f"${field}", 0]}, amount]}
+
+        fields = {
+            "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+            "mouse_clicks": add("mouse_clicks", merged["mouse_clicks"]),
+            "keyboard_strokes": add("keyboard_strokes", merged["keyboard_strokes"]),
+            "activity_samples": add("activity_samples", merged["samples"]),
+            "activity_score_total": add("activity_score_total", merged["score_total"]),
+        }
+        for field in ("active_app", "active_url", "screenshot_url"):
+            if field in merged:
+                # $literal: an app name or URL must never be read as a field path
+                fields[field] = {"$literal": merged[field]}
+
+        # Update pipeline, so the mean can be computed from the stored totals
+        pipeline = [
+            {"$set": fields},
+            {"$set": {"activity_score": {"$divide": ["$activity_score_total", "$activity_samples"]}}}
+        ]
+        return UpdateOne({"user_id": user_id, "time_entry_id": time_entry_id, "timestamp": minute},
+                         pipeline, upsert=True)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Activity coalescer flush failed: {e}")
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "pending": len(self._pending)}
+
+# Global activity coalescer instance
+activity_coalescer = ActivityCoalescer()
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+from services.singleflight import singleflight
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Project and task metadata (names, statuses, budgets) shared by every caller
+PROJECTS_TAG = "projects"
+
+def user_tag(user_id: str) -> str:
+    """Tag for responses built from one user's time entries"""
+    return f"user:{user_id}"
+
+def project_tag(project_id: str) -> str:
+    """Tag for responses built from one project's time entries or tasks"""
+    return f"project:{project_id}"
+
+class CacheEntry:
+    """A cached value with its freshness deadlines (epoch seconds) and tags"""
+
+    __slots__ = ("value", "fresh_until", "stale_until", "tags")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float, tags: Iterable[str] = ()):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.tags = frozenset(tags)
+
+class CacheBackend:
+    """
+    Storage interface for ResponseCache
+
+    The in-memory backend below is the default. A shared backend (e.g.
+    Redis) implements the same four coroutines; values it stores must then
+    be serializable.
+    """
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        raise NotImplementedError
+
+    async def set(self, key: str, entry: CacheEntry):
+        raise NotImplementedError
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Remove every entry carrying one of the tags, returning how many were removed"""
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU cache with a tag index for invalidation"""
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._tags: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.stale_until <= time.time():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: CacheEntry):
+        self._remove(key)
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        keys = set()
+        for tag in tags:
+            keys.update(self._tags.get(tag, ()))
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    async def clear(self):
+        self._entries.clear()
+        self._tags.clear()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+class ResponseCache:
+    """
+    Read-through cache for expensive endpoint responses
+
+    Entries are fresh for `ttl` seconds and may then be served stale for up
+    to `stale_ttl` more seconds while a single background task recomputes
+    them. Concurrent misses for a key share one computation. Entries are
+    tagged with the data scopes they were built from (see user_tag and
+    project_tag) and the code that writes to a scope invalidates only it.
+    """
+
+    def __init__(self, backend: CacheBackend,
+                 ttl: float = settings.CACHE_TTL,
+                 stale_ttl: float = settings.CACHE_STALE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # Bumped on every invalidation so a computation that started before
+        # a write does not store its now outdated result afterwards
+        self._generations: Dict[str, int] = {}
+        self._refreshing: Set[str] = set()
+        # The loop only holds weak references to tasks; keep refreshes alive until done
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(endpoint: str, scope: str, **params) -> str:
+        """Build a key from the endpoint, the caller's data scope and the request parameters"""
+        encoded = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+        return f"{endpoint}|{scope}|{encoded}"
+
+    async def get_or_set(self, key: str, compute: Callable[[], Awaitable[Any]],
+                         tags: Iterable[str] = (), ttl: Optional[float] = None,
+                         stale_ttl: Optional[float] = None) -> Any:
+        """Return the cached value for key, computing and storing it when missing or expired"""
+        tags = tuple(tags)
+        entry = await self.backend.get(key)
+        now = time.time()
+
+        if entry is not None and now < entry.fresh_until:
+            self.stats["hits"] += 1
+            return entry.value
+
+        if entry is not None and now < entry.stale_until:
+            self.stats["stale_hits"] += 1
+            if key not in self._refreshing:
+                self._refreshing.add(key)
+                task = asyncio.create_task(self._refresh(key, compute, tags, ttl, stale_ttl))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return entry.value
+
+        self.stats["misses"] += 1
+        # Concurrent misses for the same key wait on one computation
+        return await singleflight.do(
+            f"cache|{key}",
+            lambda: self._compute_and_store(key, compute, tags, ttl, stale_ttl)
+        )
+
+    async def invalidate(self, *tags: str) -> int:
+        """Drop every entry tagged with any of the given tags"""
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        removed = await self.backend.invalidate_tags(tags)
+        if removed:
+            self.stats["invalidations"] += removed
+            logger.debug(f"Invalidated {removed} cached responses for {', '.join(tags)}")
+        return removed
+
+    async def clear(self):
+        await self.backend.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        stats = dict(self.stats)
+        stats["hit_ratio"] = round((self.stats["hits"] + self.stats["stale_hits"]) / lookups, 3) if lookups else 0
+        if isinstance(self.backend, MemoryCacheBackend):
+            stats["entries"] = len(self.backend)
+        return stats
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Any]],
+                                 tags: tuple, ttl: Optional[float], stale_ttl: Optional[float]) -> Any:
+        generations = [self._generations.get(tag, 0) for tag in tags]
+        value = await compute()
+
+        if generations == [self._generations.get(tag, 0) for tag in tags]:
+            now = time.time()
+            fresh_until = now + (self.ttl if ttl is None else ttl)
+            stale_until = fresh_until + (self.stale_ttl if stale_ttl is None else stale_ttl)
+            await self.backend.set(key, CacheEntry(value, fresh_until, stale_until, tags))
+        return value
+
+    async def _refresh(self, key: str, compute: Callable[[], Awaitable[Any]],
+                       tags: tuple, ttl: Optional[float], stale_ttl: Optional[float]):
+        try:
+            await self._compute_and_store(key, compute, tags, ttl, stale_ttl)
+            self.stats["refreshes"] += 1
+        except Exception as e:
+            self.stats["refresh_errors"] += 1
+            logger.error(f"Background cache refresh failed for {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+# Global response cache instance
+response_cache = ResponseCache(MemoryCacheBackend(max_entries=settings.CACHE_MAX_ENTRIES))
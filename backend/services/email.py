@@ -1,83 +1,61 @@
-import smtplib
+import asyncio
+import html
+import random
+import time
+import uuid
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Optional
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import make_msgid
+from string import Template
+from typing import Any, Dict, List, Optional, Tuple
+import aiosmtplib
+from database.mongodb import DatabaseOperations
 from config import settings
 
 logger = logging.getLogger(__name__)
 
-class EmailService:
-    """Email service for sending notifications and invitations"""
+EMAIL_OUTBOX_COLLECTION = "email_outbox"
+
+# Links that grant access; removed from a message's context once it is sent or given up on
+_SECRET_FIELDS = {"context.reset_link": "", "context.invite_link": ""}
+
+class EmailTemplate:
+    """Subject, plain text and HTML bodies compiled once; values are HTML-escaped in the HTML part"""
     
-    def __init__(self):
-        self.smtp_host = settings.SMTP_HOST
-        self.smtp_port = settings.SMTP_PORT
-        self.smtp_username = settings.SMTP_USERNAME
-        self.smtp_password = settings.SMTP_PASSWORD
-        self.from_email = settings.SMTP_FROM_EMAIL
-        self.is_configured = bool(self.smtp_host and self.smtp_username and self.smtp_password)
+    __slots__ = ("subject", "text", "html")
     
-    async def send_invitation_email(self, 
-                                  to_email: str, 
-                                  inviter_name: str, 
-                                  role: str, 
-                                  invite_link: str) -> bool:
-        """
-        Send invitation email to new user
-        
-        Args:
-            to_email: Recipient email address
-            inviter_name: Name of the person sending the invitation
-            role: Role being assigned (admin, manager, user)
-            invite_link: Link to accept the invitation
-            
-        Returns:
-            bool: True if email was sent successfully
-        """
-        if not self.is_configured:
-            logger.warning("Email service not configured, printing invitation details to console")
-            self._print_invitation_details(to_email, inviter_name, role, invite_link)
-            return True
-        
-        try:
-            subject = f"Invitation to join Hubstaff Clone as {role.title()}"
-            
-            # Create email content
-            html_content = self._create_invitation_html(inviter_name, role, invite_link)
-            text_content = self._create_invitation_text(inviter_name, role, invite_link)
-            
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = subject
-            message["From"] = self.from_email
-            message["To"] = to_email
-            
-            # Add text and HTML parts
-            text_part = MIMEText(text_content, "plain")
-            html_part = MIMEText(html_content, "html")
-            
-            message.attach(text_part)
-            message.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(message)
-            
-            logger.info(f"Invitation email sent successfully to {to_email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send invitation email to {to_email}: {e}")
-            # Fall back to console output
-            self._print_invitation_details(to_email, inviter_name, role, invite_link)
-            return False
+    def __init__(self, subject: str, text: str, html_body: str):
+        self.subject = Template(subject)
+        self.text = Template(text)
+        self.html = Template(html_body)
     
-    def _create_invitation_html(self, inviter_name: str, role: str, invite_link: str) -> str:
-        """Create HTML email content for invitation"""
-        return f"""
+    def render(self, context: Dict[str, Any]) -> Tuple[str, str, str]:
+        escaped = {key: html.escape(str(value)) for key, value in context.items()}
+        return self.subject.substitute(context), self.text.substitute(context), self.html.substitute(escaped)
+
+INVITATION_TEMPLATE = EmailTemplate(
+    "Invitation to join Hubstaff Clone as $role",
+    """
+You're invited to join Hubstaff Clone!
+
+Hi there!
+
+$inviter_name has invited you to join their team on Hubstaff Clone as a $role.
+
+Hubstaff Clone is a comprehensive time tracking and productivity monitoring platform that helps teams work more efficiently.
+
+To accept this invitation, please click the following link:
+$invite_link
+
+This invitation will expire in $expire_days days.
+
+If you didn't expect this invitation, you can safely ignore this email.
+
+Best regards,
+The Hubstaff Clone Team
+        """,
+    """
         <!DOCTYPE html>
         <html>
         <head>
@@ -95,24 +73,24 @@ class EmailService:
                     
                     <p>Hi there!</p>
                     
-                    <p><strong>{inviter_name}</strong> has invited you to join their team on <strong>Hubstaff Clone</strong> as a <strong>{role.title()}</strong>.</p>
+                    <p><strong>$inviter_name</strong> has invited you to join their team on <strong>Hubstaff Clone</strong> as a <strong>$role</strong>.</p>
                     
                     <p>Hubstaff Clone is a comprehensive time tracking and productivity monitoring platform that helps teams work more efficiently.</p>
                     
                     <div style="text-align: center; margin: 30px 0;">
-                        <a href="{invite_link}" 
+                        <a href="$invite_link"
                            style="background: #007bff; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">
                             Accept Invitation
                         </a>
                     </div>
                     
                     <p style="font-size: 14px; color: #6c757d;">
-                        This invitation will expire in {settings.INVITATION_EXPIRE_DAYS} days. 
+                        This invitation will expire in $expire_days days.
                         If you can't click the button above, copy and paste this link into your browser:
                     </p>
                     
                     <p style="word-break: break-all; background: #e9ecef; padding: 10px; border-radius: 5px; font-family: monospace;">
-                        {invite_link}
+                        $invite_link
                     </p>
                     
                     <hr style="margin: 30px 0; border: none; border-top: 1px solid #dee2e6;">
@@ -125,87 +103,28 @@ class EmailService:
         </body>
         </html>
         """
-    
-    def _create_invitation_text(self, inviter_name: str, role: str, invite_link: str) -> str:
-        """Create plain text email content for invitation"""
-        return f"""
-You're invited to join Hubstaff Clone!
+)
 
-Hi there!
+PASSWORD_RESET_TEMPLATE = EmailTemplate(
+    "Password Reset - Hubstaff Clone",
+    """
+Password Reset - Hubstaff Clone
 
-{inviter_name} has invited you to join their team on Hubstaff Clone as a {role.title()}.
+Hi $user_name,
 
-Hubstaff Clone is a comprehensive time tracking and productivity monitoring platform that helps teams work more efficiently.
+We received a request to reset your password for your Hubstaff Clone account.
 
-To accept this invitation, please click the following link:
-{invite_link}
+If you made this request, please click the following link to reset your password:
+$reset_link
 
-This invitation will expire in {settings.INVITATION_EXPIRE_DAYS} days.
+This link will expire in 1 hour for security reasons.
 
-If you didn't expect this invitation, you can safely ignore this email.
+If you didn't request this password reset, you can safely ignore this email. Your password will remain unchanged.
 
 Best regards,
 The Hubstaff Clone Team
-        """
-    
-    async def send_password_reset_email(self, 
-                                       to_email: str, 
-                                       user_name: str, 
-                                       reset_link: str) -> bool:
-        """
-        Send password reset email
-        
-        Args:
-            to_email: Recipient email address
-            user_name: Name of the user requesting reset
-            reset_link: Link to reset password
-            
-        Returns:
-            bool: True if email was sent successfully
-        """
-        if not self.is_configured:
-            logger.warning("Email service not configured, printing reset details to console")
-            self._print_reset_details(to_email, user_name, reset_link)
-            return True
-        
-        try:
-            subject = "Password Reset - Hubstaff Clone"
-            
-            # Create email content
-            html_content = self._create_reset_html(user_name, reset_link)
-            text_content = self._create_reset_text(user_name, reset_link)
-            
-            # Create message
-            message = MIMEMultipart("alternative")
-            message["Subject"] = subject
-            message["From"] = self.from_email
-            message["To"] = to_email
-            
-            # Add text and HTML parts
-            text_part = MIMEText(text_content, "plain")
-            html_part = MIMEText(html_content, "html")
-            
-            message.attach(text_part)
-            message.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_host, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.smtp_username, self.smtp_password)
-                server.send_message(message)
-            
-            logger.info(f"Password reset email sent successfully to {to_email}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send password reset email to {to_email}: {e}")
-            # Fall back to console output
-            self._print_reset_details(to_email, user_name, reset_link)
-            return False
-    
-    def _create_reset_html(self, user_name: str, reset_link: str) -> str:
-        """Create HTML email content for password reset"""
-        return f"""
+        """,
+    """
         <!DOCTYPE html>
         <html>
         <head>
@@ -221,26 +140,26 @@ The Hubstaff Clone Team
                 <div style="background: #f8f9fa; padding: 30px; border-radius: 0 0 10px 10px; border: 1px solid #e9ecef;">
                     <h2 style="color: #495057; margin-top: 0;">Reset Your Password</h2>
                     
-                    <p>Hi {user_name},</p>
+                    <p>Hi $user_name,</p>
                     
                     <p>We received a request to reset your password for your <strong>Hubstaff Clone</strong> account.</p>
                     
                     <p>If you made this request, click the button below to reset your password:</p>
                     
                     <div style="text-align: center; margin: 30px 0;">
-                        <a href="{reset_link}" 
+                        <a href="$reset_link"
                            style="background: #dc3545; color: white; padding: 15px 30px; text-decoration: none; border-radius: 5px; font-weight: bold; display: inline-block;">
                             Reset Password
                         </a>
                     </div>
                     
                     <p style="font-size: 14px; color: #6c757d;">
-                        This link will expire in 1 hour for security reasons. 
+                        This link will expire in 1 hour for security reasons.
                         If you can't click the button above, copy and paste this link into your browser:
                     </p>
                     
                     <p style="word-break: break-all; background: #e9ecef; padding: 10px; border-radius: 5px; font-family: monospace;">
-                        {reset_link}
+                        $reset_link
                     </p>
                     
                     <hr style="margin: 30px 0; border: none; border-top: 1px solid #dee2e6;">
@@ -253,26 +172,369 @@ The Hubstaff Clone Team
         </body>
         </html>
         """
-    
-    def _create_reset_text(self, user_name: str, reset_link: str) -> str:
-        """Create plain text email content for password reset"""
-        return f"""
-Password Reset - Hubstaff Clone
-
-Hi {user_name},
-
-We received a request to reset your password for your Hubstaff Clone account.
+)
 
-If you made this request, please click the following link to reset your password:
-{reset_link}
+TEMPLATES: Dict[str, EmailTemplate] = {
+    "invitation": INVITATION_TEMPLATE,
+    "password_reset": PASSWORD_RESET_TEMPLATE
+}
 
-This link will expire in 1 hour for security reasons.
+class EmailService:
+    """
+    Email service for sending notifications and invitations
+    
+    Routes only store a message in the email_outbox collection, so a
+    request never waits on SMTP. `concurrency` background senders each keep
+    one authenticated SMTP connection open and send many messages over it,
+    closing it after idle_timeout seconds without work. Sends are spaced to
+    stay under rate_per_minute across all senders. Temporary failures
+    (4xx replies, dropped connections) are retried with backoff up to
+    max_attempts; 5xx rejections fail the message. Claims are leased, so a
+    message held by a crashed process is sent again after the lease.
+    Once sent or failed, a message loses the reset/invite link from its
+    stored context and expires (TTL indexes in database.indexes).
+    
+    Without SMTP_HOST the details are printed to the console instead. For
+    local testing, point SMTP_HOST/SMTP_PORT at `python -m aiosmtpd -n`
+    with SMTP_STARTTLS=false and no username.
+    """
+    
+    def __init__(self,
+                 concurrency: int = settings.EMAIL_CONCURRENCY,
+                 rate_per_minute: int = settings.EMAIL_RATE_PER_MINUTE,
+                 max_attempts: int = settings.EMAIL_MAX_ATTEMPTS,
+                 backoff_base: float = settings.EMAIL_BACKOFF_BASE,
+                 backoff_max: float = settings.EMAIL_BACKOFF_MAX,
+                 poll_interval: float = settings.EMAIL_POLL_INTERVAL,
+                 lease: float = settings.EMAIL_LEASE,
+                 idle_timeout: float = settings.EMAIL_IDLE_TIMEOUT):
+        self.smtp_host = settings.SMTP_HOST
+        self.smtp_port = settings.SMTP_PORT
+        self.smtp_username = settings.SMTP_USERNAME
+        self.smtp_password = settings.SMTP_PASSWORD
+        self.from_email = settings.SMTP_FROM_EMAIL
+        # Authentication is optional (local relays, aiosmtpd)
+        self.is_configured = bool(self.smtp_host)
+        self.concurrency = concurrency
+        self.rate_per_minute = rate_per_minute
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.idle_timeout = idle_timeout
+        self._senders: List[asyncio.Task] = []
+        self._connections = 0
+        self._next_slot = 0.0
+        self._stopping = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self.stats = {
+            "queued": 0, "sent": 0, "retried": 0, "failed": 0, "connections_opened": 0,
+            "send_ms_total": 0.0, "send_ms_max": 0.0
+        }
+    
+    async def send_invitation_email(self,
+                                  to_email: str,
+                                  inviter_name: str,
+                                  role: str,
+                                  invite_link: str) -> bool:
+        """
+        Queue invitation email to new user
+        
+        Args:
+            to_email: Recipient email address
+            inviter_name: Name of the person sending the invitation
+            role: Role being assigned (admin, manager, user)
+            invite_link: Link to accept the invitation
+        
+        Returns:
+            bool: True if email was queued (or printed) successfully
+        """
+        if not self.is_configured:
+            logger.warning("Email service not configured, printing invitation details to console")
+            self._print_invitation_details(to_email, inviter_name, role, invite_link)
+            return True
+        
+        try:
+            await self.enqueue(to_email, "invitation", self._invitation_context(inviter_name, role, invite_link))
+            return True
+        
+        except Exception as e:
+            logger.error(f"Failed to queue invitation email to {to_email}: {e}")
+            # Fall back to console output
+            self._print_invitation_details(to_email, inviter_name, role, invite_link)
+            return False
+    
+    async def send_invitation_emails(self, inviter_name: str, invitations: List[Tuple[str, str, str]]) -> bool:
+        """
+        Queue invitation emails for a bulk invite with one insert
 
-If you didn't request this password reset, you can safely ignore this email. Your password will remain unchanged.
+        Args:
+            inviter_name: Name of the person sending the invitations
+            invitations: (to_email, role, invite_link) per invitation
 
-Best regards,
-The Hubstaff Clone Team
+        Returns:
+            bool: True if the emails were queued (or printed) successfully
+        """
+        if not invitations:
+            return True
+        
+        if not self.is_configured:
+            logger.warning("Email service not configured, printing invitation details to console")
+            for to_email, role, invite_link in invitations:
+                self._print_invitation_details(to_email, inviter_name, role, invite_link)
+            return True
+        
+        try:
+            messages = [self._message(to_email, "invitation", self._invitation_context(inviter_name, role, invite_link))
+                        for to_email, role, invite_link in invitations]
+            await DatabaseOperations.create_documents(EMAIL_OUTBOX_COLLECTION, messages, ordered=False)
+            self.stats["queued"] += len(messages)
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return True
+        
+        except Exception as e:
+            logger.error(f"Failed to queue {len(invitations)} invitation emails: {e}")
+            for to_email, role, invite_link in invitations:
+                self._print_invitation_details(to_email, inviter_name, role, invite_link)
+            return False
+    
+    async def send_password_reset_email(self,
+                                       to_email: str,
+                                       user_name: str,
+                                       reset_link: str) -> bool:
+        """
+        Queue password reset email
+        
+        Args:
+            to_email: Recipient email address
+            user_name: Name of the user requesting reset
+            reset_link: Link to reset password
+        
+        Returns:
+            bool: True if email was queued (or printed) successfully
         """
+        if not self.is_configured:
+            logger.warning("Email service not configured, printing reset details to console")
+            self._print_reset_details(to_email, user_name, reset_link)
+            return True
+        
+        try:
+            await self.enqueue(to_email, "password_reset", {"user_name": user_name, "reset_link": reset_link})
+            return True
+        
+        except Exception as e:
+            logger.error(f"Failed to queue password reset email to {to_email}: {e}")
+            # Fall back to console output
+            self._print_reset_details(to_email, user_name, reset_link)
+            return False
+    
+    async def enqueue(self, to_email: str, template: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a message in the outbox for the background senders"""
+        message = self._message(to_email, template, context)
+        await DatabaseOperations.create_document(EMAIL_OUTBOX_COLLECTION, message)
+        self.stats["queued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return message
+    
+    @staticmethod
+    def _message(to_email: str, template: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        if template not in TEMPLATES:
+            raise ValueError(f"Unknown email template: {template}")
+        now = datetime.utcnow()
+        return {
+            "id": str(uuid.uuid4()),
+            "to": to_email,
+            "template": template,
+            "context": context,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        }
+    
+    @staticmethod
+    def _invitation_context(inviter_name: str, role: str, invite_link: str) -> Dict[str, Any]:
+        return {
+            "inviter_name": inviter_name,
+            "role": role.title(),
+            "invite_link": invite_link,
+            "expire_days": settings.INVITATION_EXPIRE_DAYS
+        }
+    
+    async def start(self):
+        if self._senders or not self.is_configured:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._senders = [asyncio.create_task(self._sender()) for _ in range(self.concurrency)]
+        logger.info(f"Email outbox started with {self.concurrency} sender(s) for {self.smtp_host}:{self.smtp_port}")
+    
+    async def stop(self):
+        if not self._senders:
+            return
+        # Let messages being sent finish; unclaimed ones stay in the outbox
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(self._senders, timeout=settings.SMTP_TIMEOUT)
+        for sender in pending:
+            sender.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        self._senders = []
+    
+    async def _sender(self):
+        smtp: Optional[aiosmtplib.SMTP] = None
+        last_used = time.monotonic()
+        try:
+            while not self._stopping:
+                try:
+                    message = await self._claim()
+                except Exception as e:
+                    logger.error(f"Email outbox claim failed: {e}")
+                    message = None
+                
+                if message is None:
+                    if smtp is not None and time.monotonic() - last_used > self.idle_timeout:
+                        smtp = await self._disconnect(smtp)
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._wakeup.clear()
+                    continue
+                
+                await self._throttle()
+                smtp = await self._send(smtp, message)
+                last_used = time.monotonic()
+        finally:
+            if smtp is not None:
+                await self._disconnect(smtp)
+    
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await DatabaseOperations.find_one_and_update(
+            EMAIL_OUTBOX_COLLECTION,
+            {
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    # Lease expired: the sender holding it went away
+                    {"status": "running", "locked_until": {"$lt": now}}
+                ]
+            },
+            {"$set": {"status": "running", "locked_until": now + timedelta(seconds=self.lease)},
+             "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)]
+        )
+    
+    async def _throttle(self):
+        """Space sends out so all senders together stay under rate_per_minute"""
+        if self.rate_per_minute <= 0:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + 60.0 / self.rate_per_minute
+        if slot > now:
+            await asyncio.sleep(slot - now)
+    
+    async def _send(self, smtp: Optional[aiosmtplib.SMTP], message: Dict[str, Any]) -> Optional[aiosmtplib.SMTP]:
+        """Send one outbox message, returning the connection to reuse (None if it was dropped)"""
+        started = time.perf_counter()
+        try:
+            email_message = self._build(message)
+            if smtp is None or not smtp.is_connected:
+                smtp = await self._connect()
+            await smtp.send_message(email_message)
+        except aiosmtplib.SMTPRecipientsRefused as e:
+            code = e.recipients[0].code if e.recipients else 550
+            await self._failed_attempt(message, f"Recipient refused ({code})", permanent=code >= 500)
+            return smtp
+        except (aiosmtplib.SMTPSenderRefused, aiosmtplib.SMTPDataError) as e:
+            await self._failed_attempt(message, f"SMTP {e.code}: {e.message}", permanent=e.code >= 500)
+            return smtp
+        except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as e:
+            # Connection-level problem: start over with a fresh connection
+            await self._failed_attempt(message, f"{type(e).__name__}: {e}")
+            return await self._disconnect(smtp) if smtp is not None else None
+        except Exception as e:
+            logger.error(f"Email {message['id']} error: {e}")
+            await self._failed_attempt(message, str(e))
+            return smtp
+        finally:
+            send_ms = (time.perf_counter() - started) * 1000
+            self.stats["send_ms_total"] += send_ms
+            self.stats["send_ms_max"] = max(self.stats["send_ms_max"], send_ms)
+        
+        await DatabaseOperations.update_document(EMAIL_OUTBOX_COLLECTION, {"id": message["id"]}, {
+            "$set": {"status": "sent", "last_error": None, "sent_at": datetime.utcnow()},
+            "$unset": _SECRET_FIELDS
+        })
+        self.stats["sent"] += 1
+        logger.info(f"{message['template'].replace('_', ' ').capitalize()} email sent to {message['to']}")
+        return smtp
+    
+    def _build(self, message: Dict[str, Any]) -> EmailMessage:
+        subject, text_content, html_content = TEMPLATES[message["template"]].render(message["context"])
+        email_message = EmailMessage()
+        email_message["Subject"] = subject
+        email_message["From"] = self.from_email
+        email_message["To"] = message["to"]
+        email_message["Message-ID"] = make_msgid(idstring=message["id"])
+        email_message.set_content(text_content)
+        email_message.add_alternative(html_content, subtype="html")
+        return email_message
+    
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(hostname=self.smtp_host, port=self.smtp_port,
+                               start_tls=settings.SMTP_STARTTLS, timeout=settings.SMTP_TIMEOUT)
+        await smtp.connect()
+        self._connections += 1
+        self.stats["connections_opened"] += 1
+        try:
+            if self.smtp_username:
+                await smtp.login(self.smtp_username, self.smtp_password)
+        except Exception:
+            await self._disconnect(smtp)
+            raise
+        return smtp
+    
+    async def _disconnect(self, smtp: aiosmtplib.SMTP) -> None:
+        if smtp.is_connected:
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+        self._connections = max(0, self._connections - 1)
+        return None
+    
+    async def _failed_attempt(self, message: Dict[str, Any], error: str, permanent: bool = False):
+        attempts = message.get("attempts", 1)
+        if permanent or attempts >= self.max_attempts:
+            await DatabaseOperations.update_document(EMAIL_OUTBOX_COLLECTION, {"id": message["id"]}, {
+                "$set": {"status": "failed", "last_error": error, "failed_at": datetime.utcnow()},
+                "$unset": _SECRET_FIELDS
+            })
+            self.stats["failed"] += 1
+            logger.error(f"Failed to send {message['template']} email to {message['to']}: {error}")
+            return
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+        await DatabaseOperations.update_document(EMAIL_OUTBOX_COLLECTION, {"id": message["id"]}, {
+            "status": "pending",
+            "last_error": error,
+            "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)
+        })
+        self.stats["retried"] += 1
+    
+    def get_stats(self) -> dict:
+        attempts = self.stats["sent"] + self.stats["retried"] + self.stats["failed"]
+        return {
+            **self.stats,
+            "configured": self.is_configured,
+            "senders": len(self._senders),
+            "open_connections": self._connections,
+            "send_ms_avg": round(self.stats["send_ms_total"] / attempts, 2) if attempts else 0
+        }
     
     def _print_invitation_details(self, to_email: str, inviter_name: str, role: str, invite_link: str):
         """Print invitation details to console when email is not configured"""
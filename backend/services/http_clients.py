@@ -0,0 +1,87 @@
+import importlib.util
+import time
+import logging
+from typing import Any, Dict
+import httpx
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Providers that get their own connection pool
+PROVIDERS = ("slack", "trello", "github", "webhooks")
+
+class HttpClientRegistry:
+    """
+    One pooled httpx.AsyncClient per third-party provider
+
+    Clients keep connections alive between calls (no TCP/TLS handshake per
+    request) and use HTTP/2 when the `h2` package is installed. They are
+    opened in the app lifespan and closed on shutdown; a client requested
+    outside the lifespan (scripts, tests) is created on first use.
+    request() records per-provider latency for /api/metrics.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.http2 = settings.HTTP_CLIENT_HTTP2 and importlib.util.find_spec("h2") is not None
+        self.stats: Dict[str, Dict[str, Any]] = {}
+
+    async def start(self):
+        for provider in PROVIDERS:
+            self.get(provider)
+        logger.info(f"HTTP client pools ready for {', '.join(PROVIDERS)} (http2={self.http2})")
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for provider, client in clients.items():
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Closing {provider} HTTP client failed: {e}")
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._clients[provider] = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(settings.HTTP_CLIENT_TIMEOUT, connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT),
+                headers={"User-Agent": "Hubstaff-Clone/1.0"}
+            )
+        return client
+
+    async def request(self, provider: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """Send a request through the provider's pool, recording latency and errors"""
+        stats = self.stats.setdefault(provider, {"requests": 0, "errors": 0, "latency_ms_total": 0.0,
+                                                 "latency_ms_max": 0.0, "status": {}})
+        started = time.perf_counter()
+        try:
+            response = await self.get(provider).request(method, url, **kwargs)
+        except httpx.HTTPError:
+            stats["errors"] += 1
+            raise
+        finally:
+            latency_ms = (time.perf_counter() - started) * 1000
+            stats["requests"] += 1
+            stats["latency_ms_total"] += latency_ms
+            stats["latency_ms_max"] = max(stats["latency_ms_max"], latency_ms)
+        status_class = f"{response.status_code // 100}xx"
+        stats["status"][status_class] = stats["status"].get(status_class, 0) + 1
+        return response
+
+    def get_stats(self) -> dict:
+        providers = {}
+        for provider, stats in self.stats.items():
+            requests = stats["requests"]
+            providers[provider] = {
+                **stats,
+                "latency_ms_avg": round(stats["latency_ms_total"] / requests, 2) if requests else 0
+            }
+        return {"http2": self.http2, "open_clients": len(self._clients), "providers": providers}
+
+# Global HTTP client registry
+http_clients = HttpClientRegistry()
@@ -0,0 +1,339 @@
+import asyncio
+import random
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from bson import ObjectId
+from database.mongodb import DatabaseOperations
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_COLLECTION = "outbound_jobs"
+
+# (integration config, payload) -> provider response
+Handler = Callable[[Dict[str, Any], Dict[str, Any]], Awaitable[httpx.Response]]
+# payloads of jobs sent together -> combined payload
+Merger = Callable[[List[Dict[str, Any]]], Dict[str, Any]]
+
+# Fields of a job returned by the status endpoint
+_PUBLIC_FIELDS = ("id", "provider", "action", "status", "attempts", "last_error", "result", "merged_with",
+                  "next_attempt_at", "created_at", "updated_at", "completed_at")
+
+class OutboundQueue:
+    """
+    Mongo-backed queue for calls to third-party APIs
+
+    Endpoints store a job and return right away; a background worker sends
+    it. Jobs of actions registered with a merger and sharing a merge_key
+    (e.g. Slack messages for one webhook and channel) are held for
+    merge_window seconds and sent as one request. Network errors, 429 and
+    5xx responses are retried with exponential backoff, or after
+    Retry-After when the provider sends it, up to max_attempts. A 429 or
+    an exhausted rate-limit header also pauses the whole provider until
+    its limit resets. At most `concurrency` requests per provider are in
+    flight. Claims are atomic and leased, so several workers can share the
+    collection and a job held by a crashed worker is picked up again.
+    """
+
+    def __init__(self,
+                 poll_interval: float = settings.OUTBOUND_POLL_INTERVAL,
+                 concurrency: int = settings.OUTBOUND_CONCURRENCY,
+                 max_attempts: int = settings.OUTBOUND_MAX_ATTEMPTS,
+                 backoff_base: float = settings.OUTBOUND_BACKOFF_BASE,
+                 backoff_max: float = settings.OUTBOUND_BACKOFF_MAX,
+                 merge_window: float = settings.OUTBOUND_MERGE_WINDOW,
+                 merge_max: int = settings.OUTBOUND_MERGE_MAX,
+                 lease: float = settings.OUTBOUND_LEASE):
+        self.poll_interval = poll_interval
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.merge_window = merge_window
+        self.merge_max = merge_max
+        self.lease = lease
+        self._handlers: Dict[Tuple[str, str], Handler] = {}
+        self._mergers: Dict[Tuple[str, str], Merger] = {}
+        self._inflight: Dict[str, int] = {}
+        # provider -> monotonic time until which it is rate limited
+        self._paused_until: Dict[str, float] = {}
+        self._workers: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"enqueued": 0, "sent": 0, "merged": 0, "retried": 0, "failed": 0, "rate_limited": 0}
+
+    def register(self, provider: str, action: str, handler: Handler, merge: Optional[Merger] = None):
+        """Register how jobs of provider/action are sent (and optionally merged)"""
+        self._handlers[(provider, action)] = handler
+        if merge is not None:
+            self._mergers[(provider, action)] = merge
+
+    async def enqueue(self, user_id: str, provider: str, action: str, integration_id: str,
+                      payload: Dict[str, Any], merge_key: Optional[str] = None) -> Dict[str, Any]:
+        """Store a job for the worker and return it"""
+        if (provider, action) not in self._handlers:
+            raise ValueError(f"No outbound handler registered for {provider}/{action}")
+        now = datetime.utcnow()
+        mergeable = merge_key is not None and (provider, action) in self._mergers
+        job = {
+            "id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "provider": provider,
+            "action": action,
+            "integration_id": integration_id,
+            "payload": payload,
+            "merge_key": f"{provider}:{action}:{merge_key}" if mergeable else None,
+            "status": "pending",
+            "attempts": 0,
+            # Hold mergeable jobs briefly so a burst goes out as one request
+            "next_attempt_at": now + timedelta(seconds=self.merge_window) if mergeable else now,
+            "created_at": now
+        }
+        await DatabaseOperations.create_document(OUTBOUND_COLLECTION, job)
+        self.stats["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get_job(self, job_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        query = {"id": job_id}
+        if user_id is not None:
+            query["user_id"] = user_id
+        job = await DatabaseOperations.get_document(OUTBOUND_COLLECTION, query)
+        if not job:
+            return None
+        return {field: job.get(field) for field in _PUBLIC_FIELDS}
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Let requests already in flight finish; unclaimed jobs stay queued
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._dispatch()
+            except Exception as e:
+                logger.error(f"Outbound queue dispatch failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _dispatch(self):
+        providers = {provider for provider, _ in self._handlers}
+        for provider in providers:
+            if self._paused_until.get(provider, 0) > time.monotonic():
+                continue
+            while self._inflight.get(provider, 0) < self.concurrency:
+                jobs = await self._claim(provider)
+                if not jobs:
+                    break
+                self._inflight[provider] = self._inflight.get(provider, 0) + 1
+                worker = asyncio.create_task(self._process(provider, jobs))
+                self._workers.add(worker)
+                worker.add_done_callback(self._workers.discard)
+
+    async def _claim(self, provider: str) -> List[Dict[str, Any]]:
+        """Lease the next due job of a provider, plus pending jobs it can be merged with"""
+        now = datetime.utcnow()
+
+        def lease():
+            return {"$set": {"status": "running", "locked_until": now + timedelta(seconds=self.lease)},
+                    "$inc": {"attempts": 1}}
+
+        lead = await DatabaseOperations.find_one_and_update(
+            OUTBOUND_COLLECTION,
+            {
+                "provider": provider,
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    # Lease expired: the worker holding it went away
+                    {"status": "running", "locked_until": {"$lt": now}}
+                ]
+            },
+            lease(),
+            sort=[("next_attempt_at", 1)]
+        )
+        if lead is None:
+            return []
+
+        jobs = [lead]
+        if lead.get("merge_key"):
+            while len(jobs) < self.merge_max:
+                job = await DatabaseOperations.find_one_and_update(
+                    OUTBOUND_COLLECTION,
+                    {"merge_key": lead["merge_key"], "status": "pending"},
+                    lease(),
+                    sort=[("created_at", 1)]
+                )
+                if job is None:
+                    break
+                jobs.append(job)
+        return jobs
+
+    async def _process(self, provider: str, jobs: List[Dict[str, Any]]):
+        lead = jobs[0]
+        key = (provider, lead["action"])
+        try:
+            integration = await DatabaseOperations.get_document(
+                "integrations", {**integration_query(lead["integration_id"]), "active": True}
+            )
+            if not integration:
+                await self._fail(jobs, "Integration is no longer active")
+                return
+
+            payloads = [job["payload"] for job in jobs]
+            payload = self._mergers[key](payloads) if len(jobs) > 1 else payloads[0]
+            try:
+                response = await self._handlers[key](integration["config"], payload)
+            except httpx.HTTPError as e:
+                await self._retry(jobs, f"{type(e).__name__}: {e}")
+                return
+
+            self._note_rate_limit(provider, response)
+            if response.is_success:
+                await self._succeed(jobs, self._result(response))
+            elif response.status_code == 429 or response.status_code >= 500:
+                retry_after = parse_retry_after(response)
+                if response.status_code == 429:
+                    self.stats["rate_limited"] += 1
+                    self._pause(provider, retry_after or self.backoff_base)
+                await self._retry(jobs, f"HTTP {response.status_code}", retry_after)
+            else:
+                await self._fail(jobs, f"HTTP {response.status_code}: {response.text[:200]}")
+        except Exception as e:
+            logger.error(f"Outbound job {lead['id']} ({provider}/{lead['action']}) error: {e}")
+            await self._retry(jobs, str(e))
+        finally:
+            self._inflight[provider] -= 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _succeed(self, jobs: List[Dict[str, Any]], result: Any):
+        ids = [job["id"] for job in jobs]
+        update = {"status": "succeeded", "result": result, "last_error": None, "completed_at": datetime.utcnow()}
+        if len(jobs) > 1:
+            update["merged_with"] = ids
+            self.stats["merged"] += len(jobs) - 1
+        await DatabaseOperations.update_documents(OUTBOUND_COLLECTION, {"id": {"$in": ids}}, update)
+        self.stats["sent"] += 1
+
+    async def _retry(self, jobs: List[Dict[str, Any]], error: str, retry_after: Optional[float] = None):
+        for job in jobs:
+            attempts = job.get("attempts", 1)
+            if attempts >= self.max_attempts:
+                await self._fail([job], f"Gave up after {attempts} attempts: {error}")
+                continue
+            # Retry-After comes from the provider; never park a job longer than our own backoff cap
+            delay = min(retry_after, self.backoff_max) if retry_after is not None else self._backoff(attempts)
+            await DatabaseOperations.update_document(OUTBOUND_COLLECTION, {"id": job["id"]}, {
+                "status": "pending",
+                "last_error": error,
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)
+            })
+            self.stats["retried"] += 1
+
+    async def _fail(self, jobs: List[Dict[str, Any]], error: str):
+        await DatabaseOperations.update_documents(
+            OUTBOUND_COLLECTION,
+            {"id": {"$in": [job["id"] for job in jobs]}},
+            {"status": "failed", "last_error": error, "completed_at": datetime.utcnow()}
+        )
+        self.stats["failed"] += len(jobs)
+        logger.warning(f"Outbound job(s) {', '.join(job['id'] for job in jobs)} failed: {error}")
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        # Jitter so jobs that failed together do not retry together
+        return delay * random.uniform(0.5, 1.0)
+
+    def _pause(self, provider: str, seconds: float):
+        seconds = min(seconds, self.backoff_max)
+        until = time.monotonic() + seconds
+        if until > self._paused_until.get(provider, 0):
+            self._paused_until[provider] = until
+            logger.warning(f"Outbound {provider} requests paused for {seconds:.0f}s (rate limited)")
+
+    def _note_rate_limit(self, provider: str, response: httpx.Response):
+        """Pause a provider whose rate-limit headers say the budget is used up"""
+        headers = response.headers
+        for remaining_header, reset_header, absolute in (("X-RateLimit-Remaining", "X-RateLimit-Reset", True),
+                                                         ("RateLimit-Remaining", "RateLimit-Reset", False)):
+            remaining, reset = headers.get(remaining_header), headers.get(reset_header)
+            if remaining is None or reset is None:
+                continue
+            try:
+                if int(remaining) > 0:
+                    return
+                # GitHub sends an epoch timestamp, the IETF draft header a delay
+                seconds = float(reset) - time.time() if absolute else float(reset)
+            except ValueError:
+                continue
+            if seconds > 0:
+                self.stats["rate_limited"] += 1
+                self._pause(provider, seconds)
+            return
+
+    @staticmethod
+    def _result(response: httpx.Response) -> Any:
+        try:
+            return response.json()
+        except ValueError:
+            return response.text[:1000] or None
+
+    def get_stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "inflight": dict(self._inflight),
+            "paused": {provider: round(until - now, 1) for provider, until in self._paused_until.items() if until > now}
+        }
+
+def integration_ref(integration: Dict[str, Any]) -> str:
+    """The id a job stores to find its integration again"""
+    # Integrations saved before documents had an `id` field only have their ObjectId
+    return integration.get("id") or str(integration["_id"])
+
+def integration_query(ref: str) -> Dict[str, Any]:
+    """Query matching the integration an integration_ref() value points to"""
+    if ObjectId.is_valid(ref):
+        return {"$or": [{"id": ref}, {"_id": ObjectId(ref)}]}
+    return {"id": ref}
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header (delay or HTTP date)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# Global outbound queue instance
+outbound_queue = OutboundQueue()
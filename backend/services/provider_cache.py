@@ -0,0 +1,112 @@
+import hashlib
+import json
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
+import httpx
+from services.http_clients import http_clients
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class CachedResponse:
+    """A provider response body with the validators needed to revalidate it"""
+
+    __slots__ = ("status_code", "body", "etag", "last_modified", "next_url", "fetched_at")
+
+    def __init__(self, status_code: int, body: Any, etag: Optional[str], last_modified: Optional[str],
+                 next_url: Optional[str]):
+        self.status_code = status_code
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.next_url = next_url
+        self.fetched_at = time.monotonic()
+
+class ProviderCache:
+    """
+    Conditional-request cache for third-party GET requests
+
+    Successful JSON responses are kept with their ETag / Last-Modified.
+    Within fresh_ttl seconds they are served without a request; after that
+    the request is sent with If-None-Match / If-Modified-Since and a 304
+    reuses the stored body (GitHub does not count 304s against the rate
+    limit). Keys include a hash of the request headers, so responses are
+    never shared between tokens. paginate() follows Link rel="next"
+    headers one page at a time, so a caller that stops early never
+    fetches the remaining pages.
+    """
+
+    def __init__(self, max_entries: int = settings.PROVIDER_CACHE_SIZE,
+                 fresh_ttl: float = settings.PROVIDER_CACHE_FRESH_TTL):
+        self.max_entries = max_entries
+        self.fresh_ttl = fresh_ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.stats = {"fresh_hits": 0, "not_modified": 0, "misses": 0, "errors": 0}
+
+    @staticmethod
+    def _key(provider: str, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]]) -> str:
+        raw = json.dumps([provider, url, params or {}, headers or {}], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    async def get(self, provider: str, url: str, params: Optional[Dict[str, Any]] = None,
+                  headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """GET a JSON resource, revalidating a cached copy when there is one"""
+        key = self._key(provider, url, params, headers)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            if time.monotonic() - cached.fetched_at < self.fresh_ttl:
+                self.stats["fresh_hits"] += 1
+                return cached
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if cached.etag:
+                request_headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                request_headers["If-Modified-Since"] = cached.last_modified
+
+        response = await http_clients.request(provider, "GET", url, params=params, headers=request_headers)
+        if response.status_code == 304 and cached is not None:
+            self.stats["not_modified"] += 1
+            cached.fetched_at = time.monotonic()
+            return cached
+
+        self.stats["misses"] += 1
+        if not response.is_success:
+            self.stats["errors"] += 1
+            return CachedResponse(response.status_code, None, None, None, None)
+
+        entry = CachedResponse(response.status_code, response.json(), response.headers.get("ETag"),
+                               response.headers.get("Last-Modified"), _next_link(response))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def paginate(self, provider: str, url: str, params: Optional[Dict[str, Any]] = None,
+                       headers: Optional[Dict[str, str]] = None) -> AsyncIterator[Any]:
+        """Yield the items of a paginated JSON list, fetching pages lazily"""
+        next_url: Optional[str] = url
+        page_params = params
+        while next_url:
+            page = await self.get(provider, next_url, page_params, headers)
+            if page.status_code >= 400 or not isinstance(page.body, list):
+                return
+            for item in page.body:
+                yield item
+            # The next link already carries every query parameter
+            next_url, page_params = page.next_url, None
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "entries": len(self._entries)}
+
+def _next_link(response: httpx.Response) -> Optional[str]:
+    link = response.links.get("next")
+    return link.get("url") if link else None
+
+# Global provider response cache
+provider_cache = ProviderCache()
@@ -0,0 +1,226 @@
+import asyncio
+import logging
+from datetime import datetime, date, timezone
+from typing import Optional, Dict, Any
+from pymongo import ReplaceOne, DeleteOne
+from database.mongodb import DatabaseOperations
+from services.cache import response_cache, user_tag, project_tag
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "time_rollups"
+
+class RollupService:
+    """
+    Maintains the time_rollups collection: one document per
+    (user_id, project_id, task_id, day) holding tracked seconds, the number
+    of stopped entries and activity sums. Entries are attributed to the UTC
+    day they started on, matching the raw $dateToString aggregations.
+
+    Rollups are derived data. Every write path applies an increment; if
+    they ever drift, `rebuild()` recomputes them from time_entries. On
+    startup `start()` backfills them once when the collection is still
+    empty but time has already been tracked (first deploy).
+    """
+
+    # Key fields of a rollup document (unique index in database.indexes)
+    KEY_FIELDS = ("user_id", "project_id", "task_id", "day")
+
+    def __init__(self):
+        self._backfill: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._backfill is None:
+            self._backfill = asyncio.create_task(self.backfill())
+
+    async def stop(self):
+        if self._backfill is None:
+            return
+        self._backfill.cancel()
+        try:
+            await self._backfill
+        except asyncio.CancelledError:
+            pass
+        self._backfill = None
+
+    async def backfill(self) -> int:
+        """Build the rollups from time_entries if none exist yet, returning how many were written"""
+        try:
+            if await DatabaseOperations.count_documents(ROLLUP_COLLECTION, {}):
+                return 0
+            if not await DatabaseOperations.count_documents("time_entries", {"duration": {"$ne": None}}):
+                return 0
+            logger.info("Time rollups are empty, backfilling them from time_entries")
+            return await self.rebuild()
+        except Exception as e:
+            logger.error(f"Time rollup backfill failed: {e}")
+            return 0
+
+    @staticmethod
+    def _day(value) -> Optional[str]:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if isinstance(value, datetime):
+            # Naive values are already UTC; aware ones go to their UTC day,
+            # as $dateToString does for the stored (UTC) value
+            if value.tzinfo is not None:
+                value = value.astimezone(timezone.utc)
+            return value.strftime("%Y-%m-%d")
+        return None
+
+    def _key(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        day = self._day(entry.get("start_time"))
+        if not day or not entry.get("user_id") or not entry.get("project_id"):
+            return None
+        return {
+            "user_id": entry["user_id"],
+            "project_id": entry["project_id"],
+            "task_id": entry.get("task_id"),
+            "day": day
+        }
+
+    @staticmethod
+    def _increments(entry: Dict[str, Any], sign: int = 1) -> Dict[str, Any]:
+        # Running entries have no duration yet and are not counted
+        if entry.get("duration") is None:
+            return {}
+        activity_level = entry.get("activity_level")
+        return {
+            "seconds": sign * int(entry["duration"]),
+            "entries": sign,
+            "activity_sum": sign * (activity_level or 0),
+            "activity_samples": sign if activity_level is not None else 0,
+            "mouse_clicks": sign * int(entry.get("mouse_clicks") or 0),
+            "keyboard_strokes": sign * int(entry.get("keyboard_strokes") or 0)
+        }
+
+    async def _apply(self, key: Dict[str, Any], increments: Dict[str, Any]):
+        increments = {field: value for field, value in increments.items() if value}
+        if not increments:
+            return
+        await DatabaseOperations.update_document(
+            ROLLUP_COLLECTION,
+            dict(key),
+            {"$inc": increments},
+            upsert=True
+        )
+        # Only responses built from this user's or project's time go stale
+        await response_cache.invalidate(user_tag(key["user_id"]), project_tag(key["project_id"]))
+
+    async def add_entry(self, entry: Dict[str, Any]):
+        """Count a stopped or manually created time entry"""
+        await self.replace_entry(None, entry)
+
+    async def replace_entry(self, old_entry: Optional[Dict[str, Any]], new_entry: Optional[Dict[str, Any]]):
+        """Move an edited entry's contribution from its old values to its new ones"""
+        try:
+            old_key = self._key(old_entry) if old_entry else None
+            new_key = self._key(new_entry) if new_entry else None
+            old_inc = self._increments(old_entry, -1) if old_key else {}
+            new_inc = self._increments(new_entry, 1) if new_key else {}
+
+            if old_key and old_key == new_key:
+                # Same bucket: apply the net change in a single update
+                merged = {field: old_inc.get(field, 0) + new_inc.get(field, 0)
+                          for field in set(old_inc) | set(new_inc)}
+                await self._apply(new_key, merged)
+                return
+
+            if old_key:
+                await self._apply(old_key, old_inc)
+            if new_key:
+                await self._apply(new_key, new_inc)
+
+        except Exception as e:
+            # Never fail the user's request over derived data
+            logger.error(f"Failed to update time rollups: {e}")
+
+    async def rebuild(self, since: Optional[date] = None) -> int:
+        """
+        Recompute rollups from time_entries
+
+        Each (user, project, task, day) document is replaced with its
+        recomputed totals in one upsert, and documents no entry maps to any
+        more are deleted afterwards, so readers never see a partly rebuilt
+        collection. An increment applied to a bucket between the
+        aggregation and its replacement is lost; run it when no timers are
+        being stopped, or run it again.
+
+        Args:
+            since: Only rebuild days on or after this date (default: everything)
+
+        Returns:
+            int: Number of rollup documents changed, created or removed
+        """
+        rollup_query: Dict[str, Any] = {}
+        entry_match: Dict[str, Any] = {"duration": {"$ne": None}}
+        if since:
+            rollup_query["day"] = {"$gte": since.isoformat()}
+            entry_match["start_time"] = {"$gte": datetime.combine(since, datetime.min.time())}
+
+        pipeline = [
+            {"$match": entry_match},
+            {
+                "$group": {
+                    "_id": {
+                        "user_id": "$user_id",
+                        "project_id": "$project_id",
+                        "task_id": {"$ifNull": ["$task_id", None]},
+                        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$start_time"}}}
+                    },
+                    "seconds": {"$sum": "$duration"},
+                    "entries": {"$sum": 1},
+                    "activity_sum": {"$sum": {"$ifNull": ["$activity_level", 0]}},
+                    "activity_samples": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$activity_level", None]}, None]}, 0, 1]}},
+                    "mouse_clicks": {"$sum": {"$ifNull": ["$mouse_clicks", 0]}},
+                    "keyboard_strokes": {"$sum": {"$ifNull": ["$keyboard_strokes", 0]}}
+                }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "user_id": "$_id.user_id",
+                    "project_id": "$_id.project_id",
+                    "task_id": "$_id.task_id",
+                    "day": "$_id.day",
+                    "seconds": 1,
+                    "entries": 1,
+                    "activity_sum": 1,
+                    "activity_samples": 1,
+                    "mouse_clicks": 1,
+                    "keyboard_strokes": 1
+                }
+            }
+        ]
+        groups = await DatabaseOperations.aggregate("time_entries", pipeline)
+
+        now = datetime.utcnow()
+        keys = set()
+        operations = []
+        for group in groups:
+            key = {field: group[field] for field in self.KEY_FIELDS}
+            keys.add(tuple(key.values()))
+            operations.append(ReplaceOne(key, {**group, "updated_at": now}, upsert=True))
+
+        # Buckets whose entries were all moved or deleted
+        existing = await DatabaseOperations.get_documents(
+            ROLLUP_COLLECTION, rollup_query, projection={field: 1 for field in self.KEY_FIELDS}
+        )
+        removed = 0
+        for rollup in existing:
+            key = {field: rollup.get(field) for field in self.KEY_FIELDS}
+            if tuple(key.values()) not in keys:
+                operations.append(DeleteOne(key))
+                removed += 1
+
+        written = 0
+        for start in range(0, len(operations), 1000):
+            written += await DatabaseOperations.bulk_write(ROLLUP_COLLECTION, operations[start:start + 1000])
+
+        await response_cache.clear()
+        logger.info(f"Rebuilt time rollups from {sum(group['entries'] for group in groups)} time entries: "
+                    f"{written} changed or created, {removed} removed")
+        return written + removed
+
+# Global rollup service instance
+rollup_service = RollupService()
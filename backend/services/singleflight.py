@@ -0,0 +1,44 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it is still running await the same task instead of starting their
+    own. Each waiter is shielded, so a client disconnecting (and its request
+    being cancelled) does not cancel the work for everyone else. Results are
+    not kept once the task finishes - caching is a separate concern.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats = {"executions": 0, "shared": 0, "inflight": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() for key, or join the execution already in flight"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            self.stats["executions"] += 1
+            task.add_done_callback(lambda finished, key=key: self._forget(key, finished))
+        else:
+            self.stats["shared"] += 1
+        self.stats["inflight"] = len(self._inflight)
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        self.stats["inflight"] = len(self._inflight)
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here so an error nobody awaited anymore is not reported as unhandled
+            logger.debug(f"Coalesced call {key} failed: {task.exception()}")
+
+# Global singleflight group for expensive read endpoints
+singleflight = SingleFlight()
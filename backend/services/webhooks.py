@@ -0,0 +1,351 @@
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import random
+import socket
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+import httpx
+from database.mongodb import DatabaseOperations
+from services.http_clients import http_clients
+from services.outbound_queue import parse_retry_after
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTIONS_COLLECTION = "webhook_subscriptions"
+DELIVERIES_COLLECTION = "webhook_deliveries"
+
+def sign_payload(secret: str, timestamp: int, body: bytes) -> str:
+    """HMAC-SHA256 over "<timestamp>.<body>", as sent in X-Webhook-Signature"""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+class UnsafeWebhookURL(ValueError):
+    """The webhook URL is malformed or points at a non-public address"""
+
+class UnresolvableWebhookHost(UnsafeWebhookURL):
+    """The webhook host did not resolve (possibly a passing DNS failure)"""
+
+async def check_webhook_url(url: str):
+    """
+    Reject URLs that would make the server call an internal host
+
+    The host must resolve, and only to public addresses, unless it is
+    listed in WEBHOOK_ALLOWED_HOSTS. Checked when a subscription is saved
+    and again before every delivery, since DNS answers can change.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise UnsafeWebhookURL("Webhook URL must be an http(s) URL")
+    allowed = {host.strip().lower() for host in settings.WEBHOOK_ALLOWED_HOSTS.split(",") if host.strip()}
+    if parts.hostname.lower() in allowed:
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, ValueError):
+        raise UnresolvableWebhookHost(f"Webhook host {parts.hostname} could not be resolved")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0].split("%", 1)[0])
+        if getattr(address, "ipv4_mapped", None):
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise UnsafeWebhookURL(f"Webhook host {parts.hostname} resolves to a non-public address")
+
+class WebhookDispatcher:
+    """
+    Delivers application events to subscribed HTTP endpoints
+
+    emit() stores one delivery per matching subscription in
+    webhook_deliveries; a pool of background workers POSTs them. Pending
+    deliveries of a subscription with batch_size > 1 are sent together as
+    {"events": [...]}. Every request carries an HMAC signature of the body
+    made with the subscription's secret. Endpoints that resolve to
+    internal addresses are dead-lettered without a request (see
+    check_webhook_url). Failures are retried with
+    jittered exponential backoff (or after Retry-After) and dead-lettered
+    after max_attempts; a 410 Gone disables the subscription. At most
+    `workers` requests are in flight, and at most endpoint_concurrency per
+    endpoint URL, so one slow receiver cannot take the whole pool.
+    """
+
+    def __init__(self,
+                 workers: int = settings.WEBHOOK_WORKERS,
+                 endpoint_concurrency: int = settings.WEBHOOK_ENDPOINT_CONCURRENCY,
+                 max_attempts: int = settings.WEBHOOK_MAX_ATTEMPTS,
+                 backoff_base: float = settings.WEBHOOK_BACKOFF_BASE,
+                 backoff_max: float = settings.WEBHOOK_BACKOFF_MAX,
+                 poll_interval: float = settings.WEBHOOK_POLL_INTERVAL,
+                 lease: float = settings.WEBHOOK_LEASE):
+        self.workers = workers
+        self.endpoint_concurrency = endpoint_concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._inflight: Dict[str, int] = {}
+        self._workers: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "emitted": 0, "requests": 0, "delivered": 0, "retried": 0, "dead_lettered": 0, "emit_errors": 0,
+            "request_ms_total": 0.0, "request_ms_max": 0.0, "latency_ms_total": 0.0, "latency_ms_max": 0.0
+        }
+
+    async def emit(self, event_type: str, data: Dict[str, Any], actor_id: Optional[str] = None) -> int:
+        """
+        Queue an event for every active subscription that wants it
+
+        Org-scoped subscriptions get every event; user-scoped ones only the
+        events caused by their owner. Never raises, so callers can emit
+        after their own write without risking the response.
+        """
+        try:
+            scopes: List[Dict[str, Any]] = [{"scope": "org"}]
+            if actor_id:
+                scopes.append({"scope": "user", "user_id": actor_id})
+            subscriptions = await DatabaseOperations.get_documents(
+                SUBSCRIPTIONS_COLLECTION, {"active": True, "events": event_type, "$or": scopes}
+            )
+            if not subscriptions:
+                return 0
+
+            now = datetime.utcnow()
+            event = {"id": str(uuid.uuid4()), "type": event_type, "created_at": now, "data": data}
+            deliveries = [self._delivery(subscription, event, now) for subscription in subscriptions]
+            await DatabaseOperations.create_documents(DELIVERIES_COLLECTION, deliveries, ordered=False)
+            self.stats["emitted"] += len(deliveries)
+            if self._wakeup is not None:
+                self._wakeup.set()
+            return len(deliveries)
+        except Exception as e:
+            self.stats["emit_errors"] += 1
+            logger.error(f"Webhook emit of {event_type} failed: {e}")
+            return 0
+
+    async def send_test(self, subscription: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a ping event for one subscription"""
+        now = datetime.utcnow()
+        event = {"id": str(uuid.uuid4()), "type": "ping", "created_at": now,
+                 "data": {"subscription_id": subscription["id"]}}
+        delivery = self._delivery(subscription, event, now)
+        await DatabaseOperations.create_document(DELIVERIES_COLLECTION, delivery)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return delivery
+
+    async def redeliver(self, subscription_id: str, delivery_id: str) -> bool:
+        """Put a dead-lettered (or delivered) delivery back in the queue"""
+        return await DatabaseOperations.update_document(
+            DELIVERIES_COLLECTION,
+            {"id": delivery_id, "subscription_id": subscription_id, "status": {"$in": ["dead", "delivered"]}},
+            {"status": "pending", "attempts": 0, "last_error": None, "next_attempt_at": datetime.utcnow()}
+        )
+
+    @staticmethod
+    def _delivery(subscription: Dict[str, Any], event: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+        return {
+            "id": str(uuid.uuid4()),
+            "subscription_id": subscription["id"],
+            "user_id": subscription["user_id"],
+            "endpoint": subscription["url"],
+            "event": event,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now
+        }
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._dispatch()
+            except Exception as e:
+                logger.error(f"Webhook dispatch failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _dispatch(self):
+        while len(self._workers) < self.workers:
+            saturated = [endpoint for endpoint, count in self._inflight.items() if count >= self.endpoint_concurrency]
+            lead = await self._claim({"endpoint": {"$nin": saturated}})
+            if lead is None:
+                return
+
+            subscription = await DatabaseOperations.get_document(
+                SUBSCRIPTIONS_COLLECTION, {"id": lead["subscription_id"]}
+            )
+            if not subscription or not subscription.get("active"):
+                await self._dead_letter([lead], "Subscription was removed or disabled")
+                continue
+
+            batch = [lead]
+            while len(batch) < subscription.get("batch_size", 1):
+                delivery = await self._claim({"subscription_id": subscription["id"]})
+                if delivery is None:
+                    break
+                batch.append(delivery)
+
+            endpoint = lead["endpoint"]
+            self._inflight[endpoint] = self._inflight.get(endpoint, 0) + 1
+            worker = asyncio.create_task(self._deliver(subscription, batch))
+            self._workers.add(worker)
+            worker.add_done_callback(self._workers.discard)
+
+    async def _claim(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await DatabaseOperations.find_one_and_update(
+            DELIVERIES_COLLECTION,
+            {
+                **query,
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    # Lease expired: the worker holding it went away
+                    {"status": "running", "locked_until": {"$lt": now}}
+                ]
+            },
+            {"$set": {"status": "running", "locked_until": now + timedelta(seconds=self.lease)},
+             "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)]
+        )
+
+    async def _deliver(self, subscription: Dict[str, Any], batch: List[Dict[str, Any]]):
+        endpoint = batch[0]["endpoint"]
+        try:
+            try:
+                await check_webhook_url(endpoint)
+            except UnresolvableWebhookHost as e:
+                await self._retry(batch, str(e))
+                return
+            except UnsafeWebhookURL as e:
+                await self._dead_letter(batch, str(e))
+                return
+
+            events = [delivery["event"] for delivery in batch]
+            batched = subscription.get("batch_size", 1) > 1
+            body = json.dumps({"events": events} if batched else events[0], default=str).encode()
+            timestamp = int(time.time())
+            headers = {
+                "Content-Type": "application/json",
+                "X-Webhook-Id": batch[0]["id"],
+                "X-Webhook-Event": "batch" if batched else events[0]["type"],
+                "X-Webhook-Timestamp": str(timestamp),
+                "X-Webhook-Signature": sign_payload(subscription["secret"], timestamp, body)
+            }
+
+            started = time.perf_counter()
+            try:
+                response = await http_clients.request("webhooks", "POST", endpoint, content=body, headers=headers,
+                                                      timeout=settings.WEBHOOK_TIMEOUT)
+            except httpx.HTTPError as e:
+                await self._retry(batch, f"{type(e).__name__}: {e}")
+                return
+            finally:
+                request_ms = (time.perf_counter() - started) * 1000
+                self.stats["requests"] += 1
+                self.stats["request_ms_total"] += request_ms
+                self.stats["request_ms_max"] = max(self.stats["request_ms_max"], request_ms)
+
+            if response.is_success:
+                await self._delivered(batch, response.status_code)
+            elif response.status_code == 410:
+                # The receiver says the endpoint is gone for good
+                await DatabaseOperations.update_document(
+                    SUBSCRIPTIONS_COLLECTION, {"id": subscription["id"]}, {"active": False}
+                )
+                await self._dead_letter(batch, "HTTP 410: subscription disabled")
+            else:
+                await self._retry(batch, f"HTTP {response.status_code}", parse_retry_after(response))
+        except Exception as e:
+            logger.error(f"Webhook delivery to {endpoint} error: {e}")
+            await self._retry(batch, str(e))
+        finally:
+            self._inflight[endpoint] -= 1
+            if not self._inflight[endpoint]:
+                del self._inflight[endpoint]
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _delivered(self, batch: List[Dict[str, Any]], status_code: int):
+        now = datetime.utcnow()
+        await DatabaseOperations.update_documents(
+            DELIVERIES_COLLECTION,
+            {"id": {"$in": [delivery["id"] for delivery in batch]}},
+            {"status": "delivered", "response_status": status_code, "last_error": None, "delivered_at": now}
+        )
+        for delivery in batch:
+            # Event creation to acknowledgement, retries included
+            latency_ms = (now - delivery["event"]["created_at"]).total_seconds() * 1000
+            self.stats["latency_ms_total"] += latency_ms
+            self.stats["latency_ms_max"] = max(self.stats["latency_ms_max"], latency_ms)
+        self.stats["delivered"] += len(batch)
+
+    async def _retry(self, batch: List[Dict[str, Any]], error: str, retry_after: Optional[float] = None):
+        for delivery in batch:
+            attempts = delivery.get("attempts", 1)
+            if attempts >= self.max_attempts:
+                await self._dead_letter([delivery], f"Gave up after {attempts} attempts: {error}")
+                continue
+            if retry_after is not None:
+                # The receiver's Retry-After, but never longer than our own backoff cap
+                delay = min(retry_after, self.backoff_max)
+            else:
+                delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+            await DatabaseOperations.update_document(DELIVERIES_COLLECTION, {"id": delivery["id"]}, {
+                "status": "pending",
+                "last_error": error,
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=delay)
+            })
+            self.stats["retried"] += 1
+
+    async def _dead_letter(self, batch: List[Dict[str, Any]], error: str):
+        await DatabaseOperations.update_documents(
+            DELIVERIES_COLLECTION,
+            {"id": {"$in": [delivery["id"] for delivery in batch]}},
+            {"status": "dead", "last_error": error, "dead_at": datetime.utcnow()}
+        )
+        self.stats["dead_lettered"] += len(batch)
+        logger.warning(f"Webhook deliveries {', '.join(delivery['id'] for delivery in batch)} dead-lettered: {error}")
+
+    def get_stats(self) -> dict:
+        requests = self.stats["requests"]
+        delivered = self.stats["delivered"]
+        return {
+            **self.stats,
+            "inflight": len(self._workers),
+            "inflight_endpoints": len(self._inflight),
+            "request_ms_avg": round(self.stats["request_ms_total"] / requests, 2) if requests else 0,
+            "latency_ms_avg": round(self.stats["latency_ms_total"] / delivered, 2) if delivered else 0
+        }
+
+# Global webhook dispatcher instance
+webhook_dispatcher = WebhookDispatcher()
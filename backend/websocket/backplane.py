@@ -0,0 +1,360 @@
+"""
+Cross-process pub/sub for WebSocket events
+
+Every worker process owns its own ConnectionManager, so an event published
+on one worker has to be relayed to the others before their sockets can see
+it. A backplane carries those events and the presence announcements that
+make get_online_users cluster-wide.
+
+Implementations:
+    InProcessBackplane   single process (default); managers sharing a hub
+                         in the same process also see each other, which is
+                         what tests use
+    UnixSocketBackplane  several workers on one host; the first worker to
+                         bind the socket relays for the others and another
+                         one takes over if it goes away
+    RedisBackplane       several hosts, over Redis pub/sub (needs `redis`)
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class Backplane:
+    """
+    Base class for backplanes
+
+    Subclasses implement _connect, _close and _send. Incoming events are fed
+    to _receive, which drops the node's own events, keeps the presence
+    table and hands everything else to the manager's handler.
+    """
+
+    def __init__(self, presence_ttl: float = 15.0):
+        self.node_id = uuid.uuid4().hex[:12]
+        self.presence_ttl = presence_ttl
+        self._handler: Optional[EventHandler] = None
+        # node_id -> (expires_at, user_ids online on that node)
+        self._presence: Dict[str, Tuple[float, Set[str]]] = {}
+        self.stats = {"published": 0, "received": 0, "publish_errors": 0}
+
+    async def start(self, handler: EventHandler):
+        self._handler = handler
+        await self._connect()
+        logger.info(f"WebSocket backplane {type(self).__name__} started (node {self.node_id})")
+
+    async def stop(self):
+        # Let the other nodes drop our users right away instead of waiting for expiry
+        try:
+            await self.publish({"kind": "presence", "users": [], "ttl": 0})
+        except Exception:
+            pass
+        await self._close()
+        self._handler = None
+
+    async def publish(self, event: Dict[str, Any]):
+        """Send an event to every other node"""
+        try:
+            await self._send({**event, "node": self.node_id})
+            self.stats["published"] += 1
+        except Exception as e:
+            self.stats["publish_errors"] += 1
+            logger.error(f"Backplane publish failed: {e}")
+
+    async def announce_presence(self, user_ids: Iterable[str]):
+        """Publish the full list of this node's users (sent periodically)"""
+        await self.publish({"kind": "presence", "users": list(user_ids), "ttl": self.presence_ttl})
+
+    async def announce_change(self, user_id: str, online: bool):
+        """Publish a single user joining or leaving this node"""
+        await self.publish({"kind": "presence_delta", "user": user_id, "online": online})
+
+    def remote_online_users(self) -> Set[str]:
+        """Users connected to other nodes, according to their latest announcements"""
+        now = time.monotonic()
+        users: Set[str] = set()
+        for node_id, (expires_at, node_users) in list(self._presence.items()):
+            if expires_at <= now:
+                del self._presence[node_id]
+            else:
+                users.update(node_users)
+        return users
+
+    @property
+    def nodes(self) -> List[str]:
+        now = time.monotonic()
+        return sorted(node for node, (expires_at, _) in self._presence.items() if expires_at > now)
+
+    async def _receive(self, event: Dict[str, Any]):
+        if event.get("node") == self.node_id:
+            return
+        self.stats["received"] += 1
+        if event.get("kind") == "presence":
+            ttl = float(event.get("ttl", self.presence_ttl))
+            if ttl <= 0:
+                self._presence.pop(event["node"], None)
+            else:
+                self._presence[event["node"]] = (time.monotonic() + ttl, set(event.get("users", [])))
+            return
+        if event.get("kind") == "presence_delta":
+            # Applied to the node's last snapshot, which keeps its expiry;
+            # the next periodic snapshot corrects anything missed
+            expires_at, node_users = self._presence.get(event["node"], (time.monotonic() + self.presence_ttl, set()))
+            if event.get("online"):
+                node_users.add(event["user"])
+            else:
+                node_users.discard(event["user"])
+            self._presence[event["node"]] = (expires_at, node_users)
+            return
+        if self._handler is not None:
+            try:
+                await self._handler(event)
+            except Exception as e:
+                logger.error(f"Backplane event handler failed: {e}")
+
+    @staticmethod
+    def _encode(event: Dict[str, Any]) -> str:
+        return json.dumps(event, default=str, separators=(",", ":"))
+
+    async def _connect(self):
+        raise NotImplementedError
+
+    async def _close(self):
+        raise NotImplementedError
+
+    async def _send(self, event: Dict[str, Any]):
+        raise NotImplementedError
+
+class InProcessHub:
+    """Connects InProcessBackplanes created in the same process"""
+
+    def __init__(self):
+        self.members: List["InProcessBackplane"] = []
+
+# Default hub shared by every InProcessBackplane
+_default_hub = InProcessHub()
+
+class InProcessBackplane(Backplane):
+    """Relays events between managers in one process (a no-op with a single manager)"""
+
+    def __init__(self, hub: Optional[InProcessHub] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.hub = hub or _default_hub
+
+    async def _connect(self):
+        if self not in self.hub.members:
+            self.hub.members.append(self)
+
+    async def _close(self):
+        if self in self.hub.members:
+            self.hub.members.remove(self)
+
+    async def _send(self, event: Dict[str, Any]):
+        # Round-trip through JSON so members never share mutable payloads
+        decoded = json.loads(self._encode(event))
+        for member in list(self.hub.members):
+            if member is not self:
+                await member._receive(decoded)
+
+# Newline-delimited JSON frames can be large (e.g. project payloads)
+_STREAM_LIMIT = 4 * 1024 * 1024
+
+class UnixSocketBackplane(Backplane):
+    """
+    Relays events between worker processes on one host over a Unix socket
+
+    The first node to bind the socket acts as the hub: it relays every
+    line it receives to the other peers and also processes it itself.
+    The other nodes connect as clients. If the hub exits, the clients
+    reconnect and one of them binds the socket instead.
+    """
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._stopping = False
+
+    @property
+    def is_hub(self) -> bool:
+        return self._server is not None
+
+    async def _connect(self):
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            logger.warning(f"WebSocket backplane socket {self.path} not ready yet, continuing in the background")
+
+    async def _close(self):
+        self._stopping = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        for writer in list(self._peers) + ([self._writer] if self._writer else []):
+            writer.close()
+        self._peers.clear()
+        self._writer = None
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+    async def _send(self, event: Dict[str, Any]):
+        line = (self._encode(event) + "\n").encode()
+        if self._server is not None:
+            for peer in list(self._peers):
+                if not peer.is_closing():
+                    peer.write(line)
+        elif self._writer is not None and not self._writer.is_closing():
+            self._writer.write(line)
+            await self._writer.drain()
+        else:
+            logger.debug("WebSocket backplane not connected, dropping event")
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=_STREAM_LIMIT)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if await self._serve():
+                    self._ready.set()
+                    return
+                await asyncio.sleep(0.5)
+                continue
+
+            self._writer = writer
+            self._ready.set()
+            logger.info(f"WebSocket backplane connected to hub at {self.path}")
+            try:
+                await self._read_lines(reader)
+            finally:
+                self._writer = None
+                writer.close()
+            if not self._stopping:
+                logger.warning("WebSocket backplane hub went away, reconnecting")
+                await asyncio.sleep(0.5)
+
+    async def _serve(self) -> bool:
+        # Nobody is listening, so any socket file left behind is stale
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Cannot remove stale backplane socket {self.path}: {e}")
+            return False
+        try:
+            self._server = await asyncio.start_unix_server(self._handle_peer, self.path, limit=_STREAM_LIMIT)
+        except OSError:
+            # Another worker bound it first
+            return False
+        logger.info(f"WebSocket backplane hub listening on {self.path}")
+        return True
+
+    async def _handle_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._peers.add(writer)
+        try:
+            await self._read_lines(reader, relay_from=writer)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def _read_lines(self, reader: asyncio.StreamReader, relay_from: Optional[asyncio.StreamWriter] = None):
+        while True:
+            try:
+                line = await reader.readline()
+            except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+                logger.error(f"WebSocket backplane read failed: {e}")
+                return
+            if not line:
+                return
+            if relay_from is not None:
+                for peer in list(self._peers):
+                    if peer is not relay_from and not peer.is_closing():
+                        peer.write(line)
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            await self._receive(event)
+
+class RedisBackplane(Backplane):
+    """Relays events between hosts over a Redis pub/sub channel"""
+
+    def __init__(self, url: str, channel: str = "hubstaff:ws:events", **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("WS_BACKPLANE=redis requires the 'redis' package (pip install redis)")
+        self._aioredis = aioredis
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _connect(self):
+        self._redis = self._aioredis.from_url(self.url)
+        self._pubsub = self._redis.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen())
+
+    async def _close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(self.channel)
+            await self._pubsub.close()
+        if self._redis is not None:
+            await self._redis.close()
+
+    async def _send(self, event: Dict[str, Any]):
+        await self._redis.publish(self.channel, self._encode(event))
+
+    async def _listen(self):
+        async for message in self._pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            try:
+                event = json.loads(message["data"])
+            except ValueError:
+                continue
+            await self._receive(event)
+
+def create_backplane(kind: str, url: str = "", presence_ttl: float = 15.0) -> Backplane:
+    """Build the backplane selected by WS_BACKPLANE / WS_BACKPLANE_URL"""
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return InProcessBackplane(presence_ttl=presence_ttl)
+    if kind == "unix":
+        return UnixSocketBackplane(url or "/tmp/hubstaff-ws-backplane.sock", presence_ttl=presence_ttl)
+    if kind == "redis":
+        return RedisBackplane(url or "redis://localhost:6379/0", presence_ttl=presence_ttl)
+    raise ValueError(f"Unknown WebSocket backplane: {kind}")
@@ -0,0 +1,56 @@
+import json
+from typing import Any, Dict, Optional, Union
+
+# Frame payload as handed to WebSocket.send_text / send_bytes
+Frame = Union[str, bytes]
+
+class FrameCodec:
+    """JSON text frames (the default encoding)"""
+
+    name = "json"
+    binary = False
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        return json.dumps(message, default=str)
+
+    def decode(self, data: Frame) -> Dict[str, Any]:
+        return json.loads(data)
+
+class MsgpackCodec(FrameCodec):
+    """MessagePack binary frames (needs the `msgpack` package)"""
+
+    name = "msgpack"
+    binary = True
+
+    def __init__(self):
+        import msgpack
+        self._msgpack = msgpack
+
+    def encode(self, message: Dict[str, Any]) -> Frame:
+        return self._msgpack.packb(message, default=str, use_bin_type=True)
+
+    def decode(self, data: Frame) -> Dict[str, Any]:
+        if isinstance(data, str):
+            return json.loads(data)
+        return self._msgpack.unpackb(data, raw=False)
+
+JSON_CODEC = FrameCodec()
+
+_codecs: Dict[str, FrameCodec] = {JSON_CODEC.name: JSON_CODEC}
+
+def get_codec(name: Optional[str]) -> FrameCodec:
+    """
+    Codec for the encoding a client asked for (?encoding=json|msgpack)
+
+    Unknown encodings, or msgpack without the package installed, fall back
+    to JSON; the connection_established frame tells the client which one
+    it got.
+    """
+    name = (name or JSON_CODEC.name).lower()
+    codec = _codecs.get(name)
+    if codec is None and name == MsgpackCodec.name:
+        try:
+            codec = _codecs[name] = MsgpackCodec()
+        except ImportError:
+            codec = None
+    return codec or JSON_CODEC
@@ -1,70 +1,415 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional, Iterable, Set
+import asyncio
 import json
+import sys
+import time
 import logging
 from datetime import datetime
+from config import settings
+from auth.principal_cache import principal_cache
+from .rooms import event_rooms, project_room, PRIVILEGED_ROLES
+from .backplane import Backplane, InProcessBackplane, create_backplane
+from .replay import ReplayBuffer, ALL_ROOM
+from .codec import Frame, FrameCodec, JSON_CODEC
 
 logger = logging.getLogger(__name__)
 
+class UserSession:
+    """Per-user session record (slotted, there is one per open socket)"""
+
+    __slots__ = ("connected_at", "status")
+
+    def __init__(self, connected_at: datetime, status: str = "online"):
+        self.connected_at = connected_at
+        self.status = status
+
+class ClientConnection:
+    """
+    A connected socket with its own bounded send queue
+
+    Broadcasts only enqueue the already serialized frame; a dedicated writer
+    task drains the queue, so one slow client never delays the others. A
+    client whose queue overflows (or whose send times out) is disconnected,
+    and so is one that has not sent anything (not even a pong) for
+    WS_IDLE_TIMEOUT seconds.
+    """
+
+    __slots__ = ("websocket", "user_id", "role", "codec", "rooms", "manager", "queue", "writer", "closed",
+                 "last_seen")
+
+    def __init__(self, websocket: WebSocket, user_id: str, manager: "ConnectionManager",
+                 role: Optional[str] = None, codec: FrameCodec = JSON_CODEC):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.role = role
+        # Negotiated frame encoding (JSON text unless the client asked for msgpack)
+        self.codec = codec
+        self.rooms: Set[str] = set()
+        self.manager = manager
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+        self.closed = False
+        # Monotonic time of the last frame received from the client
+        self.last_seen = time.monotonic()
+
+    def start(self):
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, frame: Frame) -> bool:
+        """Queue a serialized frame, returning False if the client is too far behind"""
+        if self.closed:
+            return True
+        try:
+            self.queue.put_nowait((frame, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        if self.closed:
+            return
+        self.closed = True
+        if self.writer and self.writer is not asyncio.current_task():
+            self.writer.cancel()
+        if code != 1000 or reason:
+            try:
+                # A half-open socket must not hold up the caller
+                await asyncio.wait_for(self.websocket.close(code=code, reason=reason),
+                                       timeout=settings.WS_SEND_TIMEOUT)
+            except Exception:
+                pass
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by this connection, including queued frames"""
+        queued = sum(sys.getsizeof(frame) for frame, _ in list(self.queue._queue))
+        return sys.getsizeof(self) + sys.getsizeof(self.rooms) + sys.getsizeof(self.queue) + queued
+
+    async def _write_loop(self):
+        stats = self.manager.stats
+        try:
+            while True:
+                frame, enqueued_at = await self.queue.get()
+                send = self.websocket.send_bytes(frame) if isinstance(frame, bytes) else self.websocket.send_text(frame)
+                await asyncio.wait_for(send, timeout=settings.WS_SEND_TIMEOUT)
+                delivery_ms = (time.perf_counter() - enqueued_at) * 1000
+                stats["messages_sent"] += 1
+                stats["delivery_ms_total"] += delivery_ms
+                stats["delivery_ms_max"] = max(stats["delivery_ms_max"], delivery_ms)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            stats["send_errors"] += 1
+            logger.error(f"Error sending message to user {self.user_id}: {e}")
+            # Remove dead connection
+            await self.manager.disconnect(self.user_id, self.websocket)
+
 class ConnectionManager:
     def __init__(self):
         # Store active connections by user_id
-        self.active_connections: Dict[str, WebSocket] = {}
+        self.active_connections: Dict[str, ClientConnection] = {}
         # Store user sessions
-        self.user_sessions: Dict[str, dict] = {}
+        self.user_sessions: Dict[str, UserSession] = {}
+        # Room name -> user_ids subscribed to it
+        self.rooms: Dict[str, Set[str]] = {}
+        # Relays broadcasts and presence to the other worker processes
+        self.backplane: Backplane = InProcessBackplane()
+        self._presence_task: Optional[asyncio.Task] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # Sequence numbers and recent history for reconnect replay
+        self.replay = ReplayBuffer(settings.WS_REPLAY_BUFFER_SIZE, settings.WS_REPLAY_MAX_ROOMS)
+        # Set by the presence service to batch status changes; without it
+        # every connect/disconnect is broadcast immediately
+        self.presence_listener: Optional[Callable[[str, str], None]] = None
+        self.stats = {
+            "broadcasts": 0,
+            "messages_enqueued": 0,
+            "messages_sent": 0,
+            "send_errors": 0,
+            "evicted": 0,
+            "replayed": 0,
+            "resyncs": 0,
+            "pings": 0,
+            "reaped": 0,
+            "broadcast_ms_total": 0.0,
+            "broadcast_ms_max": 0.0,
+            "delivery_ms_total": 0.0,
+            "delivery_ms_max": 0.0
+        }
+
+    async def start(self, backplane: Optional[Backplane] = None):
+        """Join the backplane and start announcing this node's users"""
+        if backplane is None:
+            backplane = create_backplane(settings.WS_BACKPLANE, settings.WS_BACKPLANE_URL,
+                                         presence_ttl=settings.WS_PRESENCE_INTERVAL * 3)
+        self.backplane = backplane
+        await self.backplane.start(self._on_remote_event)
+        self._presence_task = asyncio.create_task(self._presence_loop())
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
 
-    async def connect(self, websocket: WebSocket, user_id: str):
-        """Connect a user to WebSocket"""
+    async def stop(self):
+        for task in (self._presence_task, self._heartbeat_task):
+            if task:
+                task.cancel()
+        self._presence_task = self._heartbeat_task = None
+        await self.backplane.stop()
+
+    async def _presence_loop(self):
+        while True:
+            await asyncio.sleep(settings.WS_PRESENCE_INTERVAL)
+            await self.backplane.announce_presence(self.active_connections)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(settings.WS_PING_INTERVAL)
+            try:
+                await self.reap_stale()
+                self._ping_all()
+            except Exception as e:
+                logger.error(f"WebSocket heartbeat failed: {e}")
+
+    def _ping_all(self):
+        """Ask every client for a pong; the reply (or any other frame) keeps it alive"""
+        message = {"type": "ping", "data": {"timestamp": datetime.utcnow().isoformat()}}
+        frames: Dict[str, Frame] = {}
+        for connection in list(self.active_connections.values()):
+            if connection.enqueue(self._frame_for(connection, message, frames)):
+                self.stats["pings"] += 1
+
+    async def reap_stale(self) -> int:
+        """Close connections that went quiet or whose writer died, returning how many"""
+        deadline = time.monotonic() - settings.WS_IDLE_TIMEOUT
+        stale = [
+            connection for connection in self.active_connections.values()
+            if connection.last_seen < deadline or (connection.writer is not None and connection.writer.done())
+        ]
+        for connection in stale:
+            self.stats["reaped"] += 1
+            logger.info(f"Reaping stale WebSocket connection for user {connection.user_id}")
+            await connection.close(code=1001, reason="Heartbeat timeout")
+            await self.disconnect(connection.user_id, connection.websocket)
+        return len(stale)
+
+    def touch(self, user_id: str):
+        """Record that a frame was received from the user's socket"""
+        connection = self.active_connections.get(user_id)
+        if connection is not None:
+            connection.last_seen = time.monotonic()
+
+    async def _on_remote_event(self, event: dict):
+        """Deliver an event published by another node to the local sockets"""
+        if event.get("kind") == "broadcast":
+            await self._fan_out(list(self.active_connections), [ALL_ROOM], event["message"], event.get("exclude_user"))
+        elif event.get("kind") == "publish":
+            rooms = event.get("rooms", [])
+            await self._fan_out(self._room_members(rooms), rooms, event["message"], event.get("exclude_user"))
+        elif event.get("kind") == "principal_invalidated":
+            principal_cache.invalidate(event["user"])
+
+    async def connect(self, websocket: WebSocket, user_id: str, role: Optional[str] = None,
+                      rooms: Iterable[str] = (), last_seq: Optional[int] = None,
+                      epoch: Optional[str] = None, codec: FrameCodec = JSON_CODEC):
+        """
+        Connect a user to WebSocket and join their default rooms
+
+        A reconnecting client passes the last sequence number (and epoch) it
+        received and is sent the events it missed, or resync_required.
+        """
         await websocket.accept()
-        self.active_connections[user_id] = websocket
-        self.user_sessions[user_id] = {
-            "connected_at": datetime.utcnow(),
-            "status": "online"
-        }
+
+        # A new socket for the same user replaces the previous one
+        previous = self.active_connections.get(user_id)
+        if previous:
+            self._leave_all(previous)
+            await previous.close(code=1000, reason="Replaced by a new connection")
+
+        connection = ClientConnection(websocket, user_id, self, role=role, codec=codec)
+        connection.start()
+        self.active_connections[user_id] = connection
+        self.join(user_id, rooms)
+        if last_seq is not None:
+            # Queued before any await, so no live event can overtake the replay
+            self._replay(connection, last_seq, epoch)
+        self.user_sessions[user_id] = UserSession(datetime.utcnow())
         logger.info(f"User {user_id} connected to WebSocket")
-        
+        if previous is None:
+            await self.backplane.announce_change(user_id, True)
+
         # Notify others about user coming online
-        await self.broadcast_user_status(user_id, "online")
-
-    async def disconnect(self, user_id: str):
-        """Disconnect a user from WebSocket"""
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-        if user_id in self.user_sessions:
-            del self.user_sessions[user_id]
+        if self.presence_listener:
+            self.presence_listener(user_id, "active")
+        else:
+            await self.broadcast_user_status(user_id, "online")
+
+    async def disconnect(self, user_id: str, websocket: Optional[WebSocket] = None):
+        """Disconnect a user from WebSocket (only if websocket is still their current socket)"""
+        connection = self.active_connections.get(user_id)
+        if connection is None or (websocket is not None and connection.websocket is not websocket):
+            return
+
+        del self.active_connections[user_id]
+        self.user_sessions.pop(user_id, None)
+        self._leave_all(connection)
+        await connection.close()
         logger.info(f"User {user_id} disconnected from WebSocket")
-        
+        await self.backplane.announce_change(user_id, False)
+
         # Notify others about user going offline
-        await self.broadcast_user_status(user_id, "offline")
+        if self.presence_listener:
+            self.presence_listener(user_id, "offline")
+        else:
+            await self.broadcast_user_status(user_id, "offline")
+
+    def join(self, user_id: str, rooms: Iterable[str]) -> List[str]:
+        """Subscribe a connected user to rooms, returning the rooms joined"""
+        connection = self.active_connections.get(user_id)
+        if connection is None:
+            return []
+        joined = []
+        for room in rooms:
+            self.rooms.setdefault(room, set()).add(user_id)
+            connection.rooms.add(room)
+            joined.append(room)
+        return joined
+
+    def leave(self, user_id: str, rooms: Iterable[str]) -> List[str]:
+        """Unsubscribe a connected user from rooms, returning the rooms left"""
+        connection = self.active_connections.get(user_id)
+        if connection is None:
+            return []
+        left = []
+        for room in rooms:
+            if room in connection.rooms:
+                connection.rooms.discard(room)
+                self._remove_member(room, user_id)
+                left.append(room)
+        return left
+
+    def sync_project_room(self, project_id: str, member_ids: Iterable[str]):
+        """Bring a project room in line with the project's current team"""
+        room = project_room(project_id)
+        members = set(member_ids)
+        for user_id in members:
+            if user_id in self.active_connections:
+                self.join(user_id, [room])
+        for user_id in list(self.rooms.get(room, ())):
+            connection = self.active_connections.get(user_id)
+            if user_id not in members and connection and connection.role not in PRIVILEGED_ROLES:
+                self.leave(user_id, [room])
+
+    def get_rooms(self, user_id: str) -> List[str]:
+        connection = self.active_connections.get(user_id)
+        return sorted(connection.rooms) if connection else []
+
+    def _remove_member(self, room: str, user_id: str):
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(user_id)
+            if not members:
+                del self.rooms[room]
+
+    def _leave_all(self, connection: ClientConnection):
+        for room in connection.rooms:
+            self._remove_member(room, connection.user_id)
+        connection.rooms = set()
+
+    def _replay(self, connection: ClientConnection, last_seq: int, epoch: Optional[str]):
+        frames = self.replay.missed(connection.rooms, connection.user_id, last_seq, epoch)
+        if frames is None:
+            self.stats["resyncs"] += 1
+            connection.enqueue(connection.codec.encode({
+                "type": "resync_required",
+                "data": {"epoch": self.replay.epoch, "seq": self.replay.seq}
+            }))
+            return
+        for text in frames:
+            # The history is kept as JSON; re-encoding is fine for a one-off replay
+            connection.enqueue(text if connection.codec is JSON_CODEC else connection.codec.encode(json.loads(text)))
+        self.stats["replayed"] += len(frames)
+        connection.enqueue(connection.codec.encode({
+            "type": "replay_complete",
+            "data": {"replayed": len(frames), "epoch": self.replay.epoch, "seq": self.replay.seq}
+        }))
+
+    @staticmethod
+    def _frame_for(connection: ClientConnection, message: dict, frames: Dict[str, Frame]) -> Frame:
+        """Encode message for the connection's codec, once per codec"""
+        frame = frames.get(connection.codec.name)
+        if frame is None:
+            frame = frames[connection.codec.name] = connection.codec.encode(message)
+        return frame
+
+    def _enqueue(self, connection: ClientConnection, frame: Frame) -> bool:
+        if connection.enqueue(frame):
+            self.stats["messages_enqueued"] += 1
+            return True
+        return False
+
+    async def _evict(self, user_ids: List[str]):
+        for user_id in user_ids:
+            connection = self.active_connections.get(user_id)
+            if connection is None:
+                continue
+            self.stats["evicted"] += 1
+            logger.warning(f"Dropping slow WebSocket consumer {user_id} ({connection.queue.qsize()} queued messages)")
+            await connection.close(code=1013, reason="Client too slow")
+            await self.disconnect(user_id, connection.websocket)
 
     async def send_personal_message(self, message: dict, user_id: str):
         """Send message to specific user"""
-        if user_id in self.active_connections:
-            try:
-                websocket = self.active_connections[user_id]
-                await websocket.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Error sending message to user {user_id}: {e}")
-                # Remove dead connection
-                await self.disconnect(user_id)
+        connection = self.active_connections.get(user_id)
+        if connection and not self._enqueue(connection, connection.codec.encode(message)):
+            await self._evict([user_id])
 
     async def broadcast_message(self, message: dict, exclude_user: str = None):
-        """Broadcast message to all connected users"""
-        disconnected_users = []
-        
-        for user_id, websocket in self.active_connections.items():
-            if exclude_user and user_id == exclude_user:
+        """Broadcast message to all connected users on every node"""
+        await self._fan_out(list(self.active_connections), [ALL_ROOM], message, exclude_user)
+        await self.backplane.publish({"kind": "broadcast", "message": message, "exclude_user": exclude_user})
+
+    async def publish(self, rooms: Iterable[str], message: dict, exclude_user: str = None):
+        """Send a message once to every user subscribed to any of the rooms, on every node"""
+        rooms = list(rooms)
+        await self._fan_out(self._room_members(rooms), rooms, message, exclude_user)
+        await self.backplane.publish({"kind": "publish", "rooms": rooms, "message": message, "exclude_user": exclude_user})
+
+    async def invalidate_principal(self, user_id: str):
+        """Drop a user's cached principal on this worker and every other one"""
+        principal_cache.invalidate(user_id)
+        await self.backplane.publish({"kind": "principal_invalidated", "user": user_id})
+
+    def _room_members(self, rooms: Iterable[str]) -> Set[str]:
+        recipients = set()
+        for room in rooms:
+            recipients.update(self.rooms.get(room, ()))
+        return recipients
+
+    async def _fan_out(self, user_ids: Iterable[str], rooms: Iterable[str], message: dict,
+                       exclude_user: str = None):
+        started = time.perf_counter()
+
+        # Number the event, serialize it once per encoding for every
+        # recipient and keep it for clients that reconnect
+        seq = self.replay.next_seq()
+        message = {**message, "seq": seq}
+        frames: Dict[str, Frame] = {JSON_CODEC.name: JSON_CODEC.encode(message)}
+        self.replay.record(rooms, seq, frames[JSON_CODEC.name], exclude_user)
+        slow_users = []
+
+        for user_id in user_ids:
+            connection = self.active_connections.get(user_id)
+            if connection is None or (exclude_user and user_id == exclude_user):
                 continue
-                
-            try:
-                await websocket.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Error broadcasting to user {user_id}: {e}")
-                disconnected_users.append(user_id)
-        
-        # Clean up disconnected users
-        for user_id in disconnected_users:
-            await self.disconnect(user_id)
+            if not self._enqueue(connection, self._frame_for(connection, message, frames)):
+                slow_users.append(user_id)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["broadcasts"] += 1
+        self.stats["broadcast_ms_total"] += elapsed_ms
+        self.stats["broadcast_ms_max"] = max(self.stats["broadcast_ms_max"], elapsed_ms)
+
+        # Clean up clients that cannot keep up
+        if slow_users:
+            await self._evict(slow_users)
 
     async def broadcast_user_status(self, user_id: str, status: str):
         """Broadcast user status change to all connected users"""
@@ -88,7 +433,7 @@ class ConnectionManager:
                 "timestamp": datetime.utcnow().isoformat()
             }
         }
-        await self.broadcast_message(message)
+        await self.publish(event_rooms(user_id, time_entry_data.get("project_id")), message)
 
     async def broadcast_project_update(self, project_data: dict):
         """Broadcast project updates"""
@@ -99,7 +444,7 @@ class ConnectionManager:
                 "timestamp": datetime.utcnow().isoformat()
             }
         }
-        await self.broadcast_message(message)
+        await self.publish(event_rooms(project_id=project_data.get("id")), message)
 
     async def broadcast_team_activity(self, activity_data: dict):
         """Broadcast team activity updates"""
@@ -110,15 +455,47 @@ class ConnectionManager:
                 "timestamp": datetime.utcnow().isoformat()
             }
         }
-        await self.broadcast_message(message)
+        details = activity_data.get("activity") or {}
+        project_id = activity_data.get("project_id") or (details.get("project_id") if isinstance(details, dict) else None)
+        await self.publish(event_rooms(activity_data.get("user_id"), project_id), message)
 
     def get_online_users(self) -> List[str]:
-        """Get list of online user IDs"""
-        return list(self.active_connections.keys())
+        """Get list of online user IDs across every node"""
+        local = list(self.active_connections.keys())
+        remote = self.backplane.remote_online_users() - set(local)
+        return local + sorted(remote)
 
     def is_user_online(self, user_id: str) -> bool:
-        """Check if user is online"""
-        return user_id in self.active_connections
+        """Check if user is online on any node"""
+        return user_id in self.active_connections or user_id in self.backplane.remote_online_users()
+
+    def get_stats(self) -> dict:
+        """Fan-out latency and send queue depth statistics"""
+        connections = list(self.active_connections.values())
+        encodings: Dict[str, int] = {}
+        for connection in connections:
+            encodings[connection.codec.name] = encodings.get(connection.codec.name, 0) + 1
+        depths = [connection.queue.qsize() for connection in connections]
+        memory = sum(connection.memory_usage() for connection in connections)
+        memory += sum(sys.getsizeof(session) for session in self.user_sessions.values())
+        broadcasts = self.stats["broadcasts"]
+        sent = self.stats["messages_sent"]
+        return {
+            **self.stats,
+            "connections": len(depths),
+            "encodings": encodings,
+            "rooms": len(self.rooms),
+            "node_id": self.backplane.node_id,
+            "peer_nodes": len(self.backplane.nodes),
+            "backplane": self.backplane.stats,
+            "replay": self.replay.get_stats(),
+            "memory_bytes": memory,
+            "memory_bytes_per_connection": memory // len(connections) if connections else 0,
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths) if depths else 0,
+            "broadcast_ms_avg": round(self.stats["broadcast_ms_total"] / broadcasts, 3) if broadcasts else 0,
+            "delivery_ms_avg": round(self.stats["delivery_ms_total"] / sent, 3) if sent else 0
+        }
 
 # Create global instance
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager()
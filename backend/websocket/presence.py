@@ -0,0 +1,158 @@
+import asyncio
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pymongo import UpdateOne
+from database.mongodb import DatabaseOperations
+from models.user import User, UserStatus
+from config import settings
+from .manager import manager
+
+logger = logging.getLogger(__name__)
+
+class PresenceService:
+    """
+    Coalesces user status changes
+
+    Connects, disconnects, logins and timer starts only record the new
+    status in memory. Every flush_interval seconds the service
+    broadcasts a single presence_update frame with the net changes (a
+    reconnect inside one interval cancels out). It also writes the
+    pending status/last_active fields with one bulk_write.
+
+    Users are kept "active" by heartbeats: an open socket on this node,
+    a client ping, or an API call that reports activity. Users without
+    a heartbeat for idle_timeout seconds become "idle" if a socket is
+    still open, and "offline" otherwise.
+    """
+
+    def __init__(self, flush_interval: float = settings.PRESENCE_FLUSH_INTERVAL,
+                 idle_timeout: float = settings.PRESENCE_IDLE_TIMEOUT):
+        self.flush_interval = flush_interval
+        self.idle_timeout = idle_timeout
+        # Last status announced to clients by this node
+        self._announced: Dict[str, str] = {}
+        # Status changes waiting for the next frame
+        self._changes: Dict[str, str] = {}
+        # Pending $set per user for the next bulk write
+        self._writes: Dict[str, Dict[str, Any]] = {}
+        # Monotonic time of the last heartbeat of every active user
+        self._last_seen: Dict[str, float] = {}
+        # Latest last_active of every user seen by this node
+        self._last_active: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"frames": 0, "changes": 0, "coalesced": 0, "bulk_writes": 0,
+                      "users_written": 0, "write_errors": 0, "expired": 0}
+
+    async def start(self):
+        if self._task is not None:
+            return
+        manager.presence_listener = self.set_status
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        manager.presence_listener = None
+        await self.flush()
+
+    def set_status(self, user_id: str, status: str):
+        """Record a status change; it is broadcast and persisted on the next flush"""
+        write = self._writes.setdefault(user_id, {})
+        write["status"] = status
+        if status == "active":
+            write["last_active"] = self._last_active[user_id] = datetime.utcnow()
+            self._last_seen[user_id] = time.monotonic()
+        else:
+            self._last_seen.pop(user_id, None)
+
+        if self._announced.get(user_id, "offline") == status:
+            # Changed back before anyone was told about it
+            if self._changes.pop(user_id, None) is not None:
+                self.stats["coalesced"] += 1
+        else:
+            if user_id in self._changes:
+                self.stats["coalesced"] += 1
+            self._changes[user_id] = status
+
+    def heartbeat(self, user_id: str):
+        """Note that a user is still around, making them active if they were not"""
+        if user_id in self._last_seen and self._changes.get(user_id, self._announced.get(user_id)) == "active":
+            self._last_seen[user_id] = time.monotonic()
+            self._writes.setdefault(user_id, {})["last_active"] = self._last_active[user_id] = datetime.utcnow()
+        else:
+            self.set_status(user_id, "active")
+
+    def get_status(self, user_id: str) -> str:
+        return self._changes.get(user_id, self._announced.get(user_id, "offline"))
+
+    def apply(self, user: User) -> User:
+        """Return user with the status and last_active this node knows, ahead of the pending write"""
+        if user.id not in self._last_active and user.id not in self._changes:
+            return user
+        return user.model_copy(update={"status": UserStatus(self.get_status(user.id)),
+                                       "last_active": self._last_active.get(user.id, user.last_active)})
+
+    async def flush(self):
+        """Broadcast the pending status diff and write pending fields in bulk"""
+        self._expire()
+
+        if self._changes:
+            changes, self._changes = self._changes, {}
+            self._announced.update(changes)
+            for user_id, status in changes.items():
+                if status == "offline":
+                    self._announced.pop(user_id, None)
+            await manager.broadcast_message({
+                "type": "presence_update",
+                "data": {
+                    "changes": [{"user_id": user_id, "status": status} for user_id, status in changes.items()],
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            })
+            self.stats["frames"] += 1
+            self.stats["changes"] += len(changes)
+
+        if self._writes:
+            writes, self._writes = self._writes, {}
+            operations = [UpdateOne({"id": user_id}, {"$set": fields}) for user_id, fields in writes.items()]
+            try:
+                await DatabaseOperations.bulk_write("users", operations)
+                self.stats["bulk_writes"] += 1
+                self.stats["users_written"] += len(operations)
+            except Exception as e:
+                self.stats["write_errors"] += 1
+                logger.error(f"Presence bulk write failed for {len(operations)} users: {e}")
+
+    def _expire(self):
+        now = time.monotonic()
+        for user_id, last_seen in list(self._last_seen.items()):
+            if user_id in manager.active_connections:
+                # An open socket on this node is a server-side heartbeat
+                self._last_seen[user_id] = now
+                continue
+            if now - last_seen > self.idle_timeout:
+                self.set_status(user_id, "idle" if manager.is_user_online(user_id) else "offline")
+                self.stats["expired"] += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Presence flush failed: {e}")
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "active_users": len(self._last_seen), "pending_changes": len(self._changes),
+                "pending_writes": len(self._writes)}
+
+# Global presence service instance
+presence_service = PresenceService()
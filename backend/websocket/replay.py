@@ -0,0 +1,81 @@
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+# Pseudo-room for organisation-wide broadcasts; every socket replays it
+ALL_ROOM = "*"
+
+class ReplayBuffer:
+    """
+    Sequence numbers and bounded per-room history of outgoing events
+
+    Every event delivered by this node gets the next sequence number. The
+    epoch changes whenever the process restarts, so numbers are only
+    comparable within one epoch. A client that reconnects with the last
+    sequence number it saw gets the events it missed from the rooms it
+    belongs to. If any of those events was already evicted from its room,
+    the client is told to resync instead.
+    """
+
+    def __init__(self, size: int, max_rooms: int):
+        self.size = size
+        self.max_rooms = max_rooms
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        # room -> [(seq, exclude_user, serialized frame)]
+        self._rooms: "OrderedDict[str, Deque[Tuple[int, Optional[str], str]]]" = OrderedDict()
+        # room -> highest sequence number evicted from its buffer
+        self._evicted: Dict[str, int] = {}
+        # Highest sequence number of any room buffer dropped entirely
+        self._forgotten = 0
+
+    def next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def record(self, rooms: Iterable[str], seq: int, text: str, exclude_user: Optional[str] = None):
+        for room in rooms:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                buffer = self._rooms[room] = deque()
+                while len(self._rooms) > self.max_rooms:
+                    dropped_room, dropped = self._rooms.popitem(last=False)
+                    if dropped:
+                        self._forgotten = max(self._forgotten, dropped[-1][0])
+                    self._evicted.pop(dropped_room, None)
+            else:
+                self._rooms.move_to_end(room)
+            if len(buffer) >= self.size:
+                self._evicted[room] = buffer.popleft()[0]
+            buffer.append((seq, exclude_user, text))
+
+    def missed(self, rooms: Iterable[str], user_id: str, last_seq: int, epoch: Optional[str]) -> Optional[List[str]]:
+        """
+        Serialized frames after last_seq for the given rooms, in order
+
+        Returns None when the gap cannot be filled: a different epoch,
+        events that were evicted, or a sequence number from the future.
+        """
+        if epoch != self.epoch or last_seq > self.seq:
+            return None
+        frames: Dict[int, str] = {}
+        for room in set(rooms) | {ALL_ROOM}:
+            buffer = self._rooms.get(room)
+            if buffer is None:
+                if last_seq < self._forgotten:
+                    return None
+                continue
+            if self._evicted.get(room, 0) > last_seq:
+                return None
+            for seq, exclude_user, text in buffer:
+                if seq > last_seq and exclude_user != user_id:
+                    frames[seq] = text
+        return [frames[seq] for seq in sorted(frames)]
+
+    def get_stats(self) -> dict:
+        return {
+            "epoch": self.epoch,
+            "seq": self.seq,
+            "rooms": len(self._rooms),
+            "buffered_events": sum(len(buffer) for buffer in self._rooms.values())
+        }
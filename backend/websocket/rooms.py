@@ -0,0 +1,55 @@
+from typing import Dict, Any, Iterable, Optional, Set
+from database.mongodb import DatabaseOperations
+
+# Room names:
+#   user:<user_id>        events about one user (their own socket joins it)
+#   project:<project_id>  events about one project, joined by its team
+#   team                  every tracked event, joined by admins and managers
+TEAM_ROOM = "team"
+
+PRIVILEGED_ROLES = ("admin", "manager")
+
+def user_room(user_id: str) -> str:
+    return f"user:{user_id}"
+
+def project_room(project_id: str) -> str:
+    return f"project:{project_id}"
+
+def event_rooms(user_id: Optional[str] = None, project_id: Optional[str] = None) -> Set[str]:
+    """Rooms an event about this user and/or project is published to"""
+    rooms = {TEAM_ROOM}
+    if user_id:
+        rooms.add(user_room(user_id))
+    if project_id:
+        rooms.add(project_room(project_id))
+    return rooms
+
+async def default_rooms(user: Dict[str, Any]) -> Set[str]:
+    """Rooms a socket joins on connect, derived from role and project membership"""
+    rooms = {user_room(user["id"])}
+    if user.get("role") in PRIVILEGED_ROLES:
+        rooms.add(TEAM_ROOM)
+
+    projects = await DatabaseOperations.get_documents(
+        "projects",
+        {"$or": [{"team_members": user["id"]}, {"created_by": user["id"]}]}
+    )
+    rooms.update(project_room(project["id"]) for project in projects if project.get("id"))
+    return rooms
+
+async def can_join(user: Dict[str, Any], room: str) -> bool:
+    """Whether a client may subscribe to a room explicitly"""
+    if user.get("role") in PRIVILEGED_ROLES:
+        return room == TEAM_ROOM or room.startswith(("user:", "project:"))
+    if room == user_room(user["id"]):
+        return True
+    if not room.startswith("project:"):
+        return False
+    # Project rooms carry members' time entries and activity (apps, URLs),
+    # so only the project's own team may listen in
+    project = await DatabaseOperations.get_document("projects", {"id": room[len("project:"):]})
+    return project is not None and user["id"] in project_members(project)
+
+def project_members(project: Dict[str, Any]) -> Set[str]:
+    members: Iterable[str] = project.get("team_members") or []
+    return set(members) | ({project["created_by"]} if project.get("created_by") else set())
@@ -59,9 +59,12 @@ export const authAPI = {
   refreshToken: (refreshToken) => apiClient.post('/auth/refresh', { refresh_token: refreshToken }),
   getCurrentUser: () => apiClient.get('/auth/me'),
   inviteUser: (inviteData) => apiClient.post('/auth/invite', inviteData),
+  // invitations: [{ email, role }] or FormData with a CSV 'file' (columns: email, role)
+  bulkInviteUsers: (invitations) => apiClient.post('/auth/invite/bulk', invitations),
   acceptInvite: (acceptData) => apiClient.post('/auth/accept-invite', acceptData),
-  getInvitations: () => apiClient.get('/auth/invitations'),
-  getAllInvitations: () => apiClient.get('/auth/invitations/all'),
+  // params: { status, cursor, limit }; the next page's cursor is in the x-next-cursor header
+  getInvitations: (params = {}) => apiClient.get('/auth/invitations', { params }),
+  getAllInvitations: (params = {}) => apiClient.get('/auth/invitations/all', { params }),
   forgotPassword: (forgotData) => apiClient.post('/auth/forgot-password', forgotData),
   resetPassword: (resetData) => apiClient.post('/auth/reset-password', resetData),
 };
@@ -103,6 +106,7 @@ export const timeTrackingAPI = {
   createManualEntry: (data) => apiClient.post('/time-tracking/manual', data),
   updateTimeEntry: (entryId, data) => apiClient.put(`/time-tracking/entries/${entryId}`, data),
   recordActivity: (data) => apiClient.post('/time-tracking/activity', data),
+  recordActivityBatch: (items) => apiClient.post('/time-tracking/activity/batch', items),
   uploadScreenshot: (entryId, file) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -137,6 +141,7 @@ export const integrationsAPI = {
   sendSlackNotification: (message, channel) => apiClient.post('/integrations/slack/notify', { message, channel }),
   createTrelloCard: (listId, name, description) => apiClient.post('/integrations/trello/create-card', { list_id: listId, name, description }),
   createGitHubIssue: (repo, title, body, labels) => apiClient.post('/integrations/github/create-issue', { repo, title, body, labels }),
+  getIntegrationJob: (jobId) => apiClient.get(`/integrations/jobs/${jobId}`),
   disconnectIntegration: (integrationId) => apiClient.delete(`/integrations/${integrationId}`),
 };
 
@@ -7,6 +7,8 @@ export const useWebSocket = (user) => {
   const [onlineUsers, setOnlineUsers] = useState([]);
   const [notifications, setNotifications] = useState([]);
   const socketRef = useRef(null);
+  // Last event seen, so a reconnect can replay what was missed
+  const replayRef = useRef({ epoch: null, seq: null });
 
   useEffect(() => {
     if (!user) return;
@@ -15,7 +17,9 @@ export const useWebSocket = (user) => {
     if (!token) return;
 
     // Connect to WebSocket - use ws:// protocol
-    const wsUrl = `${BACKEND_URL.replace('http', 'ws')}/ws/${token}`;
+    const { epoch, seq } = replayRef.current;
+    const resume = epoch && seq !== null ? `?last_seq=${seq}&epoch=${epoch}` : '';
+    const wsUrl = `${BACKEND_URL.replace('http', 'ws')}/ws/${token}${resume}`;
     socketRef.current = new WebSocket(wsUrl);
 
     socketRef.current.onopen = () => {
@@ -31,10 +35,24 @@ export const useWebSocket = (user) => {
     socketRef.current.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
+        if (typeof data.seq === 'number') {
+          replayRef.current.seq = data.seq;
+        }
         
         switch (data.type) {
           case 'connection_established':
             setOnlineUsers(data.online_users || []);
+            if (replayRef.current.epoch !== data.data?.epoch) {
+              replayRef.current = { epoch: data.data?.epoch, seq: data.data?.seq ?? null };
+            }
+            break;
+          case 'ping':
+            // Server heartbeat; an unanswered socket is closed after WS_IDLE_TIMEOUT
+            socketRef.current.send(JSON.stringify({ type: 'pong' }));
+            break;
+          case 'resync_required':
+            // Too much was missed to replay; start over from the current position
+            replayRef.current = { epoch: data.data?.epoch, seq: data.data?.seq ?? null };
             break;
           case 'user_status_update':
             setOnlineUsers(prev => {
@@ -45,6 +63,14 @@ export const useWebSocket = (user) => {
               }
             });
             break;
+          case 'presence_update':
+            setOnlineUsers(prev => {
+              const changes = data.data?.changes || [];
+              const offline = new Set(changes.filter(c => c.status === 'offline').map(c => c.user_id));
+              const online = changes.filter(c => c.status !== 'offline').map(c => c.user_id);
+              return [...prev.filter(id => !offline.has(id) && !online.includes(id)), ...online];
+            });
+            break;
           case 'time_entry_update':
             setNotifications(prev => [...prev, {
               id: Date.now(),
@@ -66,6 +92,9 @@ export const useWebSocket = (user) => {
           case 'team_activity':
             console.log('Team activity update:', data);
             break;
+          case 'error':
+            console.warn('WebSocket error:', data.data);
+            break;
         }
       } catch (error) {
         console.error('WebSocket message parse error:', error);
@@ -18,6 +18,9 @@ export const TeamManagementPage = ({ user, onLogout }) => {
     }
   });
   const [allInvitations, setAllInvitations] = useState([]);
+  // Cursor for the next page of invitations (X-Next-Cursor), null on the last page
+  const [invitationsCursor, setInvitationsCursor] = useState(null);
+  const [loadingMoreInvitations, setLoadingMoreInvitations] = useState(false);
   const [loading, setLoading] = useState(true);
   const [isMobileSidebarOpen, setIsMobileSidebarOpen] = useState(false);
 
@@ -55,8 +58,10 @@ export const TeamManagementPage = ({ user, onLogout }) => {
       // Set invitations only if user is admin
       if (user.role === 'admin' && responses[2]) {
         setAllInvitations(responses[2].data);
+        setInvitationsCursor(responses[2].headers['x-next-cursor'] || null);
       } else {
         setAllInvitations([]);
+        setInvitationsCursor(null);
       }
     } catch (error) {
       console.error('Failed to fetch team data:', error);
@@ -65,6 +70,20 @@ export const TeamManagementPage = ({ user, onLogout }) => {
     }
   };
 
+  const loadMoreInvitations = async () => {
+    if (!invitationsCursor) return;
+    setLoadingMoreInvitations(true);
+    try {
+      const response = await authAPI.getAllInvitations({ cursor: invitationsCursor });
+      setAllInvitations(previous => [...previous, ...response.data]);
+      setInvitationsCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Failed to load more invitations:', error);
+    } finally {
+      setLoadingMoreInvitations(false);
+    }
+  };
+
   const handleInviteUser = async (e) => {
     e.preventDefault();
     try {
@@ -318,6 +337,17 @@ export const TeamManagementPage = ({ user, onLogout }) => {
                       </tbody>
                     </table>
                   </div>
+                  {invitationsCursor && (
+                    <div className="p-4 border-t border-white/20 flex justify-center">
+                      <button
+                        onClick={loadMoreInvitations}
+                        disabled={loadingMoreInvitations}
+                        className="bg-gradient-to-r from-amber-500 to-orange-600 text-white px-4 py-2 rounded-xl text-sm font-medium hover:from-amber-600 hover:to-orange-700 transition-all duration-200 shadow-lg disabled:opacity-50"
+                      >
+                        {loadingMoreInvitations ? 'Loading...' : 'Load more invitations'}
+                      </button>
+                    </div>
+                  )}
                 </div>
               </div>
             )}
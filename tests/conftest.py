@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# The backend is not an installed package; its modules import each other
+# as top-level modules (config, database, services, ...)
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
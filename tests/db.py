@@ -0,0 +1,52 @@
+"""
+Database fixtures for backend tests
+
+Tests run against a real MongoDB when TEST_MONGO_URL is set (each test
+case gets a throwaway database) and against mongomock-motor otherwise.
+Cases that need server-only features (update pipelines, partial indexes)
+set requires_server and are skipped without TEST_MONGO_URL.
+"""
+
+import os
+import unittest
+import uuid
+
+from database import mongodb
+from database.indexes import INDEX_SPECS
+
+try:
+    from mongomock_motor import AsyncMongoMockClient
+except ImportError:  # pragma: no cover - optional test dependency
+    AsyncMongoMockClient = None
+
+TEST_MONGO_URL = os.getenv("TEST_MONGO_URL")
+
+class DatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    """Points DatabaseOperations at an empty database for each test"""
+
+    requires_server = False
+    # Collections whose INDEX_SPECS are created before each test
+    indexed_collections = ()
+
+    async def asyncSetUp(self):
+        self._previous = (mongodb.db.client, mongodb.db.database)
+        if TEST_MONGO_URL:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            mongodb.db.client = AsyncIOMotorClient(TEST_MONGO_URL)
+            mongodb.db.database = mongodb.db.client[f"test_{uuid.uuid4().hex[:12]}"]
+        elif self.requires_server:
+            self.skipTest("needs a MongoDB server (set TEST_MONGO_URL)")
+        elif AsyncMongoMockClient is not None:
+            mongodb.db.client = AsyncMongoMockClient()
+            mongodb.db.database = mongodb.db.client["test"]
+        else:
+            self.skipTest("needs mongomock-motor or TEST_MONGO_URL")
+        self.database = mongodb.db.database
+        for collection in self.indexed_collections:
+            await self.database[collection].create_indexes([spec.to_model() for spec in INDEX_SPECS[collection]])
+
+    async def asyncTearDown(self):
+        if TEST_MONGO_URL:
+            await mongodb.db.client.drop_database(self.database.name)
+            mongodb.db.client.close()
+        mongodb.db.client, mongodb.db.database = self._previous
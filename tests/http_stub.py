@@ -0,0 +1,58 @@
+"""
+Minimal HTTP server for tests of outbound calls
+
+Replies to each request with the next scripted (status, headers, body)
+response, repeating the last one, and records what it received.
+"""
+
+import asyncio
+from typing import Dict, List, Tuple
+
+class StubHTTPServer:
+
+    def __init__(self, responses: List[Tuple[int, Dict[str, str], bytes]]):
+        self.responses = list(responses)
+        self.requests: List[Dict] = []
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def __aenter__(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().rstrip("\r\n")
+                    if not line:
+                        break
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                self.requests.append({"method": method, "path": path, "headers": headers, "body": body})
+
+                status, response_headers, response_body = (
+                    self.responses.pop(0) if len(self.responses) > 1 else self.responses[0]
+                )
+                head = [f"HTTP/1.1 {status} Stub", f"Content-Length: {len(response_body)}"]
+                head += [f"{name}: {value}" for name, value in response_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + response_body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
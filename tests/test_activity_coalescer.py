@@ -0,0 +1,72 @@
+import asyncio
+import unittest
+from datetime import datetime
+from unittest import mock
+
+from database.mongodb import DatabaseOperations
+from models.time_tracking import ActivityData
+from services.activity_coalescer import ActivityCoalescer
+
+def sample(clicks=1, app=None, second=0):
+    return ActivityData(user_id="alice", time_entry_id="e1", timestamp=datetime(2026, 10, 1, 9, 0, second),
+                        mouse_clicks=clicks, active_app=app, activity_score=50)
+
+class ActivityCoalescerTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.coalescer = ActivityCoalescer(flush_interval=60, max_keys=10)
+        self.writes = []
+
+    async def _record(self, collection, operations):
+        self.writes.append(operations)
+
+    async def test_stop_waits_for_the_running_flush(self):
+        started = asyncio.Event()
+
+        async def slow_write(collection, operations):
+            started.set()
+            await asyncio.sleep(0.05)
+            self.writes.append(operations)
+
+        await self.coalescer.start()
+        with mock.patch.object(DatabaseOperations, "bulk_write", slow_write):
+            self.coalescer.add(sample())
+            self.coalescer._flush_requested.set()
+            await started.wait()
+            await self.coalescer.stop()
+
+        self.assertEqual(len(self.writes), 1)
+        self.assertEqual(self.coalescer.get_stats()["rows_written"], 1)
+        self.assertEqual(self.coalescer.pending, 0)
+
+    async def test_failed_write_is_retried_with_newer_samples(self):
+        self.coalescer.add(sample(clicks=2, app="editor"))
+        with mock.patch.object(DatabaseOperations, "bulk_write", side_effect=RuntimeError("down")):
+            await self.coalescer.flush()
+
+        self.assertEqual(self.coalescer.stats["write_errors"], 1)
+        self.coalescer.add(sample(clicks=3, second=30))
+        merged = self.coalescer._pending[("alice", "e1", datetime(2026, 10, 1, 9))]
+        self.assertEqual((merged["mouse_clicks"], merged["samples"], merged["active_app"]), (5, 2, "editor"))
+
+        with mock.patch.object(DatabaseOperations, "bulk_write", self._record):
+            await self.coalescer.flush()
+        self.assertEqual(len(self.writes[0]), 1)
+        self.assertEqual(self.coalescer.pending, 0)
+
+    async def test_restored_minutes_respect_max_keys(self):
+        self.coalescer.max_keys = 1
+        self.coalescer.add(sample())
+
+        async def failing_write(collection, operations):
+            await asyncio.sleep(0)
+            raise RuntimeError("down")
+
+        with mock.patch.object(DatabaseOperations, "bulk_write", failing_write):
+            flushing = asyncio.create_task(self.coalescer.flush())
+            await asyncio.sleep(0)
+            self.coalescer.add(ActivityData(user_id="bob", time_entry_id="e2", timestamp=datetime(2026, 10, 1, 9)))
+            await flushing
+
+        self.assertEqual(list(self.coalescer._pending), [("bob", "e2", datetime(2026, 10, 1, 9))])
+        self.assertEqual(self.coalescer.stats["dropped"], 1)
@@ -0,0 +1,44 @@
+import asyncio
+
+from fastapi import Response
+
+from models.user import User
+from routes import analytics
+from services.cache import ResponseCache, MemoryCacheBackend
+from tests.db import DatabaseTestCase
+
+ALICE = User(id="alice", name="Alice", email="alice@example.com", role="user")
+
+class CachedAnalyticsTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.cache = ResponseCache(MemoryCacheBackend(), ttl=60, stale_ttl=60)
+        self._previous_cache = analytics.response_cache
+        analytics.response_cache = self.cache
+
+    async def asyncTearDown(self):
+        analytics.response_cache = self._previous_cache
+        await super().asyncTearDown()
+
+    async def test_server_timing_only_when_computed_for_the_request(self):
+        computed, cached = Response(), Response()
+
+        first = await analytics.get_dashboard_analytics(computed, ALICE)
+        second = await analytics.get_dashboard_analytics(cached, ALICE)
+
+        self.assertEqual(first, second)
+        self.assertIn("user_stats;dur=", computed.headers["Server-Timing"])
+        self.assertNotIn("Server-Timing", cached.headers)
+
+    async def test_background_refresh_leaves_the_served_response_alone(self):
+        await analytics.get_dashboard_analytics(Response(), ALICE)
+        key = self.cache.make_key("analytics.dashboard", "user:alice")
+        (await self.cache.backend.get(key)).fresh_until = 0
+
+        stale = Response()
+        await analytics.get_dashboard_analytics(stale, ALICE)
+        await asyncio.gather(*self.cache._tasks)
+
+        self.assertEqual(self.cache.stats["refreshes"], 1)
+        self.assertNotIn("Server-Timing", stale.headers)
@@ -0,0 +1,44 @@
+import unittest
+
+from websocket.backplane import InProcessBackplane, InProcessHub
+
+async def _ignore(event):
+    pass
+
+class PresenceDeltaTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        hub = InProcessHub()
+        self.local = InProcessBackplane(hub)
+        self.remote = InProcessBackplane(hub)
+        await self.local.start(_ignore)
+        await self.remote.start(_ignore)
+
+    async def asyncTearDown(self):
+        await self.local.stop()
+        await self.remote.stop()
+
+    async def test_deltas_update_the_last_snapshot(self):
+        await self.remote.announce_presence(["alice", "bob"])
+        await self.remote.announce_change("carol", True)
+        await self.remote.announce_change("alice", False)
+
+        self.assertEqual(self.local.remote_online_users(), {"bob", "carol"})
+
+    async def test_delta_before_any_snapshot(self):
+        await self.remote.announce_change("alice", True)
+
+        self.assertEqual(self.local.remote_online_users(), {"alice"})
+        self.assertEqual(self.local.nodes, [self.remote.node_id])
+
+    async def test_snapshot_replaces_deltas(self):
+        await self.remote.announce_change("alice", True)
+        await self.remote.announce_presence(["bob"])
+
+        self.assertEqual(self.local.remote_online_users(), {"bob"})
+
+    async def test_stop_drops_the_node(self):
+        await self.remote.announce_change("alice", True)
+        await self.remote.stop()
+
+        self.assertEqual(self.local.remote_online_users(), set())
@@ -0,0 +1,74 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from auth.dependencies import get_current_user
+from models.user import User
+from routes import auth as auth_routes
+from services.email import email_service
+from tests.db import DatabaseTestCase
+
+ADMIN = User(id="admin", name="Admin", email="admin@example.com", role="admin")
+
+class BulkInviteTest(DatabaseTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.database.users.insert_one({"id": "existing", "email": "existing@example.com"})
+        await self.database.invitations.insert_one({"email": "pending@example.com", "accepted": False})
+        app = FastAPI()
+        app.include_router(auth_routes.router)
+        app.dependency_overrides[get_current_user] = lambda: ADMIN
+        self.client = TestClient(app)
+        self.sent = []
+        self._send = email_service.send_invitation_emails
+
+        async def record(inviter_name, invitations):
+            self.sent.extend(invitations)
+            return True
+
+        email_service.send_invitation_emails = record
+
+    async def asyncTearDown(self):
+        email_service.send_invitation_emails = self._send
+        await super().asyncTearDown()
+
+    def _invite(self, rows):
+        response = self.client.post("/auth/invite/bulk", json=rows)
+        self.assertEqual(response.status_code, 200, response.text)
+        return response.json()
+
+    def test_row_report(self):
+        report = self._invite([
+            {"email": "new@example.com", "role": "manager"},
+            {"email": "not-an-email"},
+            {"email": "new@example.com"},
+            {"email": "existing@example.com"},
+            {"email": "pending@example.com"},
+        ])
+
+        statuses = [(result["row"], result["status"]) for result in report["results"]]
+        self.assertEqual(statuses, [(1, "invited"), (2, "invalid"), (3, "duplicate"),
+                                    (4, "already_registered"), (5, "already_invited")])
+        self.assertEqual(report["summary"], {"total": 5, "invited": 1, "invalid": 1, "duplicate": 1,
+                                             "already_registered": 1, "already_invited": 1})
+        self.assertEqual([to_email for to_email, _, _ in self.sent], ["new@example.com"])
+
+    def test_csv_upload(self):
+        response = self.client.post(
+            "/auth/invite/bulk",
+            files={"file": ("team.csv", b"email,role\nfirst@example.com,user\nsecond@example.com,manager\n", "text/csv")}
+        )
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()["summary"], {"total": 2, "invited": 2})
+
+    async def test_rows_rejected_by_the_database_are_reported_and_not_emailed(self):
+        # Accepted invitations are not "pending", but a unique email index still rejects them
+        await self.database.invitations.create_index("email", unique=True)
+        await self.database.invitations.insert_one({"email": "accepted@example.com", "accepted": True})
+
+        report = self._invite([{"email": "ok@example.com"}, {"email": "accepted@example.com"}])
+
+        self.assertEqual([result["status"] for result in report["results"]], ["invited", "failed"])
+        self.assertNotIn("invite_link", report["results"][1])
+        self.assertEqual(report["message"], "Invited 1 of 2 users")
+        self.assertEqual([to_email for to_email, _, _ in self.sent], ["ok@example.com"])
+        self.assertEqual(await self.database.invitations.count_documents({"email": "ok@example.com"}), 1)
@@ -0,0 +1,95 @@
+import socket
+from email import message_from_bytes, policy
+from unittest import mock
+
+from aiosmtpd.controller import Controller
+
+from config import settings
+from services.email import EmailService, EMAIL_OUTBOX_COLLECTION
+from tests.db import DatabaseTestCase
+
+class RecordingHandler:
+    """aiosmtpd handler that keeps delivered messages and refuses one recipient"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("refused@"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 Message accepted"
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class EmailOutboxTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.handler = RecordingHandler()
+        self.controller = Controller(self.handler, hostname="127.0.0.1", port=free_port())
+        self.controller.start()
+        self.starttls = mock.patch.object(settings, "SMTP_STARTTLS", False)
+        self.starttls.start()
+        self.service = EmailService(concurrency=1, rate_per_minute=0, max_attempts=2, backoff_base=0)
+        self.service.smtp_host, self.service.smtp_port = "127.0.0.1", self.controller.port
+        self.service.smtp_username = ""
+        self.service.is_configured = True
+
+    async def asyncTearDown(self):
+        self.starttls.stop()
+        self.controller.stop()
+        await super().asyncTearDown()
+
+    async def _send_all(self):
+        """Send every due message over one connection, like a sender task"""
+        smtp = None
+        while (message := await self.service._claim()) is not None:
+            smtp = await self.service._send(smtp, message)
+        if smtp is not None:
+            await self.service._disconnect(smtp)
+
+    async def _stored(self, to_email):
+        return await self.database[EMAIL_OUTBOX_COLLECTION].find_one({"to": to_email})
+
+    async def test_messages_are_sent_over_one_connection(self):
+        self.assertTrue(await self.service.send_password_reset_email("alice@example.com", "Alice",
+                                                                     "https://app/reset?token=secret"))
+        self.assertTrue(await self.service.send_invitation_emails("Admin", [
+            ("bob@example.com", "user", "https://app/invite?token=b"),
+            ("carol@example.com", "manager", "https://app/invite?token=c"),
+        ]))
+
+        await self._send_all()
+
+        self.assertEqual(sorted(envelope.rcpt_tos[0] for envelope in self.handler.messages),
+                         ["alice@example.com", "bob@example.com", "carol@example.com"])
+        reset = next(envelope for envelope in self.handler.messages if envelope.rcpt_tos == ["alice@example.com"])
+        body = message_from_bytes(reset.content, policy=policy.default).get_body(("plain",)).get_content()
+        self.assertIn("https://app/reset?token=secret", body)
+        self.assertEqual(self.service.stats["connections_opened"], 1)
+        self.assertEqual(self.service.stats["sent"], 3)
+
+        stored = await self._stored("alice@example.com")
+        self.assertEqual(stored["status"], "sent")
+        self.assertNotIn("reset_link", stored["context"])
+        self.assertEqual(stored["context"]["user_name"], "Alice")
+
+    async def test_refused_recipient_fails_without_keeping_the_link(self):
+        await self.service.send_password_reset_email("refused@example.com", "Nobody", "https://app/reset?token=x")
+
+        await self._send_all()
+
+        stored = await self._stored("refused@example.com")
+        self.assertEqual(stored["status"], "failed")
+        self.assertIn("550", stored["last_error"])
+        self.assertIsNotNone(stored["failed_at"])
+        self.assertNotIn("reset_link", stored["context"])
+        self.assertEqual(self.handler.messages, [])
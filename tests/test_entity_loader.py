@@ -0,0 +1,40 @@
+import asyncio
+from unittest import mock
+
+from database.loader import EntityLoader
+from database.mongodb import DatabaseOperations
+from tests.db import DatabaseTestCase
+
+class EntityLoaderTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.database.users.insert_many([
+            {"id": f"u{index}", "name": f"User {index}", "password": "hash"} for index in range(3)
+        ])
+
+    async def test_loads_in_one_tick_share_one_query(self):
+        loader = EntityLoader()
+        with mock.patch.object(DatabaseOperations, "get_documents_by_ids",
+                               wraps=DatabaseOperations.get_documents_by_ids) as lookup:
+            first, second, again, missing = await asyncio.gather(
+                loader.load("users", "u0"), loader.load("users", "u1"),
+                loader.load("users", "u0"), loader.load("users", "nobody")
+            )
+
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(sorted(lookup.call_args.args[1]), ["nobody", "u0", "u1"])
+        self.assertEqual((first["name"], second["name"]), ("User 0", "User 1"))
+        self.assertIs(first, again)
+        self.assertIsNone(missing)
+        self.assertNotIn("password", first)
+
+    async def test_fetch_tasks_are_held_until_done(self):
+        loader = EntityLoader()
+        pending = loader.load("users", "u2")
+        await asyncio.sleep(0)
+        self.assertEqual(len(loader._tasks), 1)
+
+        self.assertEqual((await pending)["name"], "User 2")
+        await asyncio.sleep(0)
+        self.assertEqual(loader._tasks, set())
@@ -0,0 +1,24 @@
+from database.indexes import IndexSpec, ensure_indexes
+from tests.db import DatabaseTestCase
+
+SPECS = {"widgets": [IndexSpec("code", unique=True), IndexSpec("owner")]}
+
+class EnsureIndexesTest(DatabaseTestCase):
+
+    async def test_creates_missing_indexes_once(self):
+        changes = await ensure_indexes(self.database, specs=SPECS)
+
+        self.assertEqual(sorted(change["name"] for change in changes if change["action"] == "create"),
+                         ["code_1", "owner_1"])
+        self.assertFalse(any("error" in change for change in changes))
+        again = await ensure_indexes(self.database, specs=SPECS)
+        self.assertFalse([change for change in again if change["action"] in ("create", "rebuild")])
+
+    async def test_failed_creates_are_reported(self):
+        await self.database.widgets.insert_many([{"code": "a"}, {"code": "a"}])
+
+        changes = {change["name"]: change for change in await ensure_indexes(self.database, specs=SPECS)}
+
+        self.assertIn("error", changes["code_1"])
+        self.assertNotIn("error", changes["owner_1"])
+        self.assertIn("owner_1", await self.database.widgets.index_information())
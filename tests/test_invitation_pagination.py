@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException, Response
+
+from routes.auth import _list_invitations
+from tests.db import DatabaseTestCase
+
+class InvitationPaginationTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        now = datetime.utcnow().replace(microsecond=0)
+        # inv-1 and inv-2 share a created_at, so the id breaks the tie
+        self.invitations = [
+            {"id": f"inv-{index}", "email": f"user{index}@example.com", "role": "user", "token": f"token-{index}",
+             "accepted": index == 4, "created_at": now - timedelta(minutes=max(index, 2)),
+             "expires_at": now + timedelta(days=7) if index != 5 else now - timedelta(days=1)}
+            for index in range(1, 7)
+        ]
+        await self.database.invitations.insert_many([dict(invitation) for invitation in self.invitations])
+
+    async def _pages(self, query, status=None, limit=2):
+        pages, cursor = [], None
+        while True:
+            response = Response()
+            page = await _list_invitations(response, query, status, cursor, limit)
+            pages.append([invitation["id"] for invitation in page])
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                return pages
+
+    async def test_cursor_walks_every_invitation_once_newest_first(self):
+        pages = await self._pages({})
+
+        self.assertEqual(pages, [["inv-2", "inv-1"], ["inv-3", "inv-4"], ["inv-5", "inv-6"]])
+
+    async def test_last_page_has_no_cursor(self):
+        response = Response()
+        page = await _list_invitations(response, {}, None, None, 10)
+
+        self.assertEqual(len(page), 6)
+        self.assertNotIn("X-Next-Cursor", response.headers)
+
+    async def test_status_filter_applies_to_every_page(self):
+        pages = await self._pages({"accepted": False}, status="pending")
+
+        self.assertEqual(sum(pages, []), ["inv-2", "inv-1", "inv-3", "inv-6"])
+
+    async def test_statuses_are_derived(self):
+        page = await _list_invitations(Response(), {}, None, None, 10)
+        statuses = {invitation["id"]: invitation["status"] for invitation in page}
+
+        self.assertEqual(statuses["inv-4"], "accepted")
+        self.assertEqual(statuses["inv-5"], "expired")
+        self.assertEqual(statuses["inv-6"], "pending")
+
+    async def test_invalid_cursor_is_rejected(self):
+        with self.assertRaises(HTTPException) as raised:
+            await _list_invitations(Response(), {}, None, "not-a-cursor", 10)
+        self.assertEqual(raised.exception.status_code, 400)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from bson import ObjectId
+
+from services.outbound_queue import OutboundQueue, OUTBOUND_COLLECTION, integration_ref
+from tests.db import DatabaseTestCase
+from tests.http_stub import StubHTTPServer
+
+class OutboundQueueTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.client = httpx.AsyncClient()
+        self.queue = OutboundQueue(max_attempts=3, backoff_base=0, backoff_max=0, merge_window=0)
+
+        async def post(config, payload):
+            return await self.client.post(config["url"], json=payload)
+
+        self.queue.register("stub", "post", post)
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+        await super().asyncTearDown()
+
+    async def _integration(self, url: str, legacy: bool = False) -> dict:
+        integration = {"user_id": "u1", "type": "stub", "active": True, "config": {"url": url}}
+        if not legacy:
+            integration["id"] = "integration-1"
+        integration["_id"] = ObjectId()
+        await self.database["integrations"].insert_one(integration)
+        return integration
+
+    async def _drain(self, rounds: int = 5):
+        """Dispatch due jobs until the queue is idle"""
+        for _ in range(rounds):
+            await self.queue._dispatch()
+            if self.queue._workers:
+                await asyncio.gather(*self.queue._workers)
+
+    async def _job(self, job_id: str) -> dict:
+        return await self.database[OUTBOUND_COLLECTION].find_one({"id": job_id})
+
+    async def test_server_errors_are_retried_until_success(self):
+        async with StubHTTPServer([(503, {"Retry-After": "0"}, b""), (200, {}, b'{"ok": true}')]) as server:
+            integration = await self._integration(server.url)
+            job = await self.queue.enqueue("u1", "stub", "post", integration_ref(integration), {"text": "hi"})
+            await self._drain()
+
+        stored = await self._job(job["id"])
+        self.assertEqual(stored["status"], "succeeded")
+        self.assertEqual(stored["attempts"], 2)
+        self.assertEqual(stored["result"], {"ok": True})
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(self.queue.stats["retried"], 1)
+
+    async def test_gives_up_after_max_attempts(self):
+        async with StubHTTPServer([(500, {}, b"")]) as server:
+            integration = await self._integration(server.url)
+            job = await self.queue.enqueue("u1", "stub", "post", integration_ref(integration), {})
+            await self._drain()
+
+        stored = await self._job(job["id"])
+        self.assertEqual(stored["status"], "failed")
+        self.assertIn("Gave up after 3 attempts", stored["last_error"])
+        self.assertEqual(len(server.requests), 3)
+
+    async def test_huge_retry_after_is_capped(self):
+        self.queue.backoff_max = 60
+        async with StubHTTPServer([(429, {"Retry-After": "86400"}, b"")]) as server:
+            integration = await self._integration(server.url)
+            job = await self.queue.enqueue("u1", "stub", "post", integration_ref(integration), {})
+            await self._drain(rounds=1)
+
+        stored = await self._job(job["id"])
+        self.assertEqual(stored["status"], "pending")
+        self.assertLessEqual(stored["next_attempt_at"], datetime.utcnow() + timedelta(seconds=61))
+        self.assertLessEqual(self.queue._paused_until["stub"], time.monotonic() + 60)
+
+    async def test_client_errors_are_not_retried(self):
+        async with StubHTTPServer([(400, {}, b"bad payload")]) as server:
+            integration = await self._integration(server.url)
+            job = await self.queue.enqueue("u1", "stub", "post", integration_ref(integration), {})
+            await self._drain()
+
+        stored = await self._job(job["id"])
+        self.assertEqual(stored["status"], "failed")
+        self.assertEqual(stored["attempts"], 1)
+
+    async def test_legacy_integration_without_id_is_found_by_object_id(self):
+        async with StubHTTPServer([(200, {}, b"ok")]) as server:
+            integration = await self._integration(server.url, legacy=True)
+            ref = integration_ref(integration)
+            self.assertEqual(ref, str(integration["_id"]))
+            job = await self.queue.enqueue("u1", "stub", "post", ref, {})
+            await self._drain()
+
+        self.assertEqual((await self._job(job["id"]))["status"], "succeeded")
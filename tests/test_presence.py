@@ -0,0 +1,63 @@
+from auth import dependencies
+from auth.principal_cache import principal_cache
+from models.user import User, UserStatus
+from websocket.presence import PresenceService
+from tests.db import DatabaseTestCase
+
+class PresenceFlushTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        principal_cache.clear()
+        self.presence = PresenceService(flush_interval=60, idle_timeout=60)
+        await self.database["users"].insert_one({"id": "alice", "status": "offline"})
+
+    def _cache_alice(self):
+        principal_cache.set(User(id="alice", name="Alice", email="alice@example.com", role="user"))
+
+    async def asyncTearDown(self):
+        principal_cache.clear()
+        await super().asyncTearDown()
+
+    async def test_status_change_is_written_and_coalesced(self):
+        self.presence.set_status("alice", "active")
+        self.presence.set_status("alice", "offline")
+        self.presence.set_status("alice", "active")
+        await self.presence.flush()
+
+        self.assertEqual(self.presence.stats["frames"], 1)
+        self.assertEqual(self.presence.stats["changes"], 1)
+        user = await self.database["users"].find_one({"id": "alice"})
+        self.assertEqual(user["status"], "active")
+        self.assertIsNotNone(user["last_active"])
+
+    async def test_heartbeat_writes_last_active_only(self):
+        self.presence.set_status("alice", "active")
+        await self.presence.flush()
+        self._cache_alice()
+
+        self.presence.heartbeat("alice")
+        await self.presence.flush()
+
+        self.assertEqual(self.presence.stats["frames"], 1)
+        self.assertEqual(self.presence.stats["bulk_writes"], 2)
+        self.assertIsNotNone(principal_cache.get("alice"))
+
+    async def test_cached_user_reports_current_presence(self):
+        previous = dependencies.presence_service
+        dependencies.presence_service = self.presence
+        try:
+            self._cache_alice()
+            self.presence.set_status("alice", "active")
+            await self.presence.flush()
+
+            user = await dependencies.load_user("alice")
+            self.assertEqual(user.status, UserStatus.ACTIVE)
+            self.assertIsNotNone(user.last_active)
+            # The cached profile itself is left alone
+            self.assertIsNotNone(principal_cache.get("alice"))
+
+            self.presence.set_status("alice", "offline")
+            self.assertEqual((await dependencies.load_user("alice")).status, UserStatus.OFFLINE)
+        finally:
+            dependencies.presence_service = previous
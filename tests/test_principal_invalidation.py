@@ -0,0 +1,30 @@
+import unittest
+from unittest import mock
+
+from auth.principal_cache import principal_cache
+from models.user import User
+from websocket.backplane import InProcessBackplane, InProcessHub
+from websocket.manager import ConnectionManager
+
+class PrincipalInvalidationTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        hub = InProcessHub()
+        self.local, self.remote = ConnectionManager(), ConnectionManager()
+        await self.local.start(InProcessBackplane(hub))
+        await self.remote.start(InProcessBackplane(hub))
+
+    async def asyncTearDown(self):
+        await self.local.stop()
+        await self.remote.stop()
+        principal_cache.clear()
+
+    async def test_invalidation_reaches_every_worker(self):
+        principal_cache.set(User(id="alice", name="Alice", email="alice@example.com", role="admin"))
+
+        with mock.patch.object(principal_cache, "invalidate", wraps=principal_cache.invalidate) as invalidate:
+            await self.local.invalidate_principal("alice")
+
+        # Once on this worker, once when the other worker received the event
+        self.assertEqual([call.args for call in invalidate.call_args_list], [("alice",), ("alice",)])
+        self.assertIsNone(principal_cache.get("alice"))
@@ -0,0 +1,60 @@
+import unittest
+
+from websocket.replay import ReplayBuffer, ALL_ROOM
+
+class ReplayBufferTest(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = ReplayBuffer(size=3, max_rooms=2)
+
+    def _send(self, rooms, text, exclude_user=None):
+        seq = self.buffer.next_seq()
+        self.buffer.record(rooms, seq, text, exclude_user)
+        return seq
+
+    def _missed(self, last_seq, rooms=("team:a",), user_id="alice", epoch=None):
+        return self.buffer.missed(rooms, user_id, last_seq, epoch or self.buffer.epoch)
+
+    def test_missed_events_of_own_rooms_in_order(self):
+        seen = self._send(["team:a"], "a1")
+        self._send(["team:b"], "b1")
+        self._send([ALL_ROOM], "all1")
+        self._send(["team:a"], "a2")
+
+        self.assertEqual(self._missed(seen), ["all1", "a2"])
+        self.assertEqual(self._missed(self.buffer.seq), [])
+
+    def test_events_sent_to_several_rooms_are_replayed_once(self):
+        self._send(["team:a", ALL_ROOM], "both")
+
+        self.assertEqual(self._missed(0), ["both"])
+
+    def test_excluded_user_does_not_get_own_event(self):
+        self._send(["team:a"], "mine", exclude_user="alice")
+        self._send(["team:a"], "theirs", exclude_user="bob")
+
+        self.assertEqual(self._missed(0), ["theirs"])
+
+    def test_evicted_events_force_a_resync(self):
+        seen = self._send(["team:a"], "a1")
+        for index in range(3):
+            self._send(["team:a"], f"a{index + 2}")
+
+        self.assertEqual(self._missed(seen), ["a2", "a3", "a4"])
+        self.assertIsNone(self._missed(seen - 1))
+
+    def test_dropped_room_forces_a_resync_for_older_sequence_numbers(self):
+        seen = self._send(["team:a"], "a1")
+        self._send(["team:a"], "a2")
+        self._send([ALL_ROOM], "all1")
+        latest = self._send(["team:b"], "b1")
+
+        # team:a was the least recently used room and was dropped
+        self.assertIsNone(self._missed(seen))
+        self.assertEqual(self._missed(latest), [])
+
+    def test_other_epoch_or_future_sequence_forces_a_resync(self):
+        self._send(["team:a"], "a1")
+
+        self.assertIsNone(self._missed(0, epoch="restarted"))
+        self.assertIsNone(self._missed(self.buffer.seq + 1))
@@ -0,0 +1,110 @@
+import asyncio
+import time
+import unittest
+
+from services.cache import ResponseCache, MemoryCacheBackend, user_tag, project_tag, PROJECTS_TAG
+from services.rollups import RollupService, ROLLUP_COLLECTION
+from services import rollups
+from tests.db import DatabaseTestCase
+
+class Counter:
+    """Compute function that returns how often it has been called"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.calls
+
+class ScopedInvalidationTest(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.cache = ResponseCache(MemoryCacheBackend(), ttl=60, stale_ttl=60)
+
+    async def test_user_scope_drops_only_that_users_entries(self):
+        alice, bob = Counter(), Counter()
+        await self.cache.get_or_set("dash|alice", alice, tags=(user_tag("alice"), PROJECTS_TAG))
+        await self.cache.get_or_set("dash|bob", bob, tags=(user_tag("bob"), PROJECTS_TAG))
+
+        await self.cache.invalidate(user_tag("alice"), project_tag("p1"))
+
+        self.assertEqual(await self.cache.get_or_set("dash|alice", alice, tags=(user_tag("alice"), PROJECTS_TAG)), 2)
+        self.assertEqual(await self.cache.get_or_set("dash|bob", bob, tags=(user_tag("bob"), PROJECTS_TAG)), 1)
+
+    async def test_projects_tag_drops_every_entry_carrying_it(self):
+        alice, stats = Counter(), Counter()
+        await self.cache.get_or_set("dash|alice", alice, tags=(user_tag("alice"), PROJECTS_TAG))
+        await self.cache.get_or_set("projects.stats", stats, tags=(PROJECTS_TAG,))
+
+        self.assertEqual(await self.cache.invalidate(PROJECTS_TAG), 2)
+
+    async def test_invalidation_during_compute_is_not_stored(self):
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def slow():
+            started.set()
+            await release.wait()
+            return "outdated"
+
+        pending = asyncio.create_task(self.cache.get_or_set("dash|alice", slow, tags=(user_tag("alice"),)))
+        await started.wait()
+        await self.cache.invalidate(user_tag("alice"))
+        release.set()
+        self.assertEqual(await pending, "outdated")
+
+        self.assertIsNone(await self.cache.backend.get("dash|alice"))
+
+class StaleWhileRevalidateTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_stale_value_is_served_while_refreshing(self):
+        cache = ResponseCache(MemoryCacheBackend(), ttl=60, stale_ttl=60)
+        compute = Counter()
+        await cache.get_or_set("key", compute)
+        entry = await cache.backend.get("key")
+        entry.fresh_until = time.time() - 1
+
+        self.assertEqual(await cache.get_or_set("key", compute), 1)
+        self.assertEqual(cache.stats["stale_hits"], 1)
+        self.assertEqual(len(cache._tasks), 1)
+
+        # Let the background refresh run
+        for _ in range(3):
+            await asyncio.sleep(0)
+        self.assertEqual(await cache.get_or_set("key", compute), 2)
+        self.assertEqual(cache.stats["refreshes"], 1)
+        self.assertEqual(cache._tasks, set())
+
+    async def test_concurrent_misses_share_one_computation(self):
+        cache = ResponseCache(MemoryCacheBackend(), ttl=60, stale_ttl=60)
+        compute = Counter()
+        results = await asyncio.gather(*(cache.get_or_set("key", compute) for _ in range(5)))
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual(compute.calls, 1)
+
+class RollupInvalidationTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.cache = ResponseCache(MemoryCacheBackend(), ttl=60, stale_ttl=60)
+        self._previous_cache = rollups.response_cache
+        rollups.response_cache = self.cache
+
+    async def asyncTearDown(self):
+        rollups.response_cache = self._previous_cache
+        await super().asyncTearDown()
+
+    async def test_stopped_entry_invalidates_its_user_and_project(self):
+        alice, bob, other_project = Counter(), Counter(), Counter()
+        await self.cache.get_or_set("alice", alice, tags=(user_tag("alice"),))
+        await self.cache.get_or_set("bob", bob, tags=(user_tag("bob"),))
+        await self.cache.get_or_set("p2", other_project, tags=(project_tag("p2"),))
+
+        await RollupService().add_entry({
+            "user_id": "alice", "project_id": "p1", "start_time": "2026-10-01T09:00:00", "duration": 600
+        })
+
+        self.assertEqual(await self.database[ROLLUP_COLLECTION].count_documents({}), 1)
+        self.assertIsNone(await self.cache.backend.get("alice"))
+        self.assertIsNotNone(await self.cache.backend.get("bob"))
+        self.assertIsNotNone(await self.cache.backend.get("p2"))
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta, timezone
+
+from services.rollups import RollupService, ROLLUP_COLLECTION
+from tests.db import DatabaseTestCase
+
+def entry(**fields):
+    return {"user_id": "alice", "project_id": "p1", "task_id": None,
+            "start_time": datetime(2026, 10, 1, 9), "duration": 600, "activity_level": 50,
+            "mouse_clicks": 10, "keyboard_strokes": 20, **fields}
+
+class RollupIncrementTest(DatabaseTestCase):
+    indexed_collections = (ROLLUP_COLLECTION,)
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.rollups = RollupService()
+
+    async def _rollups(self):
+        return await self.database[ROLLUP_COLLECTION].find({}, {"_id": 0, "updated_at": 0}).sort("day").to_list(None)
+
+    async def test_entries_of_one_day_are_summed(self):
+        await self.rollups.add_entry(entry())
+        await self.rollups.add_entry(entry(duration=300, activity_level=None))
+
+        [rollup] = await self._rollups()
+        self.assertEqual(rollup["day"], "2026-10-01")
+        self.assertEqual(rollup["seconds"], 900)
+        self.assertEqual(rollup["entries"], 2)
+        self.assertEqual(rollup["activity_sum"], 50)
+        self.assertEqual(rollup["activity_samples"], 1)
+        self.assertEqual(rollup["mouse_clicks"], 20)
+
+    async def test_running_entries_are_not_counted(self):
+        await self.rollups.add_entry(entry(duration=None))
+
+        self.assertEqual(await self._rollups(), [])
+
+    async def test_edit_within_a_day_applies_the_net_change(self):
+        original = entry()
+        await self.rollups.add_entry(original)
+        await self.rollups.replace_entry(original, entry(duration=900))
+
+        [rollup] = await self._rollups()
+        self.assertEqual(rollup["seconds"], 900)
+        self.assertEqual(rollup["entries"], 1)
+
+    async def test_edit_to_another_day_moves_the_contribution(self):
+        original = entry()
+        await self.rollups.add_entry(original)
+        await self.rollups.replace_entry(original, entry(start_time="2026-10-02T09:00:00Z"))
+
+        old_day, new_day = await self._rollups()
+        self.assertEqual((old_day["day"], old_day["seconds"], old_day["entries"]), ("2026-10-01", 0, 0))
+        self.assertEqual((new_day["day"], new_day["seconds"], new_day["entries"]), ("2026-10-02", 600, 1))
+
+    async def test_offset_start_times_count_on_their_utc_day(self):
+        late_evening = datetime(2026, 10, 1, 23, 30, tzinfo=timezone(timedelta(hours=-5)))
+        await self.rollups.add_entry(entry(start_time=late_evening))
+        await self.rollups.add_entry(entry(start_time="2026-10-01T23:30:00-05:00"))
+
+        [rollup] = await self._rollups()
+        self.assertEqual((rollup["day"], rollup["entries"]), ("2026-10-02", 2))
+
+class RollupRebuildTest(DatabaseTestCase):
+    # $toDate and $dateToString in the rebuild pipeline
+    requires_server = True
+    indexed_collections = (ROLLUP_COLLECTION,)
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.rollups = RollupService()
+        await self.database.time_entries.insert_many([entry(), entry(duration=300), entry(duration=None)])
+
+    async def test_backfill_builds_missing_rollups_once(self):
+        self.assertEqual(await self.rollups.backfill(), 1)
+        self.assertEqual(await self.rollups.backfill(), 0)
+
+        [rollup] = await self.database[ROLLUP_COLLECTION].find().to_list(None)
+        self.assertEqual((rollup["seconds"], rollup["entries"]), (900, 2))
+
+    async def test_rebuild_fixes_drift_and_removes_orphans(self):
+        await self.rollups.add_entry(entry())
+        await self.rollups.add_entry(entry(start_time=datetime(2026, 9, 1, 9)))
+        await self.database.time_entries.delete_many({"start_time": datetime(2026, 9, 1, 9)})
+
+        await self.rollups.rebuild()
+
+        rollups = await self.database[ROLLUP_COLLECTION].find().to_list(None)
+        self.assertEqual([(r["day"], r["seconds"], r["entries"]) for r in rollups], [("2026-10-01", 900, 2)])
@@ -0,0 +1,138 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from models.time_tracking import TimeEntryCreate
+from models.user import User
+from tests.db import DatabaseTestCase
+
+try:
+    from routes import time_tracking
+except ImportError:  # pragma: no cover - storage needs the supabase client
+    time_tracking = None
+
+ALICE = User(id="alice", name="Alice", email="alice@example.com", role="user")
+
+def running(entry_id, user_id="alice", **fields):
+    return {"id": entry_id, "user_id": user_id, "project_id": "p1", "start_time": datetime.utcnow(),
+            "end_time": None, **fields}
+
+class RunningTimerIndexTest(DatabaseTestCase):
+    # Partial index on {"end_time": {"$type": "null"}}
+    requires_server = True
+    indexed_collections = ("time_entries",)
+
+    async def test_second_running_entry_is_rejected(self):
+        await self.database.time_entries.insert_one(running("e1"))
+
+        with self.assertRaises(DuplicateKeyError):
+            await self.database.time_entries.insert_one(running("e2"))
+
+    async def test_stopped_entries_and_other_users_do_not_conflict(self):
+        await self.database.time_entries.insert_many([
+            running("e1", end_time=datetime.utcnow()),
+            running("e2", end_time=datetime.utcnow()),
+            running("e3"),
+            running("e4", user_id="bob"),
+        ])
+
+        self.assertEqual(await self.database.time_entries.count_documents({}), 4)
+
+    async def test_concurrent_inserts_leave_one_running_entry(self):
+        results = await asyncio.gather(
+            *(self.database.time_entries.insert_one(running(f"e{index}")) for index in range(5)),
+            return_exceptions=True
+        )
+
+        self.assertEqual(sum(not isinstance(result, DuplicateKeyError) for result in results), 1)
+        self.assertEqual(await self.database.time_entries.count_documents({"end_time": None}), 1)
+
+class TimerRouteTestCase(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        if time_tracking is None:
+            self.skipTest("routes.time_tracking needs the storage dependencies")
+        await self.database.projects.insert_one({"id": "p1", "name": "Project", "hours_tracked": 0})
+
+    async def assertRejected(self, call, status_code, detail=None):
+        with self.assertRaises(HTTPException) as caught:
+            await call
+        self.assertEqual(caught.exception.status_code, status_code)
+        if detail is not None:
+            self.assertEqual(caught.exception.detail, detail)
+
+class PauseTest(TimerRouteTestCase):
+
+    async def test_pause_only_applies_once(self):
+        await self.database.time_entries.insert_one(running("e1"))
+
+        self.assertTrue((await time_tracking.pause_time_tracking("e1", ALICE)).is_paused)
+        await self.assertRejected(time_tracking.pause_time_tracking("e1", ALICE), 400, "Time entry is already paused")
+
+        stored = await self.database.time_entries.find_one({"id": "e1"})
+        self.assertEqual(len(stored["pause_periods"]), 1)
+
+    async def test_stopped_or_foreign_entries_cannot_be_paused(self):
+        await self.database.time_entries.insert_many([
+            running("stopped", end_time=datetime.utcnow()),
+            running("foreign", user_id="bob"),
+        ])
+
+        await self.assertRejected(time_tracking.pause_time_tracking("stopped", ALICE), 400,
+                                  "Cannot pause a stopped time entry")
+        await self.assertRejected(time_tracking.pause_time_tracking("foreign", ALICE), 404)
+
+class TimerTransitionTest(TimerRouteTestCase):
+    # Stop and resume are update pipelines
+    requires_server = True
+    indexed_collections = ("time_entries",)
+
+    async def test_start_rejects_a_second_running_entry(self):
+        entry = await time_tracking.start_time_tracking(TimeEntryCreate(project_id="p1"), ALICE)
+        await self.assertRejected(time_tracking.start_time_tracking(TimeEntryCreate(project_id="p1"), ALICE), 400,
+                                  "You already have an active time entry. Please stop it first.")
+
+        await time_tracking.stop_time_tracking(entry.id, ALICE)
+        await time_tracking.start_time_tracking(TimeEntryCreate(project_id="p1"), ALICE)
+
+    async def test_stop_folds_the_open_pause_into_the_total(self):
+        now = datetime.utcnow()
+        await self.database.time_entries.insert_one(running(
+            "e1", start_time=now - timedelta(seconds=100), is_paused=True, total_pause_duration=10,
+            pause_periods=[{"pause_time": now - timedelta(seconds=30), "resume_time": None}]
+        ))
+
+        stopped = await time_tracking.stop_time_tracking("e1", ALICE)
+
+        self.assertFalse(stopped.is_paused)
+        self.assertAlmostEqual(stopped.total_pause_duration, 40, delta=2)
+        self.assertAlmostEqual(stopped.duration, 60, delta=2)
+        self.assertIsNotNone(stopped.pause_periods[-1]["resume_time"])
+        await self.assertRejected(time_tracking.stop_time_tracking("e1", ALICE), 400, "Time entry already stopped")
+
+    async def test_resume_closes_the_pause_once(self):
+        now = datetime.utcnow()
+        await self.database.time_entries.insert_one(running(
+            "e1", start_time=now - timedelta(seconds=100), is_paused=True,
+            pause_periods=[{"pause_time": (now - timedelta(seconds=20)).isoformat(), "resume_time": None}]
+        ))
+
+        resumed = await time_tracking.resume_time_tracking("e1", ALICE)
+
+        self.assertFalse(resumed.is_paused)
+        self.assertAlmostEqual(resumed.total_pause_duration, 20, delta=2)
+        await self.assertRejected(time_tracking.resume_time_tracking("e1", ALICE), 400, "Time entry is not paused")
+
+    async def test_concurrent_stops_apply_once(self):
+        await self.database.time_entries.insert_one(running("e1", start_time=datetime.utcnow() - timedelta(hours=1)))
+
+        results = await asyncio.gather(
+            *(time_tracking.stop_time_tracking("e1", ALICE) for _ in range(3)), return_exceptions=True
+        )
+
+        self.assertEqual(sum(not isinstance(result, HTTPException) for result in results), 1)
+        project = await self.database.projects.find_one({"id": "p1"})
+        self.assertAlmostEqual(project["hours_tracked"], 1, delta=0.01)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+import unittest
+from unittest import mock
+
+from config import settings
+from services.http_clients import http_clients
+from services.webhooks import (WebhookDispatcher, UnsafeWebhookURL, check_webhook_url, sign_payload,
+                               SUBSCRIPTIONS_COLLECTION, DELIVERIES_COLLECTION)
+from tests.db import DatabaseTestCase
+from tests.http_stub import StubHTTPServer
+
+class WebhookDispatcherTest(DatabaseTestCase):
+
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        self.dispatcher = WebhookDispatcher(workers=2, endpoint_concurrency=1, max_attempts=2,
+                                            backoff_base=0, backoff_max=0)
+        # The stub receiver listens on loopback
+        self.allowed_hosts = mock.patch.object(settings, "WEBHOOK_ALLOWED_HOSTS", "127.0.0.1")
+        self.allowed_hosts.start()
+
+    async def asyncTearDown(self):
+        self.allowed_hosts.stop()
+        await http_clients.close()
+        await super().asyncTearDown()
+
+    async def _subscribe(self, url: str, **fields) -> dict:
+        subscription = {"id": "sub-1", "user_id": "u1", "scope": "org", "url": url, "secret": "s3cret",
+                        "events": ["project.created"], "active": True, "batch_size": 1, **fields}
+        await self.database[SUBSCRIPTIONS_COLLECTION].insert_one(subscription)
+        return subscription
+
+    async def _drain(self, rounds: int = 5):
+        """Dispatch due deliveries until the queue is idle"""
+        for _ in range(rounds):
+            await self.dispatcher._dispatch()
+            if self.dispatcher._workers:
+                await asyncio.gather(*self.dispatcher._workers)
+
+    async def _deliveries(self) -> list:
+        return await self.database[DELIVERIES_COLLECTION].find().sort("created_at").to_list(None)
+
+    async def test_deliveries_are_signed(self):
+        async with StubHTTPServer([(200, {}, b"")]) as server:
+            await self._subscribe(server.url)
+            self.assertEqual(await self.dispatcher.emit("project.created", {"id": "p1"}, actor_id="u1"), 1)
+            await self._drain()
+
+        [request] = server.requests
+        headers = request["headers"]
+        self.assertEqual(headers["x-webhook-event"], "project.created")
+        self.assertEqual(headers["x-webhook-signature"],
+                         sign_payload("s3cret", int(headers["x-webhook-timestamp"]), request["body"]))
+        self.assertEqual(json.loads(request["body"])["data"], {"id": "p1"})
+
+        [delivery] = await self._deliveries()
+        self.assertEqual((delivery["status"], delivery["response_status"]), ("delivered", 200))
+
+    async def test_other_events_are_not_delivered(self):
+        await self._subscribe("http://127.0.0.1:9")
+
+        self.assertEqual(await self.dispatcher.emit("project.deleted", {"id": "p1"}), 0)
+        self.assertEqual(await self._deliveries(), [])
+
+    async def test_failures_are_retried_then_delivered(self):
+        async with StubHTTPServer([(503, {"Retry-After": "0"}, b""), (200, {}, b"")]) as server:
+            await self._subscribe(server.url)
+            await self.dispatcher.emit("project.created", {"id": "p1"})
+            await self._drain()
+
+        [delivery] = await self._deliveries()
+        self.assertEqual((delivery["status"], delivery["attempts"]), ("delivered", 2))
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(self.dispatcher.stats["retried"], 1)
+
+    async def test_huge_retry_after_is_capped(self):
+        self.dispatcher.backoff_max = 60
+        async with StubHTTPServer([(503, {"Retry-After": "86400"}, b"")]) as server:
+            await self._subscribe(server.url)
+            await self.dispatcher.emit("project.created", {"id": "p1"})
+            await self._drain(rounds=1)
+
+        [delivery] = await self._deliveries()
+        self.assertEqual(delivery["status"], "pending")
+        self.assertLessEqual(delivery["next_attempt_at"], datetime.utcnow() + timedelta(seconds=61))
+
+    async def test_gives_up_after_max_attempts(self):
+        async with StubHTTPServer([(500, {}, b"")]) as server:
+            await self._subscribe(server.url)
+            await self.dispatcher.emit("project.created", {"id": "p1"})
+            await self._drain()
+
+        [delivery] = await self._deliveries()
+        self.assertEqual(delivery["status"], "dead")
+        self.assertIn("Gave up after 2 attempts: HTTP 500", delivery["last_error"])
+        self.assertEqual(len(server.requests), 2)
+
+    async def test_gone_disables_the_subscription(self):
+        async with StubHTTPServer([(410, {}, b"")]) as server:
+            await self._subscribe(server.url)
+            await self.dispatcher.emit("project.created", {"id": "p1"})
+            await self.dispatcher.emit("project.created", {"id": "p2"})
+            await self._drain()
+
+        self.assertEqual([delivery["status"] for delivery in await self._deliveries()], ["dead", "dead"])
+        self.assertEqual(len(server.requests), 1)
+        subscription = await self.database[SUBSCRIPTIONS_COLLECTION].find_one({"id": "sub-1"})
+        self.assertFalse(subscription["active"])
+
+    async def test_pending_deliveries_are_batched(self):
+        async with StubHTTPServer([(200, {}, b"")]) as server:
+            await self._subscribe(server.url, batch_size=10)
+            for index in range(3):
+                await self.dispatcher.emit("project.created", {"id": f"p{index}"})
+            await self._drain()
+
+        [request] = server.requests
+        self.assertEqual(request["headers"]["x-webhook-event"], "batch")
+        self.assertEqual([event["data"]["id"] for event in json.loads(request["body"])["events"]], ["p0", "p1", "p2"])
+        self.assertEqual(self.dispatcher.stats["delivered"], 3)
+
+    async def test_internal_endpoints_are_not_called(self):
+        async with StubHTTPServer([(200, {}, b"")]) as server:
+            await self._subscribe(server.url.replace("127.0.0.1", "localhost"))
+            await self.dispatcher.emit("project.created", {"id": "p1"})
+            await self._drain()
+
+        self.assertEqual(server.requests, [])
+        [delivery] = await self._deliveries()
+        self.assertEqual(delivery["status"], "dead")
+        self.assertIn("non-public address", delivery["last_error"])
+
+class CheckWebhookURLTest(unittest.IsolatedAsyncioTestCase):
+
+    async def test_internal_addresses_are_rejected(self):
+        for url in ("http://localhost:27017", "http://127.0.0.1/", "http://169.254.169.254/latest/meta-data",
+                    "https://10.0.0.5/hook", "http://192.168.1.1", "http://[::1]:8000/", "http://0.0.0.0/",
+                    "http://[::ffff:127.0.0.1]/"):
+            with self.subTest(url=url), self.assertRaises(UnsafeWebhookURL):
+                await check_webhook_url(url)
+
+    async def test_malformed_urls_are_rejected(self):
+        for url in ("ftp://example.com/", "https://", "example.com/hook"):
+            with self.subTest(url=url), self.assertRaises(UnsafeWebhookURL):
+                await check_webhook_url(url)
+
+    async def test_public_and_allowlisted_hosts_pass(self):
+        await check_webhook_url("https://93.184.216.34/hook")
+        with mock.patch.object(settings, "WEBHOOK_ALLOWED_HOSTS", "receiver.internal, 10.0.0.5"):
+            await check_webhook_url("http://receiver.internal:8080/hook")
+            await check_webhook_url("https://10.0.0.5/hook")
@@ -0,0 +1,39 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from auth.jwt_handler import create_access_token
+from auth.principal_cache import principal_cache
+from routes import websocket as websocket_routes
+from services.activity_coalescer import activity_coalescer
+from tests.db import DatabaseTestCase
+
+class ActivityUpdateTest(DatabaseTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.database.users.insert_one({"id": "member", "email": "member@example.com", "name": "Member",
+                                              "role": "user"})
+        principal_cache.invalidate("member")
+        app = FastAPI()
+        app.include_router(websocket_routes.router)
+        self.client = TestClient(app)
+
+    def _connect(self):
+        return self.client.websocket_connect(f"/ws/{create_access_token({'sub': 'member'})}")
+
+    def _next(self, ws, frame_type):
+        frame = ws.receive_json()
+        while frame["type"] != frame_type:
+            frame = ws.receive_json()
+        return frame
+
+    def test_invalid_activity_is_rejected_but_still_broadcast(self):
+        added = activity_coalescer.stats["samples"]
+        with self._connect() as ws:
+            self._next(ws, "connection_established")
+            ws.send_json({"type": "activity_update", "data": {"mouse_clicks": "lots"}})
+            rejected = self._next(ws, "activity_rejected")
+            broadcast = self._next(ws, "team_activity")
+
+        self.assertIn("mouse_clicks", rejected["data"]["error"])
+        self.assertEqual(broadcast["data"]["activity"]["activity"], {"mouse_clicks": "lots"})
+        self.assertEqual(activity_coalescer.stats["samples"], added)
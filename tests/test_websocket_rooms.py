@@ -0,0 +1,70 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from auth.jwt_handler import create_access_token
+from auth.principal_cache import principal_cache
+from routes import websocket as websocket_routes
+from websocket.rooms import can_join, project_room, user_room, TEAM_ROOM
+from tests.db import DatabaseTestCase
+
+PROJECT = {"id": "project-1", "name": "Apollo", "created_by": "owner", "team_members": ["member"]}
+
+def make_user(user_id, role="user"):
+    return {"id": user_id, "email": f"{user_id}@example.com", "name": user_id.title(), "role": role,
+            "is_active": True}
+
+class CanJoinTest(DatabaseTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.database.projects.insert_one(dict(PROJECT))
+
+    async def test_members_and_creator_may_join_project_room(self):
+        self.assertTrue(await can_join(make_user("member"), project_room("project-1")))
+        self.assertTrue(await can_join(make_user("owner"), project_room("project-1")))
+
+    async def test_non_member_may_not_join_project_room(self):
+        self.assertFalse(await can_join(make_user("outsider"), project_room("project-1")))
+        self.assertFalse(await can_join(make_user("outsider"), project_room("missing")))
+
+    async def test_users_only_join_their_own_user_room(self):
+        self.assertTrue(await can_join(make_user("outsider"), user_room("outsider")))
+        self.assertFalse(await can_join(make_user("outsider"), user_room("member")))
+        self.assertFalse(await can_join(make_user("outsider"), TEAM_ROOM))
+
+    async def test_privileged_roles_join_any_room(self):
+        manager_user = make_user("boss", role="manager")
+        self.assertTrue(await can_join(manager_user, project_room("project-1")))
+        self.assertTrue(await can_join(manager_user, TEAM_ROOM))
+
+class SubscribeTest(DatabaseTestCase):
+    async def asyncSetUp(self):
+        await super().asyncSetUp()
+        await self.database.projects.insert_one(dict(PROJECT))
+        await self.database.users.insert_one(make_user("outsider"))
+        principal_cache.invalidate("outsider")
+        app = FastAPI()
+        app.include_router(websocket_routes.router)
+        self.client = TestClient(app)
+
+    def test_non_member_subscribe_is_refused(self):
+        token = create_access_token({"sub": "outsider"})
+        with self.client.websocket_connect(f"/ws/{token}") as ws:
+            frame = ws.receive_json()
+            while frame["type"] != "connection_established":
+                frame = ws.receive_json()
+            self.assertNotIn(project_room("project-1"), frame["data"]["rooms"])
+
+            ws.send_json({"type": "subscribe", "data": {"rooms": [project_room("project-1")]}})
+            error = ws.receive_json()
+            subscribed = ws.receive_json()
+
+        self.assertEqual(error["type"], "error")
+        self.assertEqual(error["data"]["rooms"], [project_room("project-1")])
+        self.assertEqual(subscribed["type"], "subscribed")
+        self.assertEqual(subscribed["data"]["rooms"], [])
+        self.assertEqual(subscribed["data"]["rejected"], [project_room("project-1")])
+
+if __name__ == "__main__":
+    unittest.main()